@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import formats
+import shared_cache
+
+try:  # Streamlit opsional: dipakai agar st.cache_data / st.error tetap berfungsi di thread worker
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+# 🔹 Klien HTTP bersama untuk semua halaman dashboard
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:5000").rstrip("/")
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "60"))
+RETRIES = int(os.getenv("API_RETRIES", "3"))
+MAX_WORKERS = int(os.getenv("API_MAX_WORKERS", "8"))
+
+logger = logging.getLogger("api_client")
+
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+
+# 🔹 Satu Session (keep-alive) dengan pool koneksi dan retry untuk error sementara
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRIES,
+                    backoff_factor=0.3,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset({"GET", "HEAD"}),
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS * 2, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def url(path):
+    return path if path.startswith("http") else f"{API_BASE_URL}{path}"
+
+def get(path, params=None, timeout=None, headers=None):
+    response = get_session().get(
+        url(path), params=params, headers=headers,
+        timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    response.raise_for_status()
+    # Pembagian waktu di server (pool / db / serialize) dari header Server-Timing
+    logger.debug("GET %s %.0f ms | %s", path, response.elapsed.total_seconds() * 1000,
+                 response.headers.get("Server-Timing", "-"))
+    return response
+
+# POST JSON (tanpa retry otomatis karena bukan operasi idempoten)
+def post_json(path, payload, timeout=None):
+    response = get_session().post(url(path), json=payload, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+# version diisi -> hasil dibagi antar proses/replika lewat shared_cache (kunci: path + params + versi data)
+def get_json(path, params=None, timeout=None, version=None, ttl=None):
+    def fetch():
+        return get(path, params=params, timeout=timeout).json()
+    return shared_cache.get_or_fetch(path, params, version, fetch, ttl=ttl)
+
+# 🔹 Ambil data tabel dalam format Arrow (atau JSON kolumnar) lalu bangun DataFrame
+def fetch_frame(path, params=None, timeout=None, version=None, ttl=None):
+    def fetch():
+        response = get(path, params=params, timeout=timeout, headers={"Accept": formats.preferred_accept()})
+        return formats.decode(response.content, response.headers.get("Content-Type"))
+    return shared_cache.get_or_fetch(path, params, version, fetch, ttl=ttl)
+
+# 🔹 Satu halaman data berpaginasi: (DataFrame, next_cursor); next_cursor None berarti halaman terakhir
+def fetch_page(path, params=None, timeout=None):
+    response = get(path, params=params, timeout=timeout, headers={"Accept": formats.preferred_accept()})
+    content_type = response.headers.get("Content-Type")
+    if "X-Next-Cursor" in response.headers:
+        next_cursor = json.loads(response.headers["X-Next-Cursor"])
+    elif (content_type or "").startswith("application/json"):
+        next_cursor = response.json().get("next_cursor")
+    else:
+        next_cursor = None
+    return formats.decode(response.content, content_type), next_cursor
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _session_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="api-client")
+    return _executor
+
+# 🔹 Jalankan beberapa pemanggilan independen secara bersamaan
+# tasks: {nama: (fungsi, arg1, arg2, ...)} -> {nama: hasil}; waktu total ≈ pemanggilan paling lambat.
+# Exception dari salah satu pemanggilan diteruskan ke pemanggil gather().
+def gather(tasks):
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def run(fn, args):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    futures = {name: _get_executor().submit(run, task[0], task[1:]) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -1,33 +1,164 @@
 from flask import Flask, jsonify, request
-import psycopg2
-import pandas as pd
-from model import get_prediction
-import pickle
+import db
+import os
 import traceback
-from psycopg2.extras import RealDictCursor
+import json
+from datetime import date, datetime
+import formats
+import cache
+import metrics
+import hashlib
+from psycopg2.extras import execute_values
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from functools import wraps
 
 app = Flask(__name__)
+metrics.init_app(app)
 
-# Konfigurasi koneksi ke database PostgreSQL
-DB_CONFIG = {
-    "dbname": "history-pembayaran",
-    "user": "postgres",
-    "password": "Trimitha",
-    "host": "localhost",
-    "port": "5432"
-}
+# Batas waktu query untuk request API agar query lambat tidak menahan koneksi & thread terlalu lama
+# (batch model.py memakai engine-nya sendiri tanpa batas)
+db.STATEMENT_TIMEOUT_MS = int(os.getenv("API_STATEMENT_TIMEOUT_MS", "30000"))
 
-# Fungsi koneksi database
+# Fungsi koneksi database: pinjam koneksi dari pool bersama (conn.close() mengembalikannya ke pool)
+# Waktu tunggu pool, waktu query dan jumlah baris dicatat ke metrik request
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    with metrics.timer("pool"):
+        conn = db.get_connection()
+    return metrics.InstrumentedConnection(conn)
+
+# Pool penuh (tidak ada koneksi kosong dalam DB_POOL_TIMEOUT detik): 503 agar klien / load balancer mencoba lagi.
+# Setiap route meminjam koneksi sebelum try, sehingga error ini tidak tertutup oleh finally: conn.close().
+@app.errorhandler(PoolTimeoutError)
+def pool_timeout(e):
+    response = jsonify({"error": "Database sedang sibuk, coba lagi beberapa saat lagi."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+# 🔹 Katalog tabel (kolom -> tipe) per versi data: dicek sekali per versi, bukan per request.
+# Versi berubah setiap batch model.py / update_status selesai, sehingga tabel yang baru dibuat ikut terlihat.
+_catalog = {"version": None, "tables": {}}
+
+def _table_columns(cur, table):
+    version = cache.current_version()
+    if _catalog["version"] != version:
+        _catalog.update(version=version, tables={})
+    if table not in _catalog["tables"]:
+        cur.execute("""
+            SELECT attname, format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped;
+        """, (table,))
+        _catalog["tables"][table] = dict(cur.fetchall())  # {} = tabel belum ada
+    return _catalog["tables"][table]
+
+# Tabel rollup milik batch model.py bila sudah dibangun, selain itu tabel lama (fallback)
+def _rollup_source(cur, table, fallback):
+    return table if _table_columns(cur, table) else fallback
+
+# Ubah nilai tanggal menjadi string agar bisa di-serialize
+def _to_records(columns, rows):
+    return [
+        {col: (str(val) if isinstance(val, (date, datetime)) else val) for col, val in zip(columns, row)}
+        for row in rows
+    ]
+
+# Kirim hasil query sesuai format yang diminta klien (records JSON, JSON kolumnar, Arrow, Parquet)
+def _respond_rows(columns, rows, paginated=False, next_cursor=None):
+    fmt = formats.negotiate(request.args.get("format"), request.headers.get("Accept"))
+    if fmt is None:
+        return jsonify({"error": f"Format tidak dikenal: {request.args.get('format')}"}), 400
+
+    if fmt == formats.RECORDS:
+        with metrics.timer("serialize"):
+            if paginated:
+                return jsonify({"data": _to_records(columns, rows), "next_cursor": next_cursor})
+            return jsonify([dict(zip(columns, row)) for row in rows])
+
+    try:
+        with metrics.timer("serialize"):
+            body, mimetype = formats.encode(columns, rows, fmt)
+    except ImportError:
+        return jsonify({"error": f"Format '{fmt}' membutuhkan pyarrow di server."}), 406
+
+    response = app.response_class(body, mimetype=mimetype)
+    if paginated:
+        response.headers["X-Next-Cursor"] = json.dumps(next_cursor, default=str)
+    return response
+
+response_cache = cache.ResponseCache()
+
+# Cache respons GET per route + parameter (dan header Accept), lengkap dengan ETag / If-None-Match.
+# Cache dikosongkan otomatis ketika versi data di database berubah (cache.bump_version() di model.py / update_status).
+def cached_route(ttl=cache.DEFAULT_TTL):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            params = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            key = f"{request.path}?{params}|{request.headers.get('Accept', '')}"
+
+            entry = response_cache.get(key)
+            metrics.mark("cache", "miss" if entry is None else "hit")
+            if entry is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(body).hexdigest(),
+                    "headers": {k: v for k, v in response.headers.items() if k.startswith("X-")},
+                }
+                response_cache.set(key, entry, ttl)
+
+            if entry["etag"] in request.if_none_match:
+                response = app.response_class(status=304)
+            else:
+                response = app.response_class(entry["body"], mimetype=entry["mimetype"], headers=entry["headers"])
+            response.set_etag(entry["etag"])
+            response.headers["Cache-Control"] = "no-cache"
+            response.vary.add("Accept")
+            return response
+        return wrapper
+    return decorator
+
+# 🚀 API untuk Statistik & Invalidasi Cache Respons
+@app.route('/get_cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+# Token versi data dari database; berubah setiap kali prediksi atau status disimpan (dipakai dashboard sebagai kunci cache)
+@app.route('/get_data_version', methods=['GET'])
+def get_data_version():
+    response = jsonify({"version": cache.current_version()})
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/invalidate_cache', methods=['POST'])
+def invalidate_cache():
+    version = cache.invalidate()
+    response_cache.clear()
+    return jsonify({"version": version})
+
+# 🚀 Metrik request & pool dalam format Prometheus
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(metrics.render_prometheus(db.pool_metrics()), mimetype="text/plain; version=0.0.4")
+
+# 🚀 API untuk Memantau Pool Koneksi Database
+@app.route('/get_pool_metrics', methods=['GET'])
+def get_pool_metrics():
+    return jsonify(db.pool_metrics())
 
 # 🚀 API untuk Mengambil Daftar Bulan yang Tersedia
 @app.route('/get_available_thbl', methods=['GET'])
+@cached_route()
 def get_available_thbl():
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT DISTINCT thbl FROM public.history_pembayaran ORDER BY thbl DESC;")
+        cur.execute("SELECT DISTINCT thbl FROM history_pembayaran ORDER BY thbl DESC;")
         thbl_list = [row[0] for row in cur.fetchall()]
         cur.close()
         return jsonify(thbl_list)
@@ -42,37 +173,46 @@ def get_data():
     thbl = request.args.get("thbl")
     if not thbl:
         return jsonify({"error": "Parameter 'thbl' diperlukan!"}), 400
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT * FROM public.history_pembayaran WHERE thbl = %s;", (thbl,))
+        cur.execute("SELECT * FROM history_pembayaran WHERE thbl = %s;", (thbl,))
         data = cur.fetchall()
         columns = [desc[0] for desc in cur.description]
         cur.close()
-        return jsonify([dict(zip(columns, row)) for row in data])
+        return _respond_rows(columns, data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
         conn.close()
 
-# 🚀 API untuk Mengambil Summary Data Pembayaran
+# 🚀 API untuk Mengambil Summary Data Pembayaran (lookup primary key pada tabel rollup_ringkasan_thbl dari batch model.py)
 @app.route('/get_summary', methods=['GET'])
+@cached_route()
 def get_summary():
     thbl = request.args.get("thbl")
     if not thbl:
         return jsonify({"error": "Parameter 'thbl' diperlukan!"}), 400
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT 
-                COALESCE(SUM(rp_tagihan), 0) AS total_revenue,
-                COALESCE(COUNT(DISTINCT no_plg), 0) AS total_customers,
-                COALESCE(SUM(CASE WHEN status = 'Terlambat' THEN 1 ELSE 0 END), 0) AS total_late
-            FROM public.history_pembayaran
-            WHERE thbl = %s;
-        """, (thbl,))
-        data = cur.fetchone()
+        if _table_columns(cur, "rollup_ringkasan_thbl"):
+            cur.execute("""
+                SELECT total_revenue::double precision AS total_revenue, total_customers, total_late
+                FROM rollup_ringkasan_thbl
+                WHERE thbl = %s;
+            """, (thbl,))
+        else:
+            # Rollup belum pernah dibangun: hitung langsung dari history_pembayaran
+            cur.execute("""
+                SELECT
+                    COALESCE(SUM(rp_tagihan), 0)::double precision AS total_revenue,
+                    COALESCE(COUNT(DISTINCT no_plg), 0) AS total_customers,
+                    COALESCE(SUM(CASE WHEN status = 'Terlambat' THEN 1 ELSE 0 END), 0) AS total_late
+                FROM history_pembayaran
+                WHERE thbl = %s;
+            """, (thbl,))
+        data = cur.fetchone() or (0, 0, 0)
         columns = [desc[0] for desc in cur.description]
         cur.close()
         return jsonify(dict(zip(columns, data)))
@@ -81,21 +221,77 @@ def get_summary():
     finally:
         conn.close()
 
+# Dimensi dan ukuran yang boleh dipakai pada /get_aggregate
+AGGREGATE_DIMENSIONS = ["thbl", "zona", "subkelompok", "status"]
+AGGREGATE_MEASURES = {
+    "count": "COUNT(*)",
+    "customers": "COUNT(DISTINCT no_plg)",
+    "revenue": "COALESCE(SUM(rp_tagihan), 0)::double precision",
+    "kerugian": "COALESCE(SUM(CASE WHEN status = 'Belum Dibayar' THEN rp_tagihan ELSE 0 END), 0)::double precision",
+}
+# Measure yang bisa dijumlahkan dari rollup_pembayaran (per thbl x zona x subkelompok x status).
+# 'customers' tidak additive lintas bulan sehingga tetap dihitung dari history_pembayaran.
+ROLLUP_MEASURES = {
+    "count": "COALESCE(SUM(jumlah_tagihan), 0)::bigint",
+    "revenue": "COALESCE(SUM(total_tagihan), 0)::double precision",
+    "kerugian": "COALESCE(SUM(CASE WHEN status = 'Belum Dibayar' THEN total_tagihan ELSE 0 END), 0)::double precision",
+}
+
+# 🚀 API untuk Agregasi Data Pembayaran (group by & measure dihitung di database)
+@app.route('/get_aggregate', methods=['GET'])
+@cached_route()
+def get_aggregate():
+    group_by = [g.strip() for g in request.args.get("group_by", "").split(",") if g.strip()]
+    measures = [m.strip() for m in request.args.get("measures", "count").split(",") if m.strip()]
+    invalid = [g for g in group_by if g not in AGGREGATE_DIMENSIONS] + [m for m in measures if m not in AGGREGATE_MEASURES]
+    if invalid:
+        return jsonify({"error": f"Dimensi/measure tidak dikenal: {', '.join(invalid)}"}), 400
+    if not measures:
+        return jsonify({"error": "Parameter 'measures' diperlukan!"}), 400
+
+    conditions, params = [], []
+    for col in AGGREGATE_DIMENSIONS:
+        value = request.args.get(col)
+        if value:
+            conditions.append(f"{col} = %s")
+            params.append(value)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group = f"GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}" if group_by else ""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        source, definitions = "history_pembayaran", AGGREGATE_MEASURES
+        if all(m in ROLLUP_MEASURES for m in measures) and _table_columns(cur, "rollup_pembayaran"):
+            source, definitions = "rollup_pembayaran", ROLLUP_MEASURES
+        select = group_by + [f"{definitions[m]} AS {m}" for m in measures]
+        cur.execute(f"SELECT {', '.join(select)} FROM {source} {where} {group};", params)
+        data = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+        cur.close()
+        return _respond_rows(columns, data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+
 # 🚀 API untuk Mengambil Seluruh Data Pembayaran
 @app.route('/get_summary_thbl', methods=['GET'])
+@cached_route()
 def get_summary_thbl():
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
+        source = _rollup_source(cur, "rollup_status_thbl", "pembayaran_thbl")
+        cur.execute(f"""
             SELECT thbl, tepat_waktu, terlambat, belum_dibayar 
-            FROM public.pembayaran_thbl
+            FROM {source}
             ORDER BY thbl DESC;
         """)
         data = cur.fetchall()
         columns = [desc[0] for desc in cur.description]
         cur.close()
-        return jsonify([dict(zip(columns, row)) for row in data])
+        return _respond_rows(columns, data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -103,19 +299,21 @@ def get_summary_thbl():
 
 # 🚀 API untuk Mengambil Data Jumlah Pelanggan Terlambat per Subkelompok
 @app.route('/get_late_subkelompok', methods=['GET'])
+@cached_route()
 def get_late_subkelompok():
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
+        source = _rollup_source(cur, "rollup_terlambat_subkelompok", "jumlah_pelanggan_terlambat_subkelompok")
+        cur.execute(f"""
             SELECT thbl, subkelompok, jumlah_pelanggan
-            FROM public.jumlah_pelanggan_terlambat_subkelompok
+            FROM {source}
             ORDER BY thbl ASC;
         """)  # Hapus filter WHERE thbl = %s
         data = cur.fetchall()
         columns = [desc[0] for desc in cur.description]
         cur.close()
-        return jsonify([dict(zip(columns, row)) for row in data])
+        return _respond_rows(columns, data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -123,110 +321,409 @@ def get_late_subkelompok():
 
 # 🚀 API untuk Mengambil Data Jumlah Pelanggan Terlambat per Zona
 @app.route('/get_late_zona', methods=['GET'])
+@cached_route()
 def get_late_zona():
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
+        source = _rollup_source(cur, "rollup_terlambat_zona", "jumlah_pelanggan_terlambat_zona")
+        cur.execute(f"""
             SELECT thbl, zona, jumlah_pelanggan
-            FROM public.jumlah_pelanggan_terlambat_zona
+            FROM {source}
             ORDER BY thbl ASC;
         """)  # Hapus filter WHERE thbl = %s
         data = cur.fetchall()
         columns = [desc[0] for desc in cur.description]
         cur.close()
-        return jsonify([dict(zip(columns, row)) for row in data])
+        return _respond_rows(columns, data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
         conn.close()
 
-## 🔹 API: Ambil semua prediksi
+# Kolom prediksi_pembayaran yang boleh dipilih lewat parameter 'fields'
+PREDICTION_FIELDS = [
+    "thbl", "no_plg", "zona", "kd_tarif", "subkelompok", "periode", "awal_tagihan", "tgl_lunas",
+    "tgl_tenggat", "rp_tagihan", "status", "status_database", "selisih_hari", "prediksi_selisih", "is_prediksi"
+]
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+## 🔹 API: Ambil semua prediksi (dibaca dari tabel prediksi_pembayaran, keyset pagination)
 @app.route('/get_prediction', methods=['GET'])
 def predict():
     try:
-        print("📥 Menerima permintaan semua prediksi...")
-        df_pred = get_prediction()
+        limit = min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "Parameter 'limit' harus berupa angka."}), 400
+    if limit < 1:
+        return jsonify({"error": "Parameter 'limit' harus lebih dari 0."}), 400
+
+    fields = request.args.get("fields")
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(PREDICTION_FIELDS)
+    invalid = [col for col in columns if col not in PREDICTION_FIELDS]
+    if invalid:
+        return jsonify({"error": f"Kolom tidak dikenal: {', '.join(invalid)}"}), 400
+    # no_plg dan thbl selalu disertakan karena dipakai sebagai cursor
+    for col in ("thbl", "no_plg"):
+        if col not in columns:
+            columns.insert(0, col)
 
-        if isinstance(df_pred, dict) and "error" in df_pred:
-            print("❌ Gagal mengambil data:", df_pred["error"])
-            return jsonify(df_pred), 500
+    conditions, params = [], []
+    for col in ("thbl", "zona", "subkelompok"):
+        value = request.args.get(col)
+        if value:
+            conditions.append(f"{col} = %s")
+            params.append(value)
+    is_prediksi = request.args.get("is_prediksi")
+    if is_prediksi:
+        conditions.append("is_prediksi = %s")
+        params.append(is_prediksi.lower() in ("1", "true", "yes"))
 
-        print(f"✅ Mengirim {len(df_pred)} baris prediksi.")
-        return jsonify(df_pred.to_dict(orient="records"))
+    after_no_plg = request.args.get("after_no_plg")
+    after_thbl = request.args.get("after_thbl")
+    if after_no_plg is not None and after_thbl is not None:
+        conditions.append("(no_plg, thbl) > (%s, %s)")
+        params.extend([after_no_plg, after_thbl])
 
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {', '.join(columns)}
+        FROM prediksi_pembayaran
+        {where}
+        ORDER BY no_plg, thbl
+        LIMIT %s;
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params + [limit])
+        rows = cur.fetchall()
+        cur.close()
     except Exception as e:
         print("🔥 Terjadi kesalahan:")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
 
-# prediksi per nomor pelanggan
+    next_cursor = None
+    if len(rows) == limit:
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = {"after_no_plg": last["no_plg"], "after_thbl": last["thbl"]}
+    return _respond_rows(columns, rows, paginated=True, next_cursor=next_cursor)
+
+# prediksi per nomor pelanggan (index-backed: idx_prediksi_pembayaran_no_plg_thbl)
 @app.route('/get_prediction/<no_plg>', methods=['GET'])
 def get_prediction(no_plg):
     conn = get_db_connection()
-    query = f"SELECT * FROM prediksi_pembayaran WHERE no_plg = '{no_plg}' ORDER BY thbl"
-    df = pd.read_sql(query, conn)
-    conn.close()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM prediksi_pembayaran WHERE no_plg = %s ORDER BY thbl;", (no_plg,))
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+        cur.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+
+    return jsonify(_to_records(columns, rows))
+
+BATCH_LOOKUP_MAX = 1000
+STREAM_FETCH_SIZE = 2000
+
+# Kirim baris dari server-side cursor sebagai JSON array sedikit demi sedikit (tanpa DataFrame / list penuh)
+def _stream_records(conn, cur):
+    def generate():
+        try:
+            yield "["
+            first = True
+            while True:
+                rows = cur.fetchmany(STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                columns = [desc[0] for desc in cur.description]
+                for record in _to_records(columns, rows):
+                    yield ("" if first else ",") + json.dumps(record, default=str)
+                    first = False
+            yield "]"
+        finally:
+            cur.close()
+            conn.close()
+    return app.response_class(generate(), mimetype="application/json")
+
+# prediksi banyak pelanggan sekaligus: POST {"no_plg": ["...", ...]}
+@app.route('/get_prediction/batch', methods=['POST'])
+def get_prediction_batch():
+    payload = request.get_json(silent=True) or {}
+    no_plg_list = payload.get("no_plg")
+    if not isinstance(no_plg_list, list) or not no_plg_list:
+        return jsonify({"error": "Body JSON harus berisi daftar 'no_plg'."}), 400
+    no_plg_list = list(dict.fromkeys(str(n) for n in no_plg_list))
+    if len(no_plg_list) > BATCH_LOOKUP_MAX:
+        return jsonify({"error": f"Maksimal {BATCH_LOOKUP_MAX} no_plg per permintaan."}), 400
+
+    fmt = formats.negotiate(request.args.get("format"), request.headers.get("Accept"))
+    if fmt is None:
+        return jsonify({"error": f"Format tidak dikenal: {request.args.get('format')}"}), 400
+    query = "SELECT * FROM prediksi_pembayaran WHERE no_plg = ANY(%s) ORDER BY no_plg, thbl;"
+    conn = get_db_connection()
+    try:
+        if fmt != formats.RECORDS:
+            cur = conn.cursor()
+            cur.execute(query, (no_plg_list,))
+            rows = cur.fetchall()
+            columns = [desc[0] for desc in cur.description]
+            cur.close()
+            conn.close()
+            conn = None
+            return _respond_rows(columns, rows)
+
+        cur = conn.cursor(name="prediction_batch")
+        cur.itersize = STREAM_FETCH_SIZE
+        cur.execute(query, (no_plg_list,))
+        response = _stream_records(conn, cur)
+        conn = None  # ditutup oleh generator setelah streaming selesai
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn is not None:
+            conn.close()
+
+STATUS_OPTIONS = ["Belum Dibayar", "Tepat Waktu", "Terlambat"]
+STATUS_LUNAS = ["Tepat Waktu", "Terlambat"]
+STATUS_UPDATE_MAX = 5000
+STATUS_UPDATE_TABLES = ["history_pembayaran", "prediksi_pembayaran"]
+# Kolom turunan yang ditulis pipeline model.py (ada di prediksi_pembayaran, tidak di history_pembayaran)
+PIPELINE_COLUMNS = ["status_database", "selisih_hari", "awal_tagihan"]
+
+# 🚀 Update status pembayaran banyak tagihan sekaligus:
+#   POST {"updates": [{"no_plg": "...", "thbl": 202401, "status": "Tepat Waktu"}, ...]}
+# tgl_lunas diisi hari ini untuk status lunas (Tepat Waktu / Terlambat) dan dikosongkan untuk Belum Dibayar.
+# Tabel hasil pipeline (punya status_database & selisih_hari) diisi seperti PreprocessingTransformer:
+# status_database = status, tagihan belum lunas memakai hari ini sebagai tgl_lunas, selisih_hari dihitung ulang.
+# Setiap tabel diperbarui dengan satu UPDATE ... FROM (VALUES ...) dalam satu transaksi, lalu cache diinvalidasi.
+# Perubahan tercatat di log perubahan history_pembayaran, sehingga prediksi, state dan agregat
+# (rollup_pembayaran, rollup_belum_bayar) ikut diperbarui pada run inkremental model.py berikutnya.
+@app.route('/update_status', methods=['POST'])
+def update_status():
+    payload = request.get_json(silent=True) or {}
+    updates = payload.get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "Body JSON harus berisi daftar 'updates'."}), 400
+    if len(updates) > STATUS_UPDATE_MAX:
+        return jsonify({"error": f"Maksimal {STATUS_UPDATE_MAX} baris per permintaan."}), 400
 
-    # 🔧 Konversi semua kolom datetime ke string agar bisa di-serialize
-    for col in ["awal_tagihan", "tgl_tenggat", "tgl_lunas"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str)
+    today = date.today()
+    rows = {}
+    for item in updates:
+        if not isinstance(item, dict) or not all(item.get(k) not in (None, "") for k in ("no_plg", "thbl", "status")):
+            return jsonify({"error": "Setiap update harus berisi 'no_plg', 'thbl' dan 'status'."}), 400
+        if item["status"] not in STATUS_OPTIONS:
+            return jsonify({"error": f"Status tidak dikenal: {item['status']}"}), 400
+        tgl_lunas = today if item["status"] in STATUS_LUNAS else None
+        # baris ganda untuk (no_plg, thbl) yang sama: yang terakhir dipakai
+        rows[(str(item["no_plg"]), str(item["thbl"]))] = (
+            str(item["no_plg"]), str(item["thbl"]), item["status"], tgl_lunas, today
+        )
+    rows = list(rows.values())
 
-    return jsonify(df.to_dict(orient="records"))
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        updated = {}
+        for table in STATUS_UPDATE_TABLES:
+            # Tipe kolom asli (mis. bigint / varchar) agar nilai di VALUES bisa di-cast dan index (no_plg, thbl)
+            # tetap terpakai; {} = tabel belum ada (mis. prediksi belum pernah dibangun)
+            types = _table_columns(cur, table)
+            if not types:
+                continue
+            template = (f"(CAST(%s AS {types['no_plg']}), CAST(%s AS {types['thbl']}), "
+                        f"CAST(%s AS {types['status']}), CAST(%s AS {types['tgl_lunas']}), CAST(%s AS date))")
+            assignments = "status = v.status, tgl_lunas = v.tgl_lunas"
+            if all(col in types for col in PIPELINE_COLUMNS):
+                assignments = """status = v.status, status_database = v.status,
+                    tgl_lunas = COALESCE(v.tgl_lunas, v.hari_ini),
+                    selisih_hari = COALESCE(CAST(COALESCE(v.tgl_lunas, v.hari_ini) AS date)
+                                            - CAST(t.awal_tagihan AS date), 0)"""
+            result = execute_values(cur, f"""
+                UPDATE {table} AS t
+                SET {assignments}
+                FROM (VALUES %s) AS v(no_plg, thbl, status, tgl_lunas, hari_ini)
+                WHERE t.no_plg = v.no_plg AND t.thbl = v.thbl
+                RETURNING t.no_plg, t.thbl;
+            """, rows, template=template, page_size=len(rows), fetch=True)
+            updated[table] = len(result)
+        cache.bump_version(cur)
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
 
-# pelanggan belum bayar
+    version = cache.refresh_local()
+    response_cache.clear()
+    return jsonify({
+        "requested": len(rows),
+        "updated": updated,
+        "min_thbl": min(row[1] for row in rows),
+        "version": version,
+    })
+
+# Kolom rollup_belum_bayar / pelanggan_belum_bayar yang boleh dipakai untuk sort / group_by
+TUNGGAKAN_SORTS = ["jumlah_bulan", "no_plg"]
+TUNGGAKAN_GROUPS = ["zona", "subkelompok"]
+
+# pelanggan belum bayar: filter, sort, keyset pagination, count_only & group_by dihitung di database
+#   ?zona=&subkelompok=&min_bulan=   filter
+#   ?sort=jumlah_bulan|no_plg&order=desc|asc
+#   ?limit=N[&after_no_plg=..&after_jumlah_bulan=..]   halaman berikutnya (kursor di next_cursor)
+#   ?count_only=1                    hanya jumlah baris
+#   ?group_by=zona|subkelompok       jumlah pelanggan per jumlah_bulan x dimensi
 @app.route('/api/pelanggan_belum_bayar', methods=['GET'])
 def get_pelanggan_belum_bayar():
+    sort = request.args.get("sort", "jumlah_bulan")
+    order = request.args.get("order", "desc").lower()
+    group_by = request.args.get("group_by")
+    if sort not in TUNGGAKAN_SORTS or order not in ("asc", "desc"):
+        return jsonify({"error": "Parameter 'sort'/'order' tidak dikenal."}), 400
+    if group_by and group_by not in TUNGGAKAN_GROUPS:
+        return jsonify({"error": f"Parameter 'group_by' tidak dikenal: {group_by}"}), 400
+
+    limit = request.args.get("limit")
+    try:
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else None
+        min_bulan = int(request.args["min_bulan"]) if request.args.get("min_bulan") else None
+    except ValueError:
+        return jsonify({"error": "Parameter 'limit'/'min_bulan' harus berupa angka."}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "Parameter 'limit' harus lebih dari 0."}), 400
+
+    conditions, params = [], []
+    for col in TUNGGAKAN_GROUPS:
+        value = request.args.get(col)
+        if value:
+            conditions.append(f"{col} = %s")
+            params.append(value)
+    if min_bulan is not None:
+        conditions.append("jumlah_bulan >= %s")
+        params.append(min_bulan)
+
+    count_only = request.args.get("count_only", "").lower() in ("1", "true", "yes")
+    if count_only:
+        query, query_params = "SELECT COUNT(*) FROM {source}", list(params)
+    elif group_by:
+        query = f"SELECT jumlah_bulan, {group_by}, COUNT(*) AS jumlah_pelanggan FROM {{source}}"
+        query_params = list(params)
+    else:
+        # Keyset: (kolom sort, no_plg) sebagai kunci unik; arah pembanding mengikuti urutan
+        comparator = "<" if order == "desc" else ">"
+        after_no_plg = request.args.get("after_no_plg")
+        after_sort = request.args.get(f"after_{sort}")
+        if sort == "no_plg" and after_no_plg is not None:
+            conditions.append(f"no_plg {comparator} %s")
+            params.append(after_no_plg)
+        elif after_no_plg is not None and after_sort is not None:
+            conditions.append(f"({sort}, no_plg) {comparator} (%s, %s)")
+            params.extend([after_sort, after_no_plg])
+        query = "SELECT no_plg, jumlah_bulan, subkelompok, zona FROM {source}"
+        query_params = list(params)
+
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if group_by and not count_only:
+        query += f" GROUP BY jumlah_bulan, {group_by} ORDER BY jumlah_bulan, {group_by}"
+    elif not count_only:
+        order_by = f"{sort} {order}" if sort == "no_plg" else f"{sort} {order}, no_plg {order}"
+        query += f" ORDER BY {order_by}"
+        if limit is not None:
+            query += " LIMIT %s"
+            query_params.append(limit)
+
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute('SELECT * FROM pelanggan_belum_bayar')
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    try:
+        cur = conn.cursor()
+        source = _rollup_source(cur, "rollup_belum_bayar", "pelanggan_belum_bayar")
+        cur.execute(query.format(source=source) + ";", query_params)
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+        cur.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
 
-    return jsonify(rows)
+    if count_only:
+        return jsonify({"count": rows[0][0]})
+    if group_by or limit is None:
+        return _respond_rows(columns, rows)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = {"after_no_plg": last["no_plg"]}
+        if sort != "no_plg":
+            next_cursor[f"after_{sort}"] = last[sort]
+    return _respond_rows(columns, rows, paginated=True, next_cursor=next_cursor)
 
 # Dropdown pilih THBL
 @app.route("/get_thbl_options", methods=["GET"])
+@cached_route()
 def get_thbl_options():
     conn = get_db_connection()
-    query = """
-        SELECT DISTINCT thbl
-        FROM prediksi_pembayaran
-        WHERE is_prediksi = true
-        ORDER BY thbl;
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT thbl
+            FROM prediksi_pembayaran
+            WHERE is_prediksi = true
+            ORDER BY thbl;
+        """)
+        rows = cur.fetchall()
+        cur.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+
     # Convert thbl ke list dan kirim sebagai JSON
-    thbl_list = df["thbl"].astype(str).tolist()
+    thbl_list = [str(row[0]) for row in rows]
     return jsonify(thbl_list)
 
 # Prediksi Belum Bayar Sesuai THBL
 @app.route("/get_prediksi_thbl", methods=["GET"])
+@cached_route()
 def get_prediksi_by_thbl():
     thbl = request.args.get("thbl")
     if not thbl:
         return jsonify({"error": "Parameter 'thbl' tidak diberikan."}), 400
 
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
-        query = f"""
+        cur = conn.cursor()
+        cur.execute("""
             SELECT no_plg, thbl, zona, subkelompok, prediksi_selisih
             FROM prediksi_pembayaran
-            WHERE is_prediksi = true 
+            WHERE is_prediksi = true
               AND prediksi_selisih > 15
-              AND thbl = {thbl}
+              AND thbl = %s
             ORDER BY no_plg;
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return jsonify(df.to_dict(orient="records"))
+        """, (thbl,))
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+        cur.close()
+        return jsonify(_to_records(columns, rows))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
 
 
+# Server bawaan Flask hanya untuk development; produksi lewat wsgi.py (gunicorn / waitress)
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    db.warmup()
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1")
\ No newline at end of file
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 🔹 Benchmark memori pipeline prediksi: mode default vs mode compact (tanpa salinan + dtype hemat)
+# Setiap mode dijalankan di proses terpisah agar peak RSS tidak saling tercampur.
+MODES = ["default", "compact"]
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KB, macOS melaporkan byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_mode(mode, customers, months):
+    from benchmarks.synthetic import generate_history
+    import model
+
+    data = generate_history(customers=customers, months=months)
+    rss_awal = current_rss_mb()
+    peak_awal = peak_rss_mb()
+
+    pipeline = model.build_pipeline(compact=(mode == "compact"))
+    start = time.perf_counter()
+    hasil = pipeline.fit_transform(data)
+    durasi = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "rows": len(data),
+        "output_rows": len(hasil),
+        "seconds": round(durasi, 3),
+        "rss_after_load_mb": round(rss_awal, 1),
+        "peak_rss_mb": round(max(peak_rss_mb(), peak_awal), 1),
+        "peak_increase_mb": round(peak_rss_mb() - rss_awal, 1),
+        "output_mb": round(hasil.memory_usage(deep=True).sum() / (1024 * 1024), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan peak RSS pipeline prediksi per mode.")
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=10)
+    parser.add_argument("--mode", choices=MODES, help="(internal) jalankan satu mode saja")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.customers, args.months)))
+        return
+
+    hasil = []
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--mode", mode,
+             "--customers", str(args.customers), "--months", str(args.months)],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        hasil.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<10}{'rows':>10}{'detik':>9}{'RSS data':>11}{'peak RSS':>11}{'naik':>9}{'output':>9}")
+    for r in hasil:
+        print(f"{r['mode']:<10}{r['rows']:>10}{r['seconds']:>9}{r['rss_after_load_mb']:>11}"
+              f"{r['peak_rss_mb']:>11}{r['peak_increase_mb']:>9}{r['output_mb']:>9}")
+
+if __name__ == "__main__":
+    main()
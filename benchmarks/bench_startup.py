@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# 🔹 Benchmark waktu start-up: lama "import <modul>" di interpreter baru dan library berat yang ikut termuat
+#
+#   python -m benchmarks.bench_startup
+#   python -m benchmarks.bench_startup --modules app model --repeat 10
+MODULES = ["app", "model", "formats", "cache", "db"]
+HEAVY = ["pandas", "numpy", "sklearn", "pyarrow", "sqlalchemy", "flask"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def run_once(module):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                         capture_output=True, text=True, check=True, cwd=ROOT)
+    total = time.perf_counter() - start
+    hasil = json.loads(out.stdout.strip().splitlines()[-1])
+    hasil["process_s"] = total
+    return hasil
+
+def bench(module, repeat):
+    runs = [run_once(module) for _ in range(repeat)]
+    imports = [r["import_s"] for r in runs]
+    proses = [r["process_s"] for r in runs]
+    return {
+        "repeat": repeat,
+        "import_p50_s": round(float(np.median(imports)), 4),
+        "import_min_s": round(min(imports), 4),
+        "process_p50_s": round(float(np.median(proses)), 4),
+        "loaded": runs[-1]["loaded"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Ukur waktu start-up modul API dan pipeline.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    results = {module: bench(module, args.repeat) for module in args.modules}
+    print(f"{'modul':<10}{'import p50':>12}{'import min':>12}{'proses p50':>12}  library berat")
+    for module, r in results.items():
+        print(f"{module:<10}{r['import_p50_s']:>11.3f}s{r['import_min_s']:>11.3f}s"
+              f"{r['process_p50_s']:>11.3f}s  {', '.join(r['loaded']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Hasil disimpan ke {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+# 🔹 Load test API: N pengguna dashboard bersamaan, masing-masing dengan Session (keep-alive) sendiri
+#
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --users 20 --duration 30
+#
+# Bandingkan server development dengan gunicorn / waitress:
+#   python app.py                                   &  python -m benchmarks.load_test --output dev.json
+#   gunicorn -c gunicorn.conf.py wsgi:app           &  python -m benchmarks.load_test --output gunicorn.json
+
+def default_endpoints(thbl):
+    return [
+        f"/get_summary?thbl={thbl}",
+        f"/get_aggregate?thbl={thbl}&group_by=zona,status&measures=count,kerugian",
+        "/get_summary_thbl",
+        "/get_late_zona",
+        "/api/pelanggan_belum_bayar?limit=100",
+        "/get_prediction?limit=1000",
+    ]
+
+def user_loop(base_url, endpoints, deadline, offset, results, lock, timeout):
+    session = requests.Session()
+    i = offset
+    while time.perf_counter() < deadline:
+        endpoint = endpoints[i % len(endpoints)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            status = session.get(base_url + endpoint, timeout=timeout).status_code
+        except requests.exceptions.RequestException:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[endpoint].append((elapsed, status))
+
+def summarize(samples, duration):
+    latencies = [s[0] for s in samples]
+    errors = sum(1 for s in samples if s[1] is None or s[1] >= 500)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / duration, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1) if latencies else 0.0,
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1) if latencies else 0.0,
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1) if latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test API dengan pengguna dashboard bersamaan.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Detik")
+    parser.add_argument("--thbl", default="202401")
+    parser.add_argument("--endpoints", nargs="+", help="Daftar path (default: endpoint halaman dashboard)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    endpoints = args.endpoints or default_endpoints(args.thbl)
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [
+        threading.Thread(target=user_loop,
+                         args=(args.url.rstrip("/"), endpoints, deadline, i, results, lock, args.timeout))
+        for i in range(args.users)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+
+    semua = [s for samples in results.values() for s in samples]
+    hasil = {
+        "config": {"url": args.url, "users": args.users, "duration_s": round(duration, 1)},
+        "total": summarize(semua, duration),
+        "endpoints": {endpoint: summarize(results[endpoint], duration) for endpoint in endpoints},
+    }
+
+    print(f"{'endpoint':<70}{'req':>7}{'err':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for nama, r in list(hasil["endpoints"].items()) + [("TOTAL", hasil["total"])]:
+        print(f"{nama:<70}{r['requests']:>7}{r['errors']:>6}{r['rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(hasil, f, indent=2)
+        print(f"✅ Hasil disimpan ke {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 🔹 Benchmark pipeline prediksi & API dengan data sintetis
+#
+#   python -m benchmarks.run_benchmarks --customers 100000 --months 12
+#   python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json --tolerance 0.2
+#
+# Benchmark database (--db) memakai Postgres lokal sesuai konfigurasi db.py dan menulis ke
+# schema terpisah (default "bench") sehingga tabel produksi tidak tersentuh.
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def measure(fn, repeat, rows=None):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    # Peak memori diukur pada satu eksekusi terpisah agar tidak memperlambat pengukuran waktu
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = float(np.mean(latencies))
+    hasil = {
+        "repeat": repeat,
+        "mean_s": round(mean, 4),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p95_s": round(percentile(latencies, 95), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "peak_mem_mb": round(peak / (1024 * 1024), 1),
+    }
+    if rows:
+        hasil["rows_per_s"] = round(rows / mean, 1)
+    return hasil
+
+def bench_pipeline(data, repeat, workers=1):
+    import model
+
+    hasil = {}
+    preprocessing = model.PreprocessingTransformer()
+    moving_average = model.MovingAverageTransformer()
+    preprocessed = preprocessing.transform(data)
+
+    hasil["preprocessing"] = measure(lambda: preprocessing.transform(data), repeat, len(data))
+    hasil["moving_average"] = measure(lambda: moving_average.transform(preprocessed), repeat, len(data))
+    hasil["pipeline"] = measure(lambda: model.build_pipeline().fit_transform(data), repeat, len(data))
+    hasil["pipeline_compact"] = measure(
+        lambda: model.build_pipeline(compact=True).fit_transform(data.copy()), repeat, len(data)
+    )
+    if workers > 1:
+        hasil[f"pipeline_parallel_{workers}"] = measure(
+            lambda: model.run_pipeline_parallel(data, workers=workers), repeat, len(data)
+        )
+    return hasil
+
+# 🔹 Siapkan schema benchmark berisi history_pembayaran sintetis
+def prepare_database(data, schema):
+    import db
+
+    db.DB_SEARCH_PATH = schema
+    db.dispose()
+
+    import model
+    from sqlalchemy import text
+
+    with db.get_engine().begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema};"))
+        model.replace_table_with_copy(conn, data, "history_pembayaran")
+        conn.execute(text("CREATE INDEX ON history_pembayaran (thbl);"))
+        conn.execute(text("CREATE INDEX ON history_pembayaran (no_plg, thbl);"))
+        model.refresh_rollups(conn)
+
+def bench_database(data, repeat, requests_per_endpoint):
+    import model
+    import app as api
+
+    hasil = {}
+    prediksi = model.build_pipeline().fit_transform(data)
+    hasil["load_data"] = measure(model.load_data, repeat, len(data))
+    hasil["save_predictions"] = measure(lambda: model.save_predictions(prediksi.copy()), repeat, len(prediksi))
+
+    thbl = int(data["thbl"].max())
+    endpoints = [
+        "/get_available_thbl",
+        f"/get_summary?thbl={thbl}",
+        f"/get_aggregate?thbl={thbl}&group_by=zona,status&measures=count,kerugian",
+        "/get_prediction?limit=1000",
+        f"/get_prediksi_thbl?thbl={thbl + 1}",
+    ]
+    client = api.app.test_client()
+    for endpoint in endpoints:
+        api.response_cache.clear()
+        hasil[f"GET {endpoint}"] = measure(lambda: client.get(endpoint), requests_per_endpoint)
+    return hasil
+
+# 🔹 Bandingkan dengan baseline: regresi jika median (p50) lebih lambat dari toleransi
+def compare(results, baseline, tolerance):
+    regresi = []
+    for nama, nilai in results["benchmarks"].items():
+        dasar = baseline.get("benchmarks", {}).get(nama)
+        if not dasar:
+            continue
+        rasio = nilai["p50_s"] / dasar["p50_s"] if dasar["p50_s"] else 1.0
+        status = "REGRESI" if rasio > 1 + tolerance else "ok"
+        print(f"{nama:<70} {dasar['p50_s']:>9.4f}s -> {nilai['p50_s']:>9.4f}s  x{rasio:.2f}  {status}")
+        if status == "REGRESI":
+            regresi.append(nama)
+    return regresi
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline prediksi dan API dengan data sintetis.")
+    parser.add_argument("--customers", type=int, default=50000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--zona", type=int, default=30)
+    parser.add_argument("--subkelompok", type=int, default=12)
+    parser.add_argument("--status-mix", default="0.6,0.3,0.1",
+                        help="Proporsi Tepat Waktu,Terlambat,Belum Dibayar")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="Ukur juga pipeline paralel dengan N proses")
+    parser.add_argument("--db", action="store_true", help="Jalankan juga benchmark database & endpoint")
+    parser.add_argument("--schema", default="bench")
+    parser.add_argument("--requests", type=int, default=50, help="Jumlah request per endpoint")
+    parser.add_argument("--output", help="Simpan hasil ke file JSON")
+    parser.add_argument("--save-baseline", help="Simpan hasil sebagai baseline")
+    parser.add_argument("--compare", help="File baseline untuk deteksi regresi")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import generate_history
+
+    status_mix = tuple(float(x) for x in args.status_mix.split(","))
+    data = generate_history(customers=args.customers, months=args.months, zona=args.zona,
+                            subkelompok=args.subkelompok, status_mix=status_mix)
+    print(f"📊 Data sintetis: {len(data)} baris ({args.customers} pelanggan x {args.months} bulan)")
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "save_baseline", "compare")},
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "benchmarks": bench_pipeline(data, args.repeat, args.workers),
+    }
+    if args.db:
+        prepare_database(data, args.schema)
+        results["benchmarks"].update(bench_database(data, args.repeat, args.requests))
+
+    for nama, nilai in results["benchmarks"].items():
+        throughput = f"{nilai['rows_per_s']:>12,.0f} baris/s" if "rows_per_s" in nilai else " " * 19
+        print(f"{nama:<70} mean {nilai['mean_s']:.4f}s  p95 {nilai['p95_s']:.4f}s  "
+              f"{throughput}  peak {nilai['peak_mem_mb']} MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"✅ Hasil disimpan ke {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regresi = compare(results, baseline, args.tolerance)
+        if regresi:
+            print(f"❌ {len(regresi)} benchmark melambat lebih dari {args.tolerance:.0%}.")
+            sys.exit(1)
+        print("✅ Tidak ada regresi.")
+
+if __name__ == "__main__":
+    main()
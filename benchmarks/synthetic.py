@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+# 🔹 Data sintetis berstruktur sama dengan tabel history_pembayaran
+STATUS = ["Tepat Waktu", "Terlambat", "Belum Dibayar"]
+
+def generate_history(customers=100000, months=10, zona=30, subkelompok=12,
+                     status_mix=(0.6, 0.3, 0.1), start_thbl=202301, seed=42):
+    rng = np.random.default_rng(seed)
+    n = customers * months
+
+    no_plg = np.char.zfill(np.arange(customers).astype(str), 8)
+    bulan_ke = np.tile(np.arange(months), customers)
+    tahun0, bulan0 = divmod(start_thbl, 100)
+    bulan_abs = (tahun0 * 12 + bulan0 - 1) + bulan_ke
+    thbl = (bulan_abs // 12) * 100 + bulan_abs % 12 + 1
+
+    awal_tagihan = pd.to_datetime({"year": bulan_abs // 12, "month": bulan_abs % 12 + 1, "day": 1})
+    status = rng.choice(STATUS, size=n, p=np.asarray(status_mix) / np.sum(status_mix))
+    hari_bayar = np.where(
+        status == "Tepat Waktu", rng.integers(0, 20, n),
+        rng.integers(21, 60, n)
+    )
+    tgl_lunas = awal_tagihan + pd.to_timedelta(hari_bayar, unit="D")
+    tgl_lunas = tgl_lunas.where(status != "Belum Dibayar", pd.NaT)
+
+    # Zona & subkelompok tetap per pelanggan
+    zona_plg = rng.integers(1, zona + 1, customers)
+    sub_plg = rng.integers(1, subkelompok + 1, customers)
+
+    return pd.DataFrame({
+        "thbl": thbl,
+        "no_plg": np.repeat(no_plg, months).astype(object),
+        "zona": np.repeat(zona_plg, months).astype(str).astype(object),
+        "kd_tarif": "2A",
+        "subkelompok": np.char.add("SUB-", np.repeat(sub_plg, months).astype(str)).astype(object),
+        "periode": bulan_ke + 1,
+        "awal_tagihan": awal_tagihan,
+        "tgl_lunas": tgl_lunas,
+        "tgl_tenggat": awal_tagihan + pd.Timedelta(days=20),
+        "rp_tagihan": rng.integers(20, 600, n) * 1000,
+        "status": status.astype(object),
+    })
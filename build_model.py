@@ -0,0 +1,75 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from datetime import datetime
+
+import sklearn
+
+import model
+
+# 🔹 Bangun artefak model pipeline secara eksplisit (tidak lagi terjadi saat model.py diimpor)
+#
+#   python build_model.py                 -> artifacts/model-v<versi>.pkl + manifest, lalu perbarui model.pkl
+#   python build_model.py --compact --window 3
+#
+# Semua file ditulis ke file sementara lalu os.replace() sehingga pembaca tidak pernah melihat
+# artefak setengah jadi.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(BASE_DIR, "artifacts")
+CURRENT_ARTIFACT = os.path.join(BASE_DIR, "model.pkl")
+
+def write_atomic(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def build(window=2, compact=False, artifact_dir=ARTIFACT_DIR, current=CURRENT_ARTIFACT):
+    pipeline = model.build_pipeline(window=window, compact=compact)
+    payload = pickle.dumps(pipeline, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.makedirs(artifact_dir, exist_ok=True)
+    artifact = os.path.join(artifact_dir, f"model-v{model.MODEL_VERSION}.pkl")
+    manifest = {
+        "version": model.MODEL_VERSION,
+        "artifact": os.path.basename(artifact),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "params": {"window": window, "compact": compact},
+        "sklearn": sklearn.__version__,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    write_atomic(artifact, payload)
+    write_atomic(os.path.join(artifact_dir, f"model-v{model.MODEL_VERSION}.json"),
+                 json.dumps(manifest, indent=2).encode())
+    if current:
+        write_atomic(current, payload)
+    return artifact, manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun artefak model pipeline prediksi.")
+    parser.add_argument("--window", type=int, default=2)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR)
+    parser.add_argument("--no-current", action="store_true", help="Jangan perbarui model.pkl")
+    args = parser.parse_args()
+
+    artifact, manifest = build(window=args.window, compact=args.compact, artifact_dir=args.artifact_dir,
+                               current=None if args.no_current else CURRENT_ARTIFACT)
+    print(f"✅ Model pipeline v{manifest['version']} disimpan sebagai '{artifact}' (sha256 {manifest['sha256'][:12]})")
+    if not args.no_current:
+        print(f"✅ '{CURRENT_ARTIFACT}' diperbarui")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+# 🔹 Konfigurasi cache respons API
+CACHE_DIR = os.getenv("API_CACHE_DIR")  # isi untuk mengaktifkan cache di disk (dibagi antar worker)
+DEFAULT_TTL = int(os.getenv("API_CACHE_TTL", "300"))
+MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))
+
+# 🔹 Versi data disimpan di database (tabel prediksi_meta, key 'data_version') dan di-bump dalam transaksi
+# yang sama dengan penulisan data, sehingga semua worker, host dan container yang memakai database yang sama
+# melihat invalidasi yang sama. Setiap proses membaca ulang versi paling lama tiap VERSION_TTL detik.
+# Token berawalan waktu UTC (YYYYMMDDHH24MISSUS) sehingga urut secara string: versi lebih baru > versi lama.
+VERSION_TABLE = "prediksi_meta"
+VERSION_KEY = "data_version"
+VERSION_TTL = float(os.getenv("API_CACHE_VERSION_TTL", "2"))
+
+BUMP_VERSION_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (key TEXT PRIMARY KEY, value TEXT);
+    INSERT INTO {VERSION_TABLE} (key, value)
+    VALUES ('{VERSION_KEY}', to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYYYMMDDHH24MISSUS')
+                             || substr(md5(random()::text), 1, 6))
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;
+"""
+
+_version_lock = threading.Lock()
+_version = {"checked": 0.0, "token": None}
+
+def _read_version():
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT to_regclass('{VERSION_TABLE}') IS NOT NULL;")
+        row = None
+        if cur.fetchone()[0]:
+            cur.execute(f"SELECT value FROM {VERSION_TABLE} WHERE key = %s;", (VERSION_KEY,))
+            row = cur.fetchone()
+        cur.close()
+        return row[0] if row else "0"
+    finally:
+        conn.close()
+
+def current_version():
+    now = time.monotonic()
+    with _version_lock:
+        if _version["token"] is not None and now - _version["checked"] < VERSION_TTL:
+            return _version["token"]
+        try:
+            _version["token"] = _read_version()
+        except Exception as e:
+            # Database tidak terjangkau: pakai versi terakhir yang diketahui
+            print(f"⚠️ Gagal membaca versi data: {e}")
+            _version["token"] = _version["token"] or "0"
+        _version["checked"] = now
+        return _version["token"]
+
+# 🔹 Bump versi di dalam transaksi pemanggil (koneksi SQLAlchemy di model.py atau cursor psycopg2 di app.py);
+# versi baru baru terlihat oleh proses lain setelah transaksi itu commit
+def bump_version(conn):
+    if hasattr(conn, "exec_driver_sql"):
+        conn.exec_driver_sql(BUMP_VERSION_SQL)
+    else:
+        conn.execute(BUMP_VERSION_SQL)
+
+# 🔹 Setelah commit: baca ulang versi di proses ini dan hapus cache disk lama
+def refresh_local():
+    with _version_lock:
+        _version["checked"] = 0.0
+
+    if CACHE_DIR and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".cache"):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, name))
+                except OSError:
+                    pass
+    return current_version()
+
+# 🔹 Invalidasi manual: bump versi dalam transaksi sendiri
+def invalidate():
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+        bump_version(cur)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    return refresh_local()
+
+# 🔹 Cache in-process dengan TTL + LRU, opsional disimpan juga ke disk
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES, cache_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".cache")
+
+    def get(self, key):
+        version = current_version()
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                item_version, expires, value = item
+                if item_version == version and expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    item_version, expires, value = pickle.load(f)
+                if item_version == version and expires > now:
+                    self._store(key, (item_version, expires, value))
+                    with self._lock:
+                        self.hits += 1
+                    return value
+            except (OSError, pickle.PickleError, EOFError, ValueError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=DEFAULT_TTL):
+        item = (current_version(), time.time() + ttl, value)
+        self._store(key, item)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(item, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def _store(self, key, item):
+        with self._lock:
+            self._entries[key] = item
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": current_version(),
+            }
@@ -1,8 +1,14 @@
 import streamlit as st
 import requests
+import os
+import functools
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
 from datetime import datetime
+import api_client
+import shared_cache
 
 st.set_page_config(layout="wide")
 
@@ -14,69 +20,222 @@ nav_selection = st.sidebar.radio(
     ("Dashboard Pola Pembayaran Pelanggan", "Layanan Monitoring Pelanggan", "Indikasi Pelanggan Terlambat")
 )
 
-@st.cache_data
-def get_data(thbl):
-    if not thbl:
-        return pd.DataFrame()
+# 🔹 Kebijakan cache per endpoint: TTL (detik) & jumlah entri maksimum.
+# Semua kunci cache menyertakan versi data dari API sehingga cache otomatis baru setelah prediksi dibangun ulang;
+# TTL hanya batas atas untuk perubahan di luar batch (mis. tabel diubah manual).
+CACHE_POLICY = {
+    "summary": {"ttl": 3600, "max_entries": 64},
+    "aggregate": {"ttl": 3600, "max_entries": 128},
+    "summary_thbl": {"ttl": 3600, "max_entries": 4},
+    "late_subkelompok": {"ttl": 3600, "max_entries": 4},
+    "late_zona": {"ttl": 3600, "max_entries": 4},
+    "thbl_options": {"ttl": 3600, "max_entries": 4},
+    "prediksi_thbl": {"ttl": 1800, "max_entries": 24},
+    "prediction": {"ttl": 600, "max_entries": 256},
+    "belum_bayar_page": {"ttl": 900, "max_entries": 256},
+    "belum_bayar_count": {"ttl": 900, "max_entries": 64},
+    "belum_bayar_group": {"ttl": 900, "max_entries": 8},
+}
+VERSION_TTL = 30  # detik antar pengecekan versi data ke API
+STATUS_OPTIONS = ["Belum Dibayar", "Tepat Waktu", "Terlambat"]
+STATUS_LUNAS = ["Tepat Waktu", "Terlambat"]  # status yang mengisi tgl_lunas
+
+def cached(name):
+    return st.cache_data(show_spinner=False, **CACHE_POLICY[name])
+
+# Fetcher DataFrame: bila cache bersama disk aktif, frame dibaca zero-copy dari memory map setiap rerun;
+# st.cache_data hanya dipakai saat cache bersama tidak aktif atau versi data tidak diketahui,
+# karena lapisan itu menyimpan (dan mengembalikan) salinan per proses.
+def cached_frame(name):
+    def decorator(fn):
+        per_process = cached(name)(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, version=None):
+            if version is not None and shared_cache.zero_copy():
+                return fn(*args, version=version)
+            return per_process(*args, version=version)
+        return wrapper
+    return decorator
+
+# Opsi cache bersama antar replika (shared_cache): kunci endpoint + params + versi, TTL sama dengan kebijakan
+def shared(name, version):
+    return {"version": version, "ttl": CACHE_POLICY[name]["ttl"]}
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def _data_version():
+    return api_client.get_json("/get_data_version")["version"]
+
+def data_version():
     try:
-        url = f"http://127.0.0.1:5000/get_data?thbl={thbl}"
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data) if isinstance(data, list) else pd.DataFrame()
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Gagal mengambil data: {e}")
-        return pd.DataFrame()
+        return _data_version()
+    except (requests.exceptions.RequestException, KeyError, ValueError):
+        return None
+
+# 🔹 Fetcher ber-cache: hanya hasil sukses yang disimpan (exception tidak di-cache oleh st.cache_data)
+@cached("summary")
+def _get_summary(thbl, version):
+    return api_client.get_json("/get_summary", params={"thbl": thbl}, **shared("summary", version)) if thbl else None
 
-def get_summary(thbl):
+# Agregasi dihitung di server: hanya hasil group by yang dikirim
+@cached_frame("aggregate")
+def _get_aggregate(thbl, group_by, measures, version):
     if not thbl:
-        return None
-    try:
-        response = requests.get(f"http://127.0.0.1:5000/get_summary?thbl={thbl}", timeout=60)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Gagal mengambil ringkasan: {e}")
-        return None
+        return pd.DataFrame()
+    params = {"thbl": thbl, "group_by": group_by, "measures": measures}
+    return api_client.fetch_frame("/get_aggregate", params=params, **shared("aggregate", version))
+
+@cached_frame("summary_thbl")
+def _get_summary_thbl(version):
+    return api_client.fetch_frame("/get_summary_thbl", **shared("summary_thbl", version))
+
+# Data keterlambatan per subkelompok / zona (tab Pola Pembayaran per Kategori)
+@cached_frame("late_subkelompok")
+def _get_late_subkelompok(version):
+    return api_client.fetch_frame("/get_late_subkelompok", **shared("late_subkelompok", version))
+
+@cached_frame("late_zona")
+def _get_late_zona(version):
+    return api_client.fetch_frame("/get_late_zona", **shared("late_zona", version))
 
-@st.cache_data
-def get_summary_thbl():
+@cached("thbl_options")
+def _get_thbl_options(version):
+    return api_client.get_json("/get_thbl_options", **shared("thbl_options", version))
+
+@cached("prediksi_thbl")
+def _get_prediksi_thbl(thbl, version):
+    return api_client.get_json("/get_prediksi_thbl", params={"thbl": thbl}, **shared("prediksi_thbl", version))
+
+@cached("prediction")
+def _get_prediction(no_plg, version):
+    if not no_plg:
+        return None
+    return api_client.get_json(f"/get_prediction/{no_plg}", timeout=(api_client.CONNECT_TIMEOUT, 200))
+
+# Daftar tunggakan diambil per halaman; filter, urutan & pagination dihitung di server
+@cached("belum_bayar_page")
+def _get_belum_bayar_page(params, version):
+    df, next_cursor = api_client.fetch_page("/api/pelanggan_belum_bayar", params=dict(params))
+    if not df.empty and not {"no_plg", "jumlah_bulan", "subkelompok", "zona"}.issubset(df.columns):
+        raise ValueError("Format data dari API tidak sesuai.")
+    return df, next_cursor
+
+@cached("belum_bayar_count")
+def _get_belum_bayar_count(params, version):
+    return api_client.get_json("/api/pelanggan_belum_bayar", params={**dict(params), "count_only": 1})["count"]
+
+# Jumlah pelanggan per jumlah_bulan x zona/subkelompok (untuk grafik)
+@cached_frame("belum_bayar_group")
+def _get_belum_bayar_group(group_by, version):
+    return api_client.fetch_frame("/api/pelanggan_belum_bayar", params={"group_by": group_by},
+                                 **shared("belum_bayar_group", version))
+
+# nama -> (fetcher, nilai pengganti saat gagal)
+FETCHERS = {
+    "summary": (_get_summary, lambda: None),
+    "aggregate": (_get_aggregate, pd.DataFrame),
+    "summary_thbl": (_get_summary_thbl, pd.DataFrame),
+    "late_subkelompok": (_get_late_subkelompok, pd.DataFrame),
+    "late_zona": (_get_late_zona, pd.DataFrame),
+    "thbl_options": (_get_thbl_options, list),
+    "prediksi_thbl": (_get_prediksi_thbl, lambda: None),
+    "prediction": (_get_prediction, lambda: None),
+    "belum_bayar_page": (_get_belum_bayar_page, lambda: (pd.DataFrame(), None)),
+    "belum_bayar_count": (_get_belum_bayar_count, lambda: None),
+    "belum_bayar_group": (_get_belum_bayar_group, pd.DataFrame),
+}
+
+# 🔹 Satu pintu untuk semua data dashboard: cache per endpoint + versi data, error ditampilkan di halaman
+def fetch(name, *args):
+    fetcher, fallback = FETCHERS[name]
     try:
-        response = requests.get("http://127.0.0.1:5000/get_summary_thbl", timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data) if isinstance(data, list) else pd.DataFrame()
+        return fetcher(*args, version=data_version())
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Error API: {e.response.status_code}, {e.response.text}")
     except requests.exceptions.RequestException as e:
         st.error(f"❌ Gagal mengambil data: {e}")
-        return pd.DataFrame()
+    except ValueError as e:
+        st.error(f"Format data tidak valid: {e}")
+    return fallback()
+
+# 🔹 Cache figure Plotly: px.line/px.bar lambat untuk frame besar, jadi spesifikasi figure (JSON) disimpan
+# per (grafik, filter, versi data) dan cukup di-parse ulang saat rerun (mis. multiselect berubah).
+# _build diawali underscore agar tidak ikut di-hash oleh st.cache_data; filter harus menentukan isi grafik.
+FIGURE_POLICY = {"ttl": 3600, "max_entries": 256}
+MAX_POINTS = int(os.getenv("DASHBOARD_MAX_POINTS", "120"))  # titik maksimum per seri sebelum diagregasi
+
+@st.cache_data(show_spinner=False, **FIGURE_POLICY)
+def _figure_json(chart, filters, version, _build):
+    return _build().to_json()
+
+def cached_figure(chart, filters, build):
+    version = data_version()
+    if version is None:
+        return build()
+    return pio.from_json(_figure_json(chart, filters, version, build))
+
+# 🔹 Agregasi seri sebelum plotting: jika sumbu x punya lebih dari max_points nilai, nilai x digabung
+# per rentang (nilai awal rentang sebagai label) dan y diagregasi per rentang x warna
+def downsample(df, x, y, color=None, max_points=MAX_POINTS, agg="sum"):
+    values = np.sort(df[x].unique())
+    if len(values) <= max_points:
+        return df
+    edges = values[::-(-len(values) // max_points)]
+    binned = df.assign(**{x: edges[np.searchsorted(edges, df[x].to_numpy(), side="right") - 1]})
+    return binned.groupby([x] + ([color] if color else []), as_index=False)[y].agg(agg)
+
+# 🔹 Pengganti st.tabs yang malas: st.tabs selalu menjalankan isi semua tab (termasuk fetch & grafik),
+# sedangkan pemilih ini hanya merender tab yang sedang dipilih. Pilihan disimpan di session_state via key.
+def tab_selector(labels, key):
+    if hasattr(st, "segmented_control"):
+        selected = st.segmented_control("Tampilan", labels, default=labels[0], key=key,
+                                        label_visibility="collapsed")
+    else:
+        selected = st.radio("Tampilan", labels, horizontal=True, key=key, label_visibility="collapsed")
+    return selected or labels[0]
+
+# 🔹 Muat ulang manual: kosongkan semua cache data dashboard (per proses & bersama)
+if st.sidebar.button("🔄 Muat ulang data"):
+    st.cache_data.clear()
+    shared_cache.clear()
+st.sidebar.caption(f"Versi data: {(data_version() or '-')[:8]}")
 
 if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
     st.title("Dashboard Pola Pembayaran Pelanggan PDAM Surya Sembada")
-    # Tabs for different views
-    tab1, tab2 = st.tabs(["Pola Pembayaran per Bulan", "Pola Pembayaran per Kategori"])
+    # Tabs for different views (hanya tab terpilih yang mengambil data & membangun grafik)
+    tabs = ["Pola Pembayaran per Bulan", "Pola Pembayaran per Kategori"]
+    tab = tab_selector(tabs, key="tab_pola_pembayaran")
 
-    with tab1:
+    if tab == tabs[0]:
         selected_month = st.text_input("📅 Masukkan Kode Bulan (YYYYMM)", value="202401")
 
         if selected_month:
-            summary_data = get_summary(selected_month)
+            # Semua data halaman ini diambil bersamaan; pemanggilan berikutnya memakai cache
+            hasil = api_client.gather({
+                "summary": (fetch, "summary", selected_month),
+                "zona_status": (fetch, "aggregate", selected_month, "zona,status", "count,kerugian"),
+                "subkelompok_status": (fetch, "aggregate", selected_month, "subkelompok,status", "count"),
+                "status": (fetch, "aggregate", selected_month, "status", "customers"),
+                "summary_thbl": (fetch, "summary_thbl"),
+            })
+            summary_data = hasil["summary"]
             if summary_data:
                 col1, col2, col3 = st.columns(3)
                 col1.metric("💰 Total Pendapatan (Rp)", f"{summary_data.get('total_revenue', 0):,}")
                 col2.metric("👥 Total Pelanggan", f"{summary_data.get('total_customers', 0)}")
                 col3.metric("⏳ Total Keterlambatan", f"{summary_data.get('total_late', 0)}")
 
-            data = get_data(selected_month)
-            if not data.empty:
+            # Jumlah tagihan & kerugian per zona dan status (dihitung di server)
+            zona_status = hasil["zona_status"]
+            if not zona_status.empty:
                 col4, col5 = st.columns(2)
                 with col4:
                     # Pastikan zona dalam format string
-                    data['zona'] = data['zona'].astype(str)
-                    # Hitung jumlah pelanggan per zona dan status
-                    status_counts = data.groupby(['zona', 'status']).size().reset_index(name='Counts')
-                    # Hitung total kerugian per zona (hanya untuk 'Belum Dibayar')
-                    data['kerugian'] = data['rp_tagihan'].where(data['status'] == 'Belum Dibayar', 0)
-                    kerugian_per_zona = data.groupby('zona')['kerugian'].sum().reset_index()
+                    zona_status['zona'] = zona_status['zona'].astype(str)
+                    # Jumlah pelanggan per zona dan status
+                    status_counts = zona_status[['zona', 'status', 'count']].rename(columns={'count': 'Counts'})
+                    # Total kerugian per zona (hanya untuk 'Belum Dibayar')
+                    kerugian_per_zona = zona_status.groupby('zona')['kerugian'].sum().reset_index()
                     # Gabungkan data jumlah pelanggan dan kerugian
                     status_counts = status_counts.merge(kerugian_per_zona, on="zona", how="left")
                     # Urutkan zona berdasarkan angka jika memungkinkan
@@ -148,11 +307,12 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     - 💸 Selain itu, terdapat sebanyak **{int(total_belum_bayar)} pelanggan yang masih Belum Membayar** tagihan mereka.
                     """)
 
-                    # Pastikan kolom SUBKELOMPOK dalam format string
-                    data['subkelompok'] = data['subkelompok'].astype(str)
-
                     # Hitung jumlah pelanggan per SUBKELOMPOK dan Status
-                    subkelompok_counts = data.groupby(['subkelompok', 'status']).size().reset_index(name='Counts')
+                    subkelompok_counts = hasil["subkelompok_status"]
+                    subkelompok_counts = subkelompok_counts.rename(columns={'count': 'Counts'})
+
+                    # Pastikan kolom SUBKELOMPOK dalam format string
+                    subkelompok_counts['subkelompok'] = subkelompok_counts['subkelompok'].astype(str)
 
                     # Urutkan SUBKELOMPOK agar tampilan lebih rapi
                     subkelompok_sorted = sorted(subkelompok_counts['subkelompok'].unique())
@@ -215,7 +375,7 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     """)
 
                 with col5:
-                    status_counts = data.groupby('status')['no_plg'].nunique().reset_index()
+                    status_counts = hasil["status"]
                     status_counts.columns = ['status', 'Jumlah Pelanggan']
 
                     fig2 = px.pie(
@@ -230,8 +390,6 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     st.plotly_chart(fig2, use_container_width=True)
 
                     # Hitung total jumlah pelanggan per status
-                    status_counts = data.groupby('status')['no_plg'].nunique().reset_index()
-                    status_counts.columns = ['status', 'Jumlah Pelanggan']
                     total_pelanggan = status_counts['Jumlah Pelanggan'].sum()
 
                     # Hitung proporsi per status
@@ -255,27 +413,30 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     """)
 
                     # ambil summary thbl
-                    summary_df = get_summary_thbl()
+                    summary_df = hasil["summary_thbl"]
                     # Ubah format bulan agar lebih terbaca (YYYY-MM)
                     summary_df["thbl"] = summary_df["thbl"].astype(str).apply(lambda x: f"{x[:4]}-{x[4:]}")
                     # Konversi ke format numerik untuk visualisasi
                     for col in ["tepat_waktu", "terlambat", "belum_dibayar"]:
                         summary_df[col] = pd.to_numeric(summary_df[col])
                     # Grafik Tren Pembayaran
-                    fig4 = px.line(
-                        summary_df.melt(id_vars=["thbl"], var_name="Status", value_name="Jumlah"),
-                        x="thbl", y="Jumlah", color="Status",
-                        title="Tren Jumlah Pelanggan Berdasarkan Status Pembayaran",
-                        markers=True,
-                        color_discrete_map={'Terlambat': 'brown', 'Tepat Waktu': 'skyblue', 'Belum Dibayar': 'red'}
-                    )
-                    fig4.update_layout(
-                        width=900, height=600,
-                        xaxis_title="Periode (YYYY-MM)",
-                        yaxis_title="Jumlah Pelanggan",
-                        xaxis=dict(tickangle=-45)
-                    )
-                    st.plotly_chart(fig4, use_container_width=True)
+                    def build_fig4():
+                        tren = summary_df.melt(id_vars=["thbl"], var_name="Status", value_name="Jumlah")
+                        fig4 = px.line(
+                            downsample(tren, "thbl", "Jumlah", "Status", agg="mean"),
+                            x="thbl", y="Jumlah", color="Status",
+                            title="Tren Jumlah Pelanggan Berdasarkan Status Pembayaran",
+                            markers=True,
+                            color_discrete_map={'Terlambat': 'brown', 'Tepat Waktu': 'skyblue', 'Belum Dibayar': 'red'}
+                        )
+                        fig4.update_layout(
+                            width=900, height=600,
+                            xaxis_title="Periode (YYYY-MM)",
+                            yaxis_title="Jumlah Pelanggan",
+                            xaxis=dict(tickangle=-45)
+                        )
+                        return fig4
+                    st.plotly_chart(cached_figure("tren_status", (), build_fig4), use_container_width=True)
 
                     # Hitung rata-rata jumlah pelanggan per status
                     avg_tepat = summary_df["tepat_waktu"].mean()
@@ -307,25 +468,9 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
             else:
                 st.warning(f"⚠️ Tidak ada data yang tersedia untuk bulan {selected_month}.")
 
-    with tab2:
-       # 📡 Mengambil data dari API
-        @st.cache_data
-        def fetch_data():
-            try:
-                API_URL = "http://localhost:5000/get_late_subkelompok"
-                response = requests.get(API_URL)  # Hapus parameter thbl
-                if response.status_code != 200:
-                    st.error(f"Error API: {response.status_code}, {response.text}")
-                    return pd.DataFrame()  # Return DataFrame kosong jika error
-                
-                data = response.json()
-                return pd.DataFrame(data)  # Konversi data API ke DataFrame
-            except Exception as e:
-                st.error(f"Error mengambil data: {e}")
-                return pd.DataFrame()
-
+    if tab == tabs[1]:
         # --- Ambil data ---
-        data = fetch_data()
+        data = fetch("late_subkelompok")
 
         # Pastikan ada data sebelum lanjut
         if data.empty:
@@ -357,16 +502,18 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     filtered_data = data[data['subkelompok'].isin(selected_subkelompok)]
 
                 # --- Buat Grafik ---
-                fig5 = px.line(
-                    filtered_data,
-                    x='THBL',
-                    y='jumlah_pelanggan',
-                    color='subkelompok',
-                    markers=True,
-                    title="📉 Tren Jumlah Pelanggan Terlambat per Subkelompok",
-                    labels={'THBL': 'Periode THBL', 'jumlah_pelanggan': 'Jumlah Pelanggan Terlambat', 'subkelompok': 'Subkelompok'}
-                )
-                st.plotly_chart(fig5, use_container_width=True)
+                def build_fig5():
+                    return px.line(
+                        downsample(filtered_data, 'THBL', 'jumlah_pelanggan', 'subkelompok', agg="mean"),
+                        x='THBL',
+                        y='jumlah_pelanggan',
+                        color='subkelompok',
+                        markers=True,
+                        title="📉 Tren Jumlah Pelanggan Terlambat per Subkelompok",
+                        labels={'THBL': 'Periode THBL', 'jumlah_pelanggan': 'Jumlah Pelanggan Terlambat', 'subkelompok': 'Subkelompok'}
+                    )
+                st.plotly_chart(cached_figure("tren_terlambat_subkelompok", tuple(sorted(map(str, selected_subkelompok))), build_fig5),
+                                use_container_width=True)
                 
                 # Hitung total jumlah pelanggan terlambat per subkelompok
                 grouped_data = data.groupby("subkelompok")["jumlah_pelanggan"].sum().reset_index()
@@ -401,23 +548,25 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                 
             with col2:
                 # --- Buat Grafik ---
-                fig6 = px.bar(
-                    top_subkelompok,
-                    x="jumlah_pelanggan",
-                    y="subkelompok",
-                    orientation="h",
-                    text_auto=True,
-                    title="Subkelompok dengan Pelanggan Terlambat Terbanyak",
-                    labels={"jumlah_pelanggan": "Jumlah Terlambat", "subkelompok": "Subkelompok"},
-                    color="jumlah_pelanggan",
-                    color_continuous_scale="Reds"
-                )
-                # --- Atur Ukuran Layout ---
-                fig6.update_layout(
-                    width=800,   # Ganti sesuai kebutuhan
-                    height=500   # Ganti sesuai kebutuhan
-                )
-                st.plotly_chart(fig6, use_container_width=True)
+                def build_fig6():
+                    fig6 = px.bar(
+                        top_subkelompok,
+                        x="jumlah_pelanggan",
+                        y="subkelompok",
+                        orientation="h",
+                        text_auto=True,
+                        title="Subkelompok dengan Pelanggan Terlambat Terbanyak",
+                        labels={"jumlah_pelanggan": "Jumlah Terlambat", "subkelompok": "Subkelompok"},
+                        color="jumlah_pelanggan",
+                        color_continuous_scale="Reds"
+                    )
+                    # --- Atur Ukuran Layout ---
+                    fig6.update_layout(
+                        width=800,   # Ganti sesuai kebutuhan
+                        height=500   # Ganti sesuai kebutuhan
+                    )
+                    return fig6
+                st.plotly_chart(cached_figure("top_terlambat_subkelompok", (), build_fig6), use_container_width=True)
                 # Analisis subkelompok dengan pelanggan terlambat terbanyak
                 top_sub = top_subkelompok.sort_values(by="jumlah_pelanggan", ascending=False)
                 
@@ -425,23 +574,8 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                 
             # --- Bagian ZONA (Dibawah SUBKELOMPOK) ---
             st.subheader("Dashboard Pola Pembayaran Pelanggan Terlambat per Zona")
-            # 📡 Mengambil data dari API
-            @st.cache_data
-            def get_zona():
-                try:
-                    API_URL = "http://localhost:5000/get_late_zona"
-                    response = requests.get(API_URL)  # Hapus parameter thbl
-                    if response.status_code != 200:
-                        st.error(f"Error API: {response.status_code}, {response.text}")
-                        return pd.DataFrame()  # Return DataFrame kosong jika error
-                    
-                    data = response.json()
-                    return pd.DataFrame(data)  # Konversi data API ke DataFrame
-                except Exception as e:
-                    st.error(f"Error mengambil data: {e}")
-                    return pd.DataFrame()
             # --- Ambil data ---
-            data = get_zona()
+            data = fetch("late_zona")
             # Layout 2 Kolom: Grafik Tren & Top 5 Zona Terlambat
             col3, col4 = st.columns(2)
 
@@ -462,16 +596,18 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                     filtered_data = data[data['zona'].isin(selected_zona)]
 
                 # --- Buat Grafik ---
-                fig7 = px.line(
-                    filtered_data,
-                    x='thbl',
-                    y='jumlah_pelanggan',
-                    color='zona',
-                    markers=True,
-                    title="📉 Tren Jumlah Pelanggan Terlambat per zona",
-                    labels={'thbl': 'Periode THBL', 'jumlah_pelanggan': 'Jumlah Pelanggan Terlambat', 'zona': 'zona'}
-                )
-                st.plotly_chart(fig7, use_container_width=True)
+                def build_fig7():
+                    return px.line(
+                        downsample(filtered_data, 'thbl', 'jumlah_pelanggan', 'zona', agg="mean"),
+                        x='thbl',
+                        y='jumlah_pelanggan',
+                        color='zona',
+                        markers=True,
+                        title="📉 Tren Jumlah Pelanggan Terlambat per zona",
+                        labels={'thbl': 'Periode THBL', 'jumlah_pelanggan': 'Jumlah Pelanggan Terlambat', 'zona': 'zona'}
+                    )
+                st.plotly_chart(cached_figure("tren_terlambat_zona", tuple(sorted(map(str, selected_zona))), build_fig7),
+                                use_container_width=True)
 
                 # --- Analisa Lonjakan Tertinggi ---
                 # Hitung total jumlah pelanggan terlambat per zona
@@ -504,51 +640,45 @@ if nav_selection == 'Dashboard Pola Pembayaran Pelanggan':
                 """)
 
 
-        with col4:
-            
-            fig8 = px.bar(
-                top_zona,
-                x="jumlah_pelanggan",
-                y="zona",
-                orientation="h",
-                text_auto=True,
-                title="Zona dengan Pelanggan Terlambat Terbanyak",
-                labels={"jumlah_pelanggan": "Jumlah Terlambat", "zona": "Zona"},
-                color="jumlah_pelanggan",
-                color_continuous_scale="Reds"
-            )
+            with col4:
+                def build_fig8():
+                    fig8 = px.bar(
+                        top_zona,
+                        x="jumlah_pelanggan",
+                        y="zona",
+                        orientation="h",
+                        text_auto=True,
+                        title="Zona dengan Pelanggan Terlambat Terbanyak",
+                        labels={"jumlah_pelanggan": "Jumlah Terlambat", "zona": "Zona"},
+                        color="jumlah_pelanggan",
+                        color_continuous_scale="Reds"
+                    )
 
-            # Tambahkan pengaturan agar batang lebih tebal
-            fig8.update_layout(
-                barmode='relative',  # Mode batang tumpang-tindih
-                bargap=0.1,  # Jarak antar batang
-                bargroupgap=0.05,  # Jarak antar grup batang
-            )
-            st.plotly_chart(fig8, use_container_width=True)
+                    # Tambahkan pengaturan agar batang lebih tebal
+                    fig8.update_layout(
+                        barmode='relative',  # Mode batang tumpang-tindih
+                        bargap=0.1,  # Jarak antar batang
+                        bargroupgap=0.05,  # Jarak antar grup batang
+                    )
+                    return fig8
+                st.plotly_chart(cached_figure("top_terlambat_zona", (), build_fig8), use_container_width=True)
 
 if nav_selection == "Layanan Monitoring Pelanggan":
     st.title("Layanan Monitoring Pelanggan")
     # Tabs for different views
-    tab1, tab2 = st.tabs(["Pelanggan Potensial Terlambat Bayar", "Monitoring Tagihan Pelanggan PDAM Surya Sembada Kota Surabaya"])
-    with tab1:
+    tabs = ["Pelanggan Potensial Terlambat Bayar", "Monitoring Tagihan Pelanggan PDAM Surya Sembada Kota Surabaya"]
+    tab = tab_selector(tabs, key="tab_monitoring")
+    if tab == tabs[0]:
         # Ambil opsi thbl dari API Flask
-        @st.cache_data
-        def get_thbl_options():
-            response = requests.get("http://localhost:5000/get_thbl_options")
-            if response.status_code == 200:
-                return response.json()
-            return []
-
-        thbl_options = get_thbl_options()
+        thbl_options = fetch("thbl_options")
 
         # Tampilkan dropdown jika tersedia
         if thbl_options:
             selected_thbl = st.selectbox("Pilih Bulan-Tahun (thbl):", thbl_options)
 
             # Ambil data sesuai pilihan
-            response = requests.get(f"http://localhost:5000/get_prediksi_thbl?thbl={selected_thbl}")
-            if response.status_code == 200:
-                data = response.json()
+            data = fetch("prediksi_thbl", selected_thbl)
+            if data is not None:
                 if data:
                     df = pd.DataFrame(data)
                     df = df[["no_plg", "thbl", "zona", "subkelompok", "prediksi_selisih"]]
@@ -608,32 +738,17 @@ if nav_selection == "Layanan Monitoring Pelanggan":
                 st.error("Gagal mengambil data prediksi.")
         else:
             st.warning("Tidak ada data thbl tersedia.")
-    with tab2:
-        @st.cache_data
-        # 🔹 Fungsi Ambil Data Prediksi dari API Flask
-        def get_prediction(no_plg):
-            if not no_plg:
-                return None
-            try:
-                url = f"http://127.0.0.1:5000/get_prediction/{no_plg}"
-                response = requests.get(url, timeout=200)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                st.error(f"❌ Gagal mengambil data: {e}")
-                return None
-
-        # 🔹 Fungsi Update Status
-        def update_status_in_db(no_plg, new_status):
-            return datetime.today().strftime("%Y-%m-%d") if new_status in ["Tepat Waktu", "Terlambat"] else None
-
-        # 🔹 Simulasi Database
-        if "database" not in st.session_state:
-            st.session_state.database = {}
+    if tab == tabs[1]:
+        # 🔹 Perubahan status yang belum disimpan: hanya delta (no_plg, thbl, status) per pelanggan
+        if "status_updates" not in st.session_state:
+            st.session_state.status_updates = {}
 
         if "enter_pressed" not in st.session_state:
             st.session_state.enter_pressed = False
 
+        if "status_saved" in st.session_state:
+            st.success(st.session_state.pop("status_saved"))
+
         # 🔹 Input Nomor Pelanggan
         no_plg = st.text_input("Masukkan Nomor Pelanggan:", value="", key="no_plg")
 
@@ -642,7 +757,7 @@ if nav_selection == "Layanan Monitoring Pelanggan":
 
         # 🔹 Proses setelah tombol pencarian ditekan
         if st.session_state.enter_pressed and no_plg:
-            data = get_prediction(no_plg)
+            data = fetch("prediction", no_plg)
 
             if data:
                 df = pd.DataFrame(data)
@@ -653,6 +768,7 @@ if nav_selection == "Layanan Monitoring Pelanggan":
                     "awal_tagihan", "tgl_lunas", "tgl_tenggat", "rp_tagihan", "status", "selisih_hari", "prediksi_selisih"
                 ]
                 df = df[[col for col in desired_order if col in df.columns]]
+                thbl_asli = df["thbl"].astype(str)  # kunci (no_plg, thbl) untuk update di API
 
                 # 🔹 Format kolom `thbl`
                 if "thbl" in df.columns:
@@ -663,7 +779,7 @@ if nav_selection == "Layanan Monitoring Pelanggan":
                 column_config = {
                     "Status Baru": st.column_config.SelectboxColumn(
                         "Status Baru",
-                        options=["Belum Dibayar", "Tepat Waktu", "Terlambat"],
+                        options=STATUS_OPTIONS,
                         required=True,
                     )
                 }
@@ -671,24 +787,44 @@ if nav_selection == "Layanan Monitoring Pelanggan":
                 # 🔹 Editor untuk update status
                 edited_df = st.data_editor(df, column_config=column_config, hide_index=True, use_container_width=True)
 
-                # 🔹 Cek perubahan status
-                changes = edited_df[edited_df["Status Baru"] != df["status"]]
-                if not changes.empty:
-                    updated_rows = []
-                    for index, row in changes.iterrows():
-                        new_tgl_lunas = update_status_in_db(row["no_plg"], row["Status Baru"])
-                        edited_df.at[index, "tgl_lunas"] = new_tgl_lunas
-                        edited_df.at[index, "status"] = row["Status Baru"]
-                        updated_rows.append(edited_df.iloc[index])
-
-                    st.success("✅ Data berhasil diperbarui.")
-                    st.session_state.database[no_plg] = edited_df.to_dict("records")
+                # 🔹 Cek perubahan status (diff vektor, tanpa loop per baris)
+                changed = edited_df["Status Baru"] != df["status"]
+                if changed.any():
+                    updated_df = edited_df.loc[changed].copy()
+                    updated_df["status"] = updated_df["Status Baru"]
+                    updated_df["tgl_lunas"] = np.where(
+                        updated_df["status"].isin(STATUS_LUNAS), datetime.today().strftime("%Y-%m-%d"), None
+                    )
+                    delta = pd.DataFrame({
+                        "no_plg": updated_df["no_plg"].astype(str),
+                        "thbl": thbl_asli[changed],
+                        "status": updated_df["status"],
+                    })
+                    st.session_state.status_updates[no_plg] = delta.to_dict("records")
 
                     # 🔹 Tampilkan data yang diperbarui saja
-                    updated_df = pd.DataFrame(updated_rows)
-                    if not updated_df.empty:
-                        st.write("### Hasil Pencarian (Hanya Data yang Diperbarui):")
-                        st.dataframe(updated_df.style.hide(axis="index"), use_container_width=True)
+                    st.write("### Hasil Pencarian (Hanya Data yang Diperbarui):")
+                    st.dataframe(updated_df.drop(columns="Status Baru").style.hide(axis="index"), use_container_width=True)
+
+                    # 🔹 Simpan semua perubahan dalam satu request (satu UPDATE batch di API)
+                    if st.button(f"💾 Simpan {len(delta)} perubahan status"):
+                        try:
+                            hasil = api_client.post_json("/update_status",
+                                                         {"updates": st.session_state.status_updates[no_plg]})
+                        except requests.exceptions.HTTPError as e:
+                            st.error(f"Error API: {e.response.status_code}, {e.response.text}")
+                        except requests.exceptions.RequestException as e:
+                            st.error(f"❌ Gagal menyimpan perubahan: {e}")
+                        else:
+                            st.session_state.status_updates.pop(no_plg, None)
+                            # Versi data berubah di API: muat ulang versi agar semua cache memakai data baru
+                            _data_version.clear()
+                            st.session_state.status_saved = (
+                                f"✅ {hasil['updated'].get('history_pembayaran', 0)} tagihan berhasil diperbarui."
+                            )
+                            st.rerun()
+                else:
+                    st.session_state.status_updates.pop(no_plg, None)
 
                 # 🔹 Visualisasi garis tren
                 if not df.empty and all(col in df.columns for col in ["thbl", "selisih_hari", "prediksi_selisih"]):
@@ -731,50 +867,69 @@ if nav_selection == "Layanan Monitoring Pelanggan":
 
 if nav_selection == "Indikasi Pelanggan Terlambat":
     st.title("Indikasi Pelanggan Terlambat")
-    def get_pelanggan_belum_bayar_data(api_url="http://localhost:5000/api/pelanggan_belum_bayar"):
-        try:
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            # Validasi apakah data berbentuk list of dict
-            if isinstance(data, list) and all(isinstance(item, dict) for item in data):
-                df = pd.DataFrame(data)
-                return df
-            else:
-                st.error("Format data dari API tidak sesuai.")
-                return pd.DataFrame()
-        except requests.exceptions.RequestException as e:
-            st.error(f"Gagal mengambil data dari API: {e}")
-            return pd.DataFrame()
-        except ValueError as e:
-            st.error(f"Format JSON tidak valid: {e}")
-            return pd.DataFrame()
-
-    # Ambil data
-    df_belum_bayar = get_pelanggan_belum_bayar_data()
-    # Tabs for different views
-    tab1, tab2 = st.tabs(["Data Pelanggan Belum Bayar", "Grafik Pelanggan Belum Bayar"])
+    PAGE_SIZES = [100, 500, 1000]
+
+    # Tabs for different views; ringkasan per zona/subkelompok dipakai kedua tab (opsi filter & grafik)
+    tabs = ["Data Pelanggan Belum Bayar", "Grafik Pelanggan Belum Bayar"]
+    tab = tab_selector(tabs, key="tab_belum_bayar")
+    grouped_zona = fetch("belum_bayar_group", "zona")
+    grouped_subkelompok = fetch("belum_bayar_group", "subkelompok")
+
+    if tab == tabs[0]:
+        col_zona, col_sub, col_bulan, col_size = st.columns(4)
+        zona_options = sorted(grouped_zona["zona"].dropna().unique().tolist()) if not grouped_zona.empty else []
+        sub_options = (sorted(grouped_subkelompok["subkelompok"].dropna().unique().tolist())
+                       if not grouped_subkelompok.empty else [])
+        filter_zona = col_zona.selectbox("Zona", ["Semua zona"] + zona_options)
+        filter_sub = col_sub.selectbox("Subkelompok", ["Semua subkelompok"] + sub_options)
+        min_bulan = col_bulan.number_input("Minimal bulan menunggak", min_value=0, value=0, step=1)
+        page_size = col_size.selectbox("Baris per halaman", PAGE_SIZES)
+
+        filters = {"sort": "jumlah_bulan", "order": "desc"}
+        if filter_zona != "Semua zona":
+            filters["zona"] = filter_zona
+        if filter_sub != "Semua subkelompok":
+            filters["subkelompok"] = filter_sub
+        if min_bulan:
+            filters["min_bulan"] = int(min_bulan)
+
+        # Tumpukan cursor halaman; diulang dari awal setiap kali filter berubah
+        filter_key = tuple(sorted(filters.items())) + (("limit", page_size),)
+        if st.session_state.get("belum_bayar_filter") != filter_key:
+            st.session_state.belum_bayar_filter = filter_key
+            st.session_state.belum_bayar_cursors = [{}]
+        cursors = st.session_state.belum_bayar_cursors
+
+        page_params = filter_key + tuple(sorted(cursors[-1].items()))
+        df_belum_bayar, next_cursor = fetch("belum_bayar_page", page_params)
+        total = fetch("belum_bayar_count", tuple(sorted(filters.items())))
 
-    with tab1:
         if not df_belum_bayar.empty:
-            # Ubah urutan kolom
+            # Ubah urutan kolom (urutan jumlah_bulan terbanyak sudah dari server)
             urutan_kolom = ["no_plg", "jumlah_bulan", "subkelompok", "zona"]
-            df_belum_bayar = df_belum_bayar[urutan_kolom]
-            
-            # Urutkan berdasarkan jumlah_bulan dari yang terbanyak
-            df_belum_bayar = df_belum_bayar.sort_values(by="jumlah_bulan", ascending=False)
-
-            st.dataframe(df_belum_bayar, use_container_width=True, hide_index=True, height=800)
+            st.dataframe(df_belum_bayar[urutan_kolom], use_container_width=True, hide_index=True, height=800)
+
+            halaman = len(cursors)
+            info = f"Halaman {halaman}"
+            if total is not None:
+                info += f" dari {max(-(-total // page_size), 1)} ({total:,} pelanggan)"
+            col_prev, col_info, col_next = st.columns([1, 3, 1])
+            col_info.caption(info)
+            if col_prev.button("⬅️ Sebelumnya", disabled=halaman == 1):
+                cursors.pop()
+                st.rerun()
+            if col_next.button("Berikutnya ➡️", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
         else:
             st.warning("Tidak ada data untuk ditampilkan.")
 
-    with tab2:
-        if not df_belum_bayar.empty:
+    if tab == tabs[1]:
+        if not grouped_zona.empty:
             st.subheader("Tren Jumlah Pelanggan Belum Bayar per Zona")
 
             # --- Pilih zona dengan Checklist ---
-            zona_list = df_belum_bayar['zona'].unique().tolist()
+            zona_list = grouped_zona['zona'].unique().tolist()
             zona_list.sort()
             zona_list.insert(0, "Semua zona")
             selected_zona = st.multiselect(
@@ -783,38 +938,37 @@ if nav_selection == "Indikasi Pelanggan Terlambat":
                 default=["Semua zona"]
             )
 
-            # Filter Data
+            # Filter Data (jumlah per jumlah_bulan x zona sudah dihitung di server)
             if "Semua zona" in selected_zona:
-                filtered_data = df_belum_bayar
+                grouped_df = grouped_zona
             else:
-                filtered_data = df_belum_bayar[df_belum_bayar['zona'].isin(selected_zona)]
-
-            # Group data
-            grouped_df = filtered_data.groupby(['jumlah_bulan', 'zona']).size().reset_index(name='jumlah_pelanggan')
+                grouped_df = grouped_zona[grouped_zona['zona'].isin(selected_zona)]
 
             if not grouped_df.empty:
-                # Plot dengan Plotly
-                fig = px.line(
-                    grouped_df,
-                    x='jumlah_bulan',
-                    y='jumlah_pelanggan',
-                    color='zona',
-                    markers=True,
-                    title='Jumlah Pelanggan Belum Bayar per Zona dan Jumlah Bulan'
-                )
-                fig.update_layout(
-                    xaxis_title='Jumlah Bulan Menunggak',
-                    yaxis_title='Jumlah Pelanggan',
-                    legend_title='Zona',
-                    hovermode='x unified',
-                    yaxis=dict(
-                        tickmode='linear',
-                        dtick=30 
+                # Plot dengan Plotly (tunggakan panjang digabung per rentang bulan agar titik tetap sedikit)
+                def build_fig():
+                    fig = px.line(
+                        downsample(grouped_df, 'jumlah_bulan', 'jumlah_pelanggan', 'zona'),
+                        x='jumlah_bulan',
+                        y='jumlah_pelanggan',
+                        color='zona',
+                        markers=True,
+                        title='Jumlah Pelanggan Belum Bayar per Zona dan Jumlah Bulan'
                     )
-                )
-
+                    fig.update_layout(
+                        xaxis_title='Jumlah Bulan Menunggak',
+                        yaxis_title='Jumlah Pelanggan',
+                        legend_title='Zona',
+                        hovermode='x unified',
+                        yaxis=dict(
+                            tickmode='linear',
+                            dtick=30 
+                        )
+                    )
+                    return fig
 
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(cached_figure("belum_bayar_zona", tuple(sorted(map(str, selected_zona))), build_fig),
+                                use_container_width=True)
                 # --- Analisa per ZONA ---
                 if not grouped_df.empty:
                     # Fokus ke jumlah bulan tertinggi
@@ -839,7 +993,7 @@ if nav_selection == "Indikasi Pelanggan Terlambat":
             st.subheader("Tren Jumlah Pelanggan Belum Bayar per Subkelompok")
 
             # --- Pilih subkelompok dengan Checklist ---
-            subkelompok_list = df_belum_bayar['subkelompok'].unique().tolist()
+            subkelompok_list = grouped_subkelompok['subkelompok'].unique().tolist()
             subkelompok_list.sort()
             subkelompok_list.insert(0, "Semua subkelompok")
             selected_subkelompok = st.multiselect(
@@ -850,34 +1004,34 @@ if nav_selection == "Indikasi Pelanggan Terlambat":
 
             # Filter data
             if "Semua subkelompok" in selected_subkelompok:
-                filtered_data_sub = df_belum_bayar
+                grouped_df_sub = grouped_subkelompok
             else:
-                filtered_data_sub = df_belum_bayar[df_belum_bayar['subkelompok'].isin(selected_subkelompok)]
-
-            # Group data
-            grouped_df_sub = filtered_data_sub.groupby(['jumlah_bulan', 'subkelompok']).size().reset_index(name='jumlah_pelanggan')
+                grouped_df_sub = grouped_subkelompok[grouped_subkelompok['subkelompok'].isin(selected_subkelompok)]
 
             if not grouped_df_sub.empty:
-                fig2 = px.line(
-                    grouped_df_sub,
-                    x='jumlah_bulan',
-                    y='jumlah_pelanggan',
-                    color='subkelompok',
-                    markers=True,
-                    title='Jumlah Pelanggan Belum Bayar per Subkelompok dan Jumlah Bulan'
-                )
-                fig2.update_layout(
-                    xaxis_title='Jumlah Bulan Menunggak',
-                    yaxis_title='Jumlah Pelanggan',
-                    legend_title='Subkelompok',
-                    hovermode='x unified',
-                    yaxis=dict(
-                        tickmode='linear',
-                        dtick=30
+                def build_fig2():
+                    fig2 = px.line(
+                        downsample(grouped_df_sub, 'jumlah_bulan', 'jumlah_pelanggan', 'subkelompok'),
+                        x='jumlah_bulan',
+                        y='jumlah_pelanggan',
+                        color='subkelompok',
+                        markers=True,
+                        title='Jumlah Pelanggan Belum Bayar per Subkelompok dan Jumlah Bulan'
                     )
-                )
+                    fig2.update_layout(
+                        xaxis_title='Jumlah Bulan Menunggak',
+                        yaxis_title='Jumlah Pelanggan',
+                        legend_title='Subkelompok',
+                        hovermode='x unified',
+                        yaxis=dict(
+                            tickmode='linear',
+                            dtick=30
+                        )
+                    )
+                    return fig2
 
-                st.plotly_chart(fig2, use_container_width=True)
+                st.plotly_chart(cached_figure("belum_bayar_subkelompok", tuple(sorted(map(str, selected_subkelompok))), build_fig2),
+                                use_container_width=True)
 
                 if not grouped_df_sub.empty:
                     max_bulan_sub = grouped_df_sub['jumlah_bulan'].max()
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+
+# 🔹 Konfigurasi Database (dapat ditimpa lewat environment variable)
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "history-pembayaran"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "Trimitha"),
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": os.getenv("DB_PORT", "5432")
+}
+
+# 🔹 Schema yang dipakai (mis. "bench" agar benchmark tidak menyentuh tabel produksi)
+DB_SEARCH_PATH = os.getenv("DB_SEARCH_PATH")
+
+# 🔹 Batas waktu per query dalam milidetik (0 = tanpa batas); app.py mengaturnya untuk request API
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# 🔹 Konfigurasi pool koneksi bersama untuk app.py dan model.py
+POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN", "2")),          # koneksi yang tetap dibuka
+    "max_size": int(os.getenv("DB_POOL_MAX", "10")),         # batas total koneksi
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),    # detik menunggu koneksi kosong
+    "recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),    # detik sebelum koneksi diganti
+    "pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",   # health check sebelum dipakai
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# 🔹 Metrik pool
+_metrics_lock = threading.Lock()
+_metrics = {
+    "connections_created": 0,
+    "connections_invalidated": 0,
+    "checkouts": 0,
+    "checkout_errors": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+def _incr(key, value=1):
+    with _metrics_lock:
+        _metrics[key] += value
+
+def _register_pool_events(engine):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, conn_record):
+        _incr("connections_created")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_conn, conn_record, conn_proxy):
+        _incr("checkouts")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_conn, conn_record, exception):
+        _incr("connections_invalidated")
+
+def _connect_args():
+    options = []
+    if DB_SEARCH_PATH:
+        options.append(f"-c search_path={DB_SEARCH_PATH}")
+    if STATEMENT_TIMEOUT_MS:
+        options.append(f"-c statement_timeout={STATEMENT_TIMEOUT_MS}")
+    return {"options": " ".join(options)} if options else {}
+
+# 🔹 Engine SQLAlchemy tunggal; pool-nya dipakai bersama oleh semua endpoint dan batch
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = URL.create(
+                    "postgresql+psycopg2",
+                    username=DB_CONFIG["user"],
+                    password=DB_CONFIG["password"],
+                    host=DB_CONFIG["host"],
+                    port=int(DB_CONFIG["port"]),
+                    database=DB_CONFIG["dbname"],
+                )
+                engine = create_engine(
+                    url,
+                    pool_size=POOL_CONFIG["min_size"],
+                    max_overflow=max(POOL_CONFIG["max_size"] - POOL_CONFIG["min_size"], 0),
+                    pool_timeout=POOL_CONFIG["timeout"],
+                    pool_recycle=POOL_CONFIG["recycle"],
+                    pool_pre_ping=POOL_CONFIG["pre_ping"],
+                    connect_args=_connect_args(),
+                )
+                _register_pool_events(engine)
+                _engine = engine
+    return _engine
+
+# 🔹 Ambil koneksi psycopg2 dari pool; conn.close() mengembalikannya ke pool
+def get_connection():
+    start = time.perf_counter()
+    try:
+        conn = get_engine().raw_connection()
+    except Exception:
+        _incr("checkout_errors")
+        raise
+    finally:
+        waited = time.perf_counter() - start
+        with _metrics_lock:
+            _metrics["wait_seconds_total"] += waited
+            _metrics["wait_seconds_max"] = max(_metrics["wait_seconds_max"], waited)
+    return conn
+
+# 🔹 Buka koneksi minimum di awal agar request pertama tidak menunggu handshake
+def warmup():
+    conns = [get_connection() for _ in range(POOL_CONFIG["min_size"])]
+    for conn in conns:
+        conn.close()
+
+def pool_metrics():
+    pool = get_engine().pool
+    with _metrics_lock:
+        data = dict(_metrics)
+    data.update({
+        "min_size": POOL_CONFIG["min_size"],
+        "max_size": POOL_CONFIG["max_size"],
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+    })
+    return data
+
+def dispose():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
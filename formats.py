@@ -0,0 +1,95 @@
+import importlib.util
+import io
+import json
+
+# pandas & pyarrow diimpor saat pertama dipakai agar start-up API tetap ringan;
+# pyarrow opsional (requirements-arrow.txt): tanpa pyarrow hanya format JSON yang tersedia
+_pyarrow = None
+
+def _arrow():
+    global _pyarrow
+    if _pyarrow is None:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        _pyarrow = pyarrow
+    return _pyarrow
+
+# 🔹 Format respons untuk endpoint data besar
+RECORDS = "records"      # list of dict (format lama, default)
+COLUMNAR = "columnar"    # {"columns": [...], "data": {kolom: [nilai, ...]}}
+ARROW = "arrow"          # Apache Arrow IPC stream
+PARQUET = "parquet"
+
+MIMETYPES = {
+    RECORDS: "application/json",
+    COLUMNAR: "application/vnd.pdam.columnar+json",
+    ARROW: "application/vnd.apache.arrow.stream",
+    PARQUET: "application/vnd.apache.parquet",
+}
+
+def arrow_available():
+    return _pyarrow is not None or importlib.util.find_spec("pyarrow") is not None
+
+# 🔹 Tentukan format dari parameter ?format= atau header Accept
+def negotiate(format_param=None, accept_header=None):
+    if format_param:
+        return format_param if format_param in MIMETYPES else None
+    if accept_header:
+        for part in accept_header.split(","):
+            mimetype = part.split(";")[0].strip()
+            for name, known in MIMETYPES.items():
+                if mimetype == known:
+                    return name
+    return RECORDS
+
+# 🔹 Header Accept yang dipakai klien: Arrow jika pyarrow terpasang, selain itu JSON kolumnar
+def preferred_accept():
+    if arrow_available():
+        return f"{MIMETYPES[ARROW]}, {MIMETYPES[COLUMNAR]};q=0.9, application/json;q=0.5"
+    return f"{MIMETYPES[COLUMNAR]}, application/json;q=0.5"
+
+def _columns_dict(columns, rows):
+    return {col: [row[i] for row in rows] for i, col in enumerate(columns)}
+
+# 🔹 Serialisasi baris hasil query (list of tuple) ke format non-records
+def encode(columns, rows, fmt):
+    if fmt == COLUMNAR:
+        body = json.dumps({"columns": list(columns), "data": _columns_dict(columns, rows)}, default=str)
+        return body, MIMETYPES[COLUMNAR]
+
+    if not arrow_available():
+        raise ImportError("pyarrow tidak terpasang")
+
+    pa = _arrow()
+    table = pa.Table.from_pydict(_columns_dict(columns, rows))
+    sink = io.BytesIO()
+    if fmt == ARROW:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == PARQUET:
+        pa.parquet.write_table(table, sink)
+    else:
+        raise ValueError(f"Format tidak dikenal: {fmt}")
+    return sink.getvalue(), MIMETYPES[fmt]
+
+# 🔹 Bangun DataFrame dari isi respons sesuai Content-Type
+def decode(content, content_type):
+    import pandas as pd
+
+    mimetype = (content_type or "").split(";")[0].strip()
+
+    if mimetype == MIMETYPES[ARROW]:
+        pa = _arrow()
+        table = pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    if mimetype == MIMETYPES[PARQUET]:
+        pa = _arrow()
+        return pa.parquet.read_table(pa.BufferReader(content)).to_pandas(split_blocks=True, self_destruct=True)
+
+    payload = json.loads(content)
+    if mimetype == MIMETYPES[COLUMNAR]:
+        return pd.DataFrame(payload["data"], columns=payload["columns"])
+    if isinstance(payload, dict) and "data" in payload:
+        payload = payload["data"]
+    return pd.DataFrame(payload) if isinstance(payload, list) else pd.DataFrame()
@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+
+# 🔹 Konfigurasi gunicorn untuk app.py:  gunicorn -c gunicorn.conf.py wsgi:app
+# Reload tanpa downtime: kill -HUP <pid master> (worker lama menyelesaikan request dulu).
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000')}"
+
+# Worker proses x thread: request lambat (mis. /get_prediction halaman besar) hanya memakai satu thread,
+# route lain tetap dilayani thread/worker lain. Pool DB per worker (DB_POOL_MAX) sebaiknya >= threads.
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 9)))
+threads = int(os.getenv("API_THREADS", "4"))
+worker_class = "gthread"
+
+# Batas waktu: worker yang macet lebih lama dari timeout di-restart; query dibatasi API_STATEMENT_TIMEOUT_MS
+timeout = int(os.getenv("API_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("API_KEEPALIVE", "5"))
+
+# Daur ulang worker secara berkala agar memori tidak terus bertambah
+max_requests = int(os.getenv("API_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("API_MAX_REQUESTS_JITTER", "200"))
+
+reload = os.getenv("API_RELOAD", "0") == "1"
+accesslog = os.getenv("API_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("API_LOG_LEVEL", "info")
+
+# Setiap worker membuka koneksi minimum pool-nya sendiri sebelum menerima request
+def post_worker_init(worker):
+    import db
+
+    try:
+        db.warmup()
+    except Exception as e:
+        worker.log.warning(f"Warmup pool database gagal: {e}")
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# 🔹 Metrik per request untuk API: latensi per route, waktu DB vs serialisasi, tunggu pool, byte & baris.
+# Diekspos di /metrics (format teks Prometheus), header Server-Timing, dan log JSON per request.
+# Catatan: dengan gunicorn setiap worker punya registry sendiri (scrape per worker / jumlahkan di Prometheus).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGES = ("pool", "db", "serialize")
+LOG_ENABLED = os.getenv("API_STRUCTURED_LOG", "1") == "1"
+
+logger = logging.getLogger("api.request")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_requests = defaultdict(int)                                      # (route, method, status) -> jumlah
+_histogram = defaultdict(lambda: [0] * (len(BUCKETS) + 1))        # route -> jumlah per bucket (+Inf)
+_duration_sum = defaultdict(float)
+_stage_sum = defaultdict(float)                                   # (route, stage) -> detik
+_bytes = defaultdict(int)
+_rows = defaultdict(int)
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+# 🔹 Catat durasi satu tahap (pool / db / serialize) untuk request yang sedang berjalan
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "metrics_stages" in g:
+            g.metrics_stages[stage] += time.perf_counter() - start
+
+def add_rows(count):
+    if has_request_context() and "metrics_stages" in g:
+        g.metrics_rows += count
+
+def mark(name, value):
+    if has_request_context() and "metrics_stages" in g:
+        g.metrics_marks[name] = value
+
+# 🔹 Cursor & koneksi psycopg2 yang mencatat waktu query dan jumlah baris ke request aktif
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def execute(self, *args, **kwargs):
+        with timer("db"):
+            return self._cursor.execute(*args, **kwargs)
+
+    def fetchone(self):
+        with timer("db"):
+            row = self._cursor.fetchone()
+        add_rows(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        with timer("db"):
+            rows = self._cursor.fetchmany(*args, **kwargs)
+        add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        with timer("db"):
+            rows = self._cursor.fetchall()
+        add_rows(len(rows))
+        return rows
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def close(self):
+        self._conn.close()
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_stages = defaultdict(float)
+    g.metrics_rows = 0
+    g.metrics_marks = {}
+
+def _after_request(response):
+    if "metrics_start" not in g:
+        return response
+    total = time.perf_counter() - g.metrics_start
+    route = _route()
+    stages = g.metrics_stages
+    size = response.calculate_content_length() or 0
+
+    with _lock:
+        _requests[(route, request.method, response.status_code)] += 1
+        bucket = next((i for i, b in enumerate(BUCKETS) if total <= b), len(BUCKETS))
+        _histogram[route][bucket] += 1
+        _duration_sum[route] += total
+        for stage in STAGES:
+            _stage_sum[(route, stage)] += stages.get(stage, 0.0)
+        _bytes[route] += size
+        _rows[route] += g.metrics_rows
+
+    timing = [f"{stage};dur={stages.get(stage, 0.0) * 1000:.1f}" for stage in STAGES]
+    timing += [f'{name};desc="{value}"' for name, value in g.metrics_marks.items()]
+    timing.append(f"total;dur={total * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timing)
+
+    if LOG_ENABLED:
+        logger.info(json.dumps({
+            "route": route,
+            "path": request.path,
+            "method": request.method,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 1),
+            **{f"{stage}_ms": round(stages.get(stage, 0.0) * 1000, 1) for stage in STAGES},
+            "rows": g.metrics_rows,
+            "bytes": size,
+            **g.metrics_marks,
+        }))
+    return response
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+# 🔹 Format teks Prometheus (https://prometheus.io/docs/instrumenting/exposition_formats/)
+def render_prometheus(pool=None):
+    lines = []
+    with _lock:
+        lines += ["# HELP api_requests_total Jumlah request per route, method dan status.",
+                  "# TYPE api_requests_total counter"]
+        for (route, method, status), count in sorted(_requests.items()):
+            lines.append(f"api_requests_total{_labels(route=route, method=method, status=status)} {count}")
+
+        lines += ["# HELP api_request_duration_seconds Latensi request per route.",
+                  "# TYPE api_request_duration_seconds histogram"]
+        for route, counts in sorted(_histogram.items()):
+            cumulative = 0
+            for bound, count in zip(list(BUCKETS) + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f"api_request_duration_seconds_bucket{_labels(route=route, le=bound)} {cumulative}")
+            lines.append(f"api_request_duration_seconds_sum{_labels(route=route)} {_duration_sum[route]:.6f}")
+            lines.append(f"api_request_duration_seconds_count{_labels(route=route)} {cumulative}")
+
+        lines += ["# HELP api_stage_seconds_total Waktu per tahap (pool, db, serialize) per route.",
+                  "# TYPE api_stage_seconds_total counter"]
+        for (route, stage), seconds in sorted(_stage_sum.items()):
+            lines.append(f"api_stage_seconds_total{_labels(route=route, stage=stage)} {seconds:.6f}")
+
+        for name, values, help_text in (
+            ("api_response_bytes_total", _bytes, "Byte body respons per route."),
+            ("api_rows_total", _rows, "Baris hasil query per route."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for route, value in sorted(values.items()):
+                lines.append(f"{name}{_labels(route=route)} {value}")
+
+    for key, value in (pool or {}).items():
+        metric_type = "counter" if key.endswith(("_total", "created", "invalidated", "checkouts", "errors")) else "gauge"
+        lines += [f"# TYPE db_pool_{key} {metric_type}", f"db_pool_{key} {value}"]
+    return "\n".join(lines) + "\n"
@@ -1,38 +1,109 @@
 import pandas as pd
 import numpy as np
-import psycopg2
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sklearn.pipeline import Pipeline
 from sklearn.base import BaseEstimator, TransformerMixin
-import pickle
-
-# 🔹 Konfigurasi Database
-CONFIG = {
-    "dbname": "history-pembayaran",
-    "user": "postgres",
-    "password": "Trimitha",
-    "host": "localhost",
-    "port": "5432"
-}
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from db import get_engine
+import cache
+import profiling
+
+# 🔹 Tabel hasil prediksi dan tabel staging untuk penulisan bulk
+PREDICTION_TABLE = "prediksi_pembayaran"
+STAGING_TABLE = "prediksi_pembayaran_baru"
+
+# 🔹 Tabel pendukung prediksi inkremental
+STATE_TABLE = "prediksi_state"
+META_TABLE = "prediksi_meta"
+# Log perubahan history_pembayaran (diisi trigger): inkremental juga menangkap koreksi pada bulan lama
+CHANGE_TABLE = "history_pembayaran_perubahan"
+# State hanya menyimpan dua selisih_hari terakhir per pelanggan -> inkremental hanya sah untuk window 2
+STATE_WINDOW = 2
+# Prediksi penuh dijalankan otomatis bila yang terakhir lebih lama dari ini (hari; 0 = tidak pernah)
+FULL_REFRESH_DAYS = int(os.getenv("PREDICTION_FULL_REFRESH_DAYS", "7"))
+
+# 🔹 Tanggal acuan tagihan yang belum lunas (tgl_lunas = hari ini); satu sumber agar bisa diganti di test
+def _today():
+    return pd.Timestamp.today().normalize()
 
 # 🔹 Fungsi koneksi database
+@profiling.profiled("load_data")
 def load_data():
     try:
-        engine = create_engine(f'postgresql+psycopg2://{CONFIG["user"]}:{CONFIG["password"]}@{CONFIG["host"]}:{CONFIG["port"]}/{CONFIG["dbname"]}')
+        engine = get_engine()
         with engine.connect() as conn:
-            data = pd.read_sql(text("SELECT * FROM history_pembayaran;"), conn)
+            data = pd.read_sql(text("SELECT * FROM history_pembayaran ORDER BY no_plg, thbl;"), conn)
         return data
     except Exception as e:
         print(f"❌ Error saat membaca database: {e}")
         return pd.DataFrame()
 
+# 🔹 Loader streaming: baca history per chunk lewat server-side cursor
+CHUNK_SIZE = 100000
+
+def iter_history_chunks(chunksize=CHUNK_SIZE):
+    engine = get_engine()
+    with engine.connect().execution_options(stream_results=True) as conn:
+        query = text("SELECT * FROM history_pembayaran ORDER BY no_plg, thbl;")
+        for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+            yield chunk
+
+# 🔹 Susun chunk menjadi blok pelanggan utuh
+# Baris pelanggan terakhir di tiap chunk ditahan karena bisa berlanjut di chunk berikutnya
+def iter_customer_blocks(chunks):
+    sisa = None
+    for chunk in chunks:
+        if sisa is not None:
+            chunk = pd.concat([sisa, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+
+        terakhir = (chunk["no_plg"] == chunk["no_plg"].iloc[-1]).to_numpy()
+        sisa = chunk[terakhir]
+        blok = chunk[~terakhir]
+        if not blok.empty:
+            yield blok
+
+    if sisa is not None and not sisa.empty:
+        yield sisa
+
+# 🔹 Kolom kategori & nilai status yang selalu ada (dipakai juga oleh baris prediksi)
+CATEGORY_COLUMNS = ["status", "zona", "subkelompok", "kd_tarif"]
+STATUS_VALUES = ["Belum Dibayar", "Tepat Waktu", "Terlambat"]
+
+# 🔹 Hemat memori: kolom teks berulang jadi categorical, kolom integer di-downcast
+def compact_dtypes(X):
+    for col in CATEGORY_COLUMNS:
+        if col in X.columns and not isinstance(X[col].dtype, pd.CategoricalDtype):
+            values = X[col].dropna().unique().tolist()
+            if col == "status":
+                values = sorted(set(values) | set(STATUS_VALUES))
+            X[col] = X[col].astype(pd.CategoricalDtype(values))
+    for col in X.select_dtypes(include="integer").columns:
+        X[col] = pd.to_numeric(X[col], downcast="integer")
+    return X
+
 # 🔹 Transformer 1: Preprocessing Data
+# copy=False mengubah DataFrame input secara langsung (hemat satu salinan seluruh riwayat)
 class PreprocessingTransformer(BaseEstimator, TransformerMixin):
+    def __init__(self, copy=True, compact=False):
+        self.copy = copy
+        self.compact = compact
+
     def fit(self, X, y=None):
         return self
 
+    @profiling.profiled("preprocessing.transform")
     def transform(self, X):
-        X = X.copy()
+        if self.copy:
+            X = X.copy()
+        if self.compact:
+            X = compact_dtypes(X)
         X["status_database"] = X["status"]
 
         X["tgl_lunas"] = pd.to_datetime(X["tgl_lunas"], errors="coerce")
@@ -42,7 +113,7 @@ class PreprocessingTransformer(BaseEstimator, TransformerMixin):
         if "is_prediksi" not in X.columns:
             X["is_prediksi"] = False
 
-        today = pd.to_datetime("today").normalize()
+        today = _today()
         kondisi_update = (
             X["tgl_lunas"].isna() &
             (X["status_database"] == "Belum Dibayar") &
@@ -55,27 +126,92 @@ class PreprocessingTransformer(BaseEstimator, TransformerMixin):
 
         return X
 
+# 🔹 Rolling mean per pelanggan tanpa lambda per grup
+# Setara dengan groupby(keys)[values].transform(lambda x: x.rolling(window, min_periods=1).mean()):
+# data diurutkan stabil per pelanggan, lalu tiap jendela dijumlahkan dari array yang digeser.
+def rolling_mean_per_group(keys, values, window=2):
+    codes, _ = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    kode = codes[order]
+    nilai = np.asarray(values, dtype="float64")[order]
+
+    valid = ~np.isnan(nilai)
+    total = np.where(valid, nilai, 0.0)
+    jumlah = valid.astype("int64")
+    for k in range(1, window):
+        if k >= len(nilai):
+            break
+        sama = (kode[k:] == kode[:-k]) & valid[:-k]
+        total[k:] += np.where(sama, nilai[:-k], 0.0)
+        jumlah[k:] += sama
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rata = np.where(jumlah > 0, total / jumlah, np.nan)
+    rata[kode == -1] = np.nan
+
+    hasil = np.empty_like(rata)
+    hasil[order] = rata
+    return pd.Series(hasil, index=getattr(values, "index", None))
+
 # 🔹 Transformer 2: Moving Average Calculation & Prediction
 class MovingAverageTransformer(BaseEstimator, TransformerMixin):
+    def __init__(self, window=2, copy=True):
+        self.window = window
+        self.copy = copy
+
     def fit(self, X, y=None):
         return self
 
+    @profiling.profiled("moving_average.transform")
     def transform(self, X):
-        X = X.copy()
+        if self.copy:
+            X = X.copy()
 
         if "is_prediksi" not in X.columns:
             X["is_prediksi"] = False
 
         # Hitung moving average
-        X["prediksi_selisih"] = X.groupby("no_plg")["selisih_hari"].transform(
-            lambda x: x.rolling(window=2, min_periods=1).mean()
-        )
+        with profiling.stage("rolling_mean", rows_in=len(X)):
+            X["prediksi_selisih"] = rolling_mean_per_group(X["no_plg"], X["selisih_hari"], self.window)
+
+        return self._append_next_prediction(X)
+
+    @profiling.profiled("moving_average.transform_incremental")
+    def transform_incremental(self, X, seed):
+        # X hanya berisi baris baru (thbl > watermark), seed berisi nilai selisih_hari
+        # terakhir per pelanggan dari state sehingga rolling tetap menyambung
+        if self.window != STATE_WINDOW:
+            raise ValueError(
+                f"Prediksi inkremental hanya mendukung window={STATE_WINDOW} (state menyimpan "
+                f"{STATE_WINDOW} selisih_hari terakhir); jalankan prediksi penuh (--full) untuk window={self.window}."
+            )
+        X = X.copy()
+
+        if "is_prediksi" not in X.columns:
+            X["is_prediksi"] = False
 
         X["thbl"] = pd.to_numeric(X["thbl"], errors="coerce")
-        X = X.dropna(subset=["thbl"]).astype({"thbl": int})
+        X["_seed"] = False
+        gabung = pd.concat([seed, X], ignore_index=True).sort_values(
+            by=["no_plg", "thbl"], kind="stable"
+        )
+        gabung["prediksi_selisih"] = rolling_mean_per_group(
+            gabung["no_plg"], gabung["selisih_hari"], self.window
+        )
+        X = gabung[~gabung["_seed"].astype(bool)].drop(columns="_seed")
+
+        return self._append_next_prediction(X)
+
+    def _append_next_prediction(self, X):
+        # Salin hanya bila memang ada yang harus dibuang / dikonversi
+        if not pd.api.types.is_integer_dtype(X["thbl"]):
+            X["thbl"] = pd.to_numeric(X["thbl"], errors="coerce")
+            X = X.dropna(subset=["thbl"]).astype({"thbl": int})
 
         # Ambil data terakhir per pelanggan
-        df_last = X.loc[X.groupby("no_plg")["thbl"].idxmax()].copy()
+        with profiling.stage("last_per_customer", rows_in=len(X)) as record:
+            df_last = X.loc[X.groupby("no_plg")["thbl"].idxmax()].copy()
+            record["rows_out"] = len(df_last)
 
         # Hitung bulan berikutnya
         df_last["tahun"] = df_last["thbl"] // 100
@@ -92,68 +228,751 @@ class MovingAverageTransformer(BaseEstimator, TransformerMixin):
 
         # Status dan prediksi
         df_last["status_database"] = df_last.get("status_database", df_last["status"])
-        df_last["status"] = "Belum Dibayar"
+        df_last["status"] = pd.Series("Belum Dibayar", index=df_last.index).astype(X["status"].dtype)
         df_last["is_prediksi"] = True
 
         # Gunakan tanggal hari ini sebagai tgl_lunas untuk prediksi belum dibayar
-        today = pd.Timestamp.today().normalize()
+        today = _today()
         df_last["tgl_lunas"] = today
 
         # Hitung selisih hari
         df_last["selisih_hari"] = (df_last["tgl_lunas"] - df_last["awal_tagihan"]).dt.days
 
         # Hapus prediksi lama
-        X = X[~X["is_prediksi"]]
+        if X["is_prediksi"].any():
+            X = X[~X["is_prediksi"]]
 
         # Gabungkan data aktual dan prediksi baru
-        df_final = pd.concat([X, df_last], ignore_index=True).sort_values(by=["no_plg", "thbl"])
+        with profiling.stage("concat_sort", rows_in=len(X) + len(df_last)) as record:
+            df_final = pd.concat([X, df_last], ignore_index=True).sort_values(by=["no_plg", "thbl"])
+            record["rows_out"] = len(df_final)
 
         return df_final
 
+# 🔹 Versi artefak model (build_model.py); naikkan setiap kali parameter atau logika pipeline berubah
+MODEL_VERSION = "2"
+
 # 🔹 Pipeline Prediksi
-prediction_pipeline = Pipeline([
-    ('preprocessing', PreprocessingTransformer()),
-    ('moving_average', MovingAverageTransformer())
-])
+# compact=True: tanpa salinan antar tahap + dtype categorical/downcast (untuk riwayat besar)
+def build_pipeline(window=2, compact=False):
+    return Pipeline([
+        ('preprocessing', PreprocessingTransformer(copy=not compact, compact=compact)),
+        ('moving_average', MovingAverageTransformer(window=window, copy=not compact))
+    ])
+
+prediction_pipeline = build_pipeline()
+
+# 🔹 Eksekusi paralel: riwayat dipecah per hash no_plg sehingga tiap pelanggan utuh di satu partisi
+# (rolling mean & prediksi bulan berikutnya tidak pernah melintasi pelanggan).
+# Partisi dibuat satu per satu dan ditulis ke file sementara (Arrow IPC bila pyarrow ada, selain itu pickle);
+# worker hanya menerima path file, bukan data yang di-pickle lewat pipe. Paling banyak `in_flight` partisi
+# menunggu / diproses sekaligus, sehingga memori proses utama tidak memegang salinan seluruh partisi.
+WORKERS = int(os.getenv("PREDICTION_WORKERS", "1"))
+PARTITIONS_PER_WORKER = int(os.getenv("PREDICTION_PARTITIONS_PER_WORKER", "4"))
+
+def partition_by_customer(df, partitions):
+    bucket = pd.util.hash_pandas_object(df["no_plg"], index=False).to_numpy() % partitions
+    for i in range(partitions):
+        yield df[bucket == i]
+
+def _write_partition(df, path):
+    if importlib.util.find_spec("pyarrow") is None:
+        df.to_pickle(path)
+        return path
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+def _read_partition(path):
+    if importlib.util.find_spec("pyarrow") is None:
+        return pd.read_pickle(path)
+    import pyarrow as pa
+
+    with pa.OSFile(path, "rb") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def _run_partition(path, window, compact):
+    df = _read_partition(path)
+    os.remove(path)
+    hasil = build_pipeline(window=window, compact=compact).fit_transform(df)
+    return _write_partition(hasil, f"{path}.hasil")
+
+def run_pipeline_parallel(data, workers=None, window=2, compact=False, in_flight=None):
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 2 * workers
+    if compact:
+        # Kategori ditetapkan sekali di sini agar dtype semua partisi sama dan tetap categorical saat digabung
+        data = compact_dtypes(data)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="prediksi_") as tmp, ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for i, partisi in enumerate(partition_by_customer(data, workers * PARTITIONS_PER_WORKER)):
+            if partisi.empty:
+                continue
+            path = _write_partition(partisi, os.path.join(tmp, f"partisi_{i}"))
+            del partisi
+            pending[executor.submit(_run_partition, path, window, compact)] = i
+            while len(pending) >= in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+        for future in wait(pending).done:
+            results[pending[future]] = future.result()
+
+        # Gabungan deterministik: urutan partisi tetap lalu diurutkan stabil per pelanggan & periode
+        df_final = pd.concat([_read_partition(results[i]) for i in sorted(results)], ignore_index=True)
+    return df_final.sort_values(by=["no_plg", "thbl"], kind="stable", ignore_index=True)
 
 # 🔹 Fungsi mendapatkan prediksi
-def get_prediction():
+def get_prediction(workers=WORKERS):
     data = load_data()
     if data.empty:
         return {"error": "❌ Data tidak ditemukan atau terjadi kesalahan saat membaca database."}
 
-    df_final = prediction_pipeline.fit_transform(data)
+    if workers > 1:
+        steps = prediction_pipeline.named_steps
+        df_final = run_pipeline_parallel(data, workers=workers, window=steps["moving_average"].window,
+                                         compact=steps["preprocessing"].compact)
+    else:
+        df_final = prediction_pipeline.fit_transform(data)
     if df_final.empty:
         return {"error": "❌ Prediksi gagal, tidak ada data yang diproses."}
 
     return df_final
 
-# 🔹 Fungsi simpan ke database
+# 🔹 Normalisasi kolom tanggal sebelum disimpan
+def _prepare_for_save(df):
+    df["awal_tagihan"] = df["awal_tagihan"].where(pd.notna(df["awal_tagihan"]), None)
+    df["tgl_tenggat"] = df["tgl_tenggat"].where(pd.notna(df["tgl_tenggat"]), None)
+    df["tgl_lunas"] = df["tgl_lunas"].where(pd.notna(df["tgl_lunas"]), _today())
+    return df
+
+# 🔹 Index (no_plg, thbl) untuk pagination & lookup
+def ensure_prediction_index(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_prediksi_pembayaran_no_plg_thbl "
+        f"ON {PREDICTION_TABLE} (no_plg, thbl);"
+    ))
+
+# 🔹 Tulis DataFrame ke tabel lewat COPY FROM STDIN (jauh lebih cepat daripada INSERT multi-baris)
+def copy_frame(conn, df, table):
+    # Float yang isinya bilangan bulat ditulis tanpa ".0" agar tetap bisa masuk ke kolom integer
+    df = df.assign(**{
+        col: df[col].astype("Int64")
+        for col in df.select_dtypes(include="float").columns
+        if (df[col].dropna() % 1 == 0).all()
+    })
+    # NULL ditulis sebagai \N agar string kosong tetap string kosong (bukan NULL seperti default CSV)
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep="\\N")
+    buffer.seek(0)
+
+    columns = ", ".join(_ident(col) for col in df.columns)
+    cur = conn.connection.cursor()
+    try:
+        cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cur.close()
+
+# 🔹 Ganti isi tabel kecil (mis. state) dengan COPY: buat ulang struktur dari DataFrame lalu salin datanya
+def replace_table_with_copy(conn, df, table):
+    df.head(0).to_sql(table, conn, if_exists="replace", index=False)
+    copy_frame(conn, df, table)
+
+# Identifier SQL dengan kutip ganda (nama index / kolom apa adanya, termasuk huruf besar & spasi)
+def _ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _table_exists(conn, table):
+    return conn.execute(text("SELECT to_regclass(:table);"), {"table": table}).scalar() is not None
+
+# 🔹 Tabel staging mengikuti struktur prediksi_pembayaran (tanpa index agar COPY cepat)
+def create_staging_table(conn, df):
+    conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE};"))
+    if _table_exists(conn, PREDICTION_TABLE):
+        existing = set(pd.read_sql(text(f"SELECT * FROM {PREDICTION_TABLE} LIMIT 0;"), conn).columns)
+        if set(df.columns) <= existing:
+            conn.execute(text(
+                f"CREATE TABLE {STAGING_TABLE} (LIKE {PREDICTION_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);"
+            ))
+            return
+    # Tabel belum ada atau kolomnya berubah: struktur diambil dari DataFrame
+    df.head(0).to_sql(STAGING_TABLE, conn, index=False)
+
+# 🔹 Tukar staging menjadi prediksi_pembayaran dalam satu transaksi
+# Index, primary key / unique constraint dan view yang bergantung pada tabel lama dibaca dari katalog:
+#   1. index dibuat ulang di staging (setelah data masuk) dengan nama sementara
+#   2. tabel ditukar lewat RENAME, view di-CREATE OR REPLACE agar menunjuk ke tabel baru
+#   3. tabel lama di-DROP, lalu index diberi nama lama / dipasang kembali sebagai constraint (USING INDEX)
+def swap_staging_table(conn):
+    indexes = conn.execute(text("""
+        SELECT i.relname, pg_get_indexdef(i.oid), c.conname, c.contype,
+               format('CREATE %sINDEX %I ON %I.%I', CASE WHEN x.indisunique THEN 'UNIQUE ' ELSE '' END,
+                      i.relname, n.nspname, t.relname) AS prefix,
+               x.indisunique
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid AND c.contype IN ('p', 'u')
+        WHERE x.indrelid = to_regclass(:table);
+    """), {"table": PREDICTION_TABLE}).fetchall()
+    views = conn.execute(text("""
+        SELECT DISTINCT format('%I.%I', n.nspname, v.relname), pg_get_viewdef(v.oid),
+               array_to_string(v.reloptions, ', ')
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        JOIN pg_namespace n ON n.oid = v.relnamespace
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refclassid = 'pg_class'::regclass
+          AND d.refobjid = to_regclass(:table) AND v.oid <> d.refobjid AND v.relkind = 'v';
+    """), {"table": PREDICTION_TABLE}).fetchall()
+
+    renamed = []
+    for name, indexdef, constraint, contype, prefix, unique in indexes:
+        if not indexdef.startswith(prefix):
+            raise ValueError(f"Definisi index {name} tidak dikenali: {indexdef}")
+        temp_name = f"{name[:55]}_baru"
+        conn.exec_driver_sql(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {_ident(temp_name)} ON {STAGING_TABLE}"
+            f"{indexdef[len(prefix):]}"
+        )
+        renamed.append((temp_name, name, constraint, contype))
+
+    conn.execute(text(f"ALTER TABLE IF EXISTS {PREDICTION_TABLE} RENAME TO {PREDICTION_TABLE}_lama;"))
+    conn.execute(text(f"ALTER TABLE {STAGING_TABLE} RENAME TO {PREDICTION_TABLE};"))
+    for view, definition, options in views:
+        with_options = f" WITH ({options})" if options else ""
+        conn.exec_driver_sql(f"CREATE OR REPLACE VIEW {view}{with_options} AS {definition}")
+    conn.execute(text(f"DROP TABLE IF EXISTS {PREDICTION_TABLE}_lama;"))
+
+    for temp_name, name, constraint, contype in renamed:
+        if contype in ("p", "u"):
+            kind = "PRIMARY KEY" if contype == "p" else "UNIQUE"
+            conn.exec_driver_sql(
+                f"ALTER TABLE {PREDICTION_TABLE} ADD CONSTRAINT {_ident(constraint)} {kind} USING INDEX {_ident(temp_name)};"
+            )
+        else:
+            conn.exec_driver_sql(f"ALTER INDEX {_ident(temp_name)} RENAME TO {_ident(name)};")
+    ensure_prediction_index(conn)
+
+# 🔹 COPY seluruh prediksi ke tabel staging (swap dilakukan pemanggil di transaksi yang sama)
+def write_staging(conn, df):
+    print(f"📦 Menyimpan {len(df)} baris ke database...")
+    create_staging_table(conn, df)
+    with profiling.stage("copy", rows_in=len(df)):
+        copy_frame(conn, df, STAGING_TABLE)
+
+# 🔹 Fungsi simpan ke database: COPY ke staging lalu swap, pembaca tetap melihat data lama sampai commit
+@profiling.profiled("save_predictions")
 def save_predictions(df):
     try:
-        engine = create_engine(f'postgresql+psycopg2://{CONFIG["user"]}:{CONFIG["password"]}@{CONFIG["host"]}:{CONFIG["port"]}/{CONFIG["dbname"]}')
+        df = _prepare_for_save(df)
+
+        with get_engine().begin() as conn:
+            write_staging(conn, df)
+            with profiling.stage("swap"):
+                swap_staging_table(conn)
+            cache.bump_version(conn)
+        print(f"✅ Data berhasil disimpan ke tabel '{PREDICTION_TABLE}'.")
+        cache.refresh_local()
+        return True
+    except Exception as e:
+        print(f"❌ Error saat menyimpan data: {e}")
+        return False
+
+# 🔹 State per pelanggan: thbl & awal_tagihan terakhir serta dua selisih_hari terakhir
+def build_state(df):
+    aktual = df[~df["is_prediksi"].astype(bool)].sort_values(by=["no_plg", "thbl"], kind="stable")
+    grup = aktual.groupby("no_plg", sort=False)
+
+    state = grup.tail(1)[["no_plg", "thbl", "awal_tagihan", "selisih_hari"]].rename(columns={
+        "thbl": "last_thbl",
+        "awal_tagihan": "last_awal_tagihan",
+        "selisih_hari": "selisih_1",
+    })
+    state["selisih_2"] = grup["selisih_hari"].shift(1).loc[state.index]
+    return state.reset_index(drop=True)
+
+# 🔹 Ubah state menjadi baris "seed" agar rolling mean menyambung ke riwayat lama
+def state_to_seed(state):
+    lama = pd.DataFrame({
+        "no_plg": state["no_plg"],
+        "thbl": 0,
+        "awal_tagihan": pd.NaT,
+        "selisih_hari": state["selisih_2"],
+    })
+    terakhir = pd.DataFrame({
+        "no_plg": state["no_plg"],
+        "thbl": state["last_thbl"],
+        "awal_tagihan": pd.to_datetime(state["last_awal_tagihan"], errors="coerce"),
+        "selisih_hari": state["selisih_1"],
+    })
+    seed = pd.concat([lama.dropna(subset=["selisih_hari"]), terakhir], ignore_index=True)
+    seed["is_prediksi"] = False
+    seed["_seed"] = True
+    return seed
+
+def _ensure_meta_table(conn):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT);"))
+
+def _read_meta(conn, key):
+    _ensure_meta_table(conn)
+    row = conn.execute(text(f"SELECT value FROM {META_TABLE} WHERE key = :key;"), {"key": key}).fetchone()
+    return row[0] if row else None
+
+def _write_meta(conn, key, value):
+    _ensure_meta_table(conn)
+    conn.execute(text(f"""
+        INSERT INTO {META_TABLE} (key, value) VALUES (:key, :value)
+        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;
+    """), {"key": key, "value": str(value)})
+
+def _read_watermark(conn):
+    value = _read_meta(conn, "watermark_thbl")
+    return int(value) if value is not None else None
+
+def _write_watermark(conn, thbl):
+    _write_meta(conn, "watermark_thbl", int(thbl))
+
+# 🔹 Log perubahan: trigger mencatat (no_plg, thbl) setiap INSERT/UPDATE/DELETE pada history_pembayaran,
+# termasuk pembayaran terlambat, koreksi status (/update_status di app.py) dan baris bulan lama yang baru masuk.
+# Tipe no_plg/thbl disalin dari history_pembayaran agar lookup memakai index yang sama.
+def ensure_change_log(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} AS
+        SELECT no_plg, thbl FROM history_pembayaran WITH NO DATA;
+    """))
+    conn.execute(text(f"ALTER TABLE {CHANGE_TABLE} ADD COLUMN IF NOT EXISTS id bigserial PRIMARY KEY;"))
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION catat_perubahan_history() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO {CHANGE_TABLE} (no_plg, thbl) VALUES (OLD.no_plg, OLD.thbl);
+            END IF;
+            IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR (OLD.no_plg, OLD.thbl) IS DISTINCT FROM (NEW.no_plg, NEW.thbl)) THEN
+                INSERT INTO {CHANGE_TABLE} (no_plg, thbl) VALUES (NEW.no_plg, NEW.thbl);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """))
+    # Trigger hanya dibuat bila belum ada (tanpa DROP: tidak ada jeda di mana perubahan tidak tercatat)
+    ada = conn.execute(text("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = to_regclass('history_pembayaran') AND tgname = 'trg_catat_perubahan_history';
+    """)).fetchone()
+    if not ada:
+        conn.execute(text("""
+            CREATE TRIGGER trg_catat_perubahan_history
+            AFTER INSERT OR UPDATE OR DELETE ON history_pembayaran
+            FOR EACH ROW EXECUTE PROCEDURE catat_perubahan_history();
+        """))
+
+def _max_change_id(conn):
+    return conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {CHANGE_TABLE};")).scalar()
+
+# Dipanggil sebelum history dibaca oleh prediksi penuh: perubahan setelah titik ini diproses run berikutnya
+def _start_full_refresh():
+    with get_engine().begin() as conn:
+        ensure_change_log(conn)
+        return _max_change_id(conn)
+
+def _finish_full_refresh(conn, change_id):
+    _write_meta(conn, "watermark_change_id", change_id)
+    _write_meta(conn, "last_full_refresh", pd.Timestamp.now().isoformat(timespec="seconds"))
+    conn.execute(text(f"DELETE FROM {CHANGE_TABLE} WHERE id <= :id;"), {"id": change_id})
+
+def _full_refresh_due(conn):
+    if FULL_REFRESH_DAYS <= 0:
+        return False
+    last = _read_meta(conn, "last_full_refresh")
+    return last is None or pd.Timestamp.now() - pd.Timestamp(last) > pd.Timedelta(days=FULL_REFRESH_DAYS)
+
+# 🔹 Tabel rollup bulanan untuk endpoint ringkasan (dibaca lewat primary key)
+# Semua tabel ini milik batch model.py (prefix rollup_): tabel ringkasan lama di database (pembayaran_thbl,
+# jumlah_pelanggan_terlambat_*, pelanggan_belum_bayar) tidak disentuh dan tetap dipakai app.py sampai
+# rollup pertama dibangun.
+ROLLUP_TABLE = "rollup_pembayaran"
+SUMMARY_TABLE = "rollup_ringkasan_thbl"
+STATUS_TABLE = "rollup_status_thbl"
+LATE_ZONA_TABLE = "rollup_terlambat_zona"
+LATE_SUBKELOMPOK_TABLE = "rollup_terlambat_subkelompok"
+UNPAID_TABLE = "rollup_belum_bayar"
+ROLLUP_DDL = {
+    # per thbl x zona x subkelompok x status; dipakai /get_aggregate
+    ROLLUP_TABLE: """
+        thbl integer NOT NULL, zona text NOT NULL, subkelompok text NOT NULL, status text NOT NULL,
+        jumlah_tagihan bigint NOT NULL, jumlah_pelanggan bigint NOT NULL, total_tagihan numeric NOT NULL,
+        PRIMARY KEY (thbl, zona, subkelompok, status)
+    """,
+    # /get_summary
+    SUMMARY_TABLE: """
+        thbl integer PRIMARY KEY, total_revenue numeric NOT NULL,
+        total_customers bigint NOT NULL, total_late bigint NOT NULL
+    """,
+    # /get_summary_thbl
+    STATUS_TABLE: """
+        thbl integer PRIMARY KEY, tepat_waktu bigint NOT NULL, terlambat bigint NOT NULL, belum_dibayar bigint NOT NULL
+    """,
+    # /get_late_zona & /get_late_subkelompok
+    LATE_ZONA_TABLE: """
+        thbl integer NOT NULL, zona text NOT NULL, jumlah_pelanggan bigint NOT NULL, PRIMARY KEY (thbl, zona)
+    """,
+    LATE_SUBKELOMPOK_TABLE: """
+        thbl integer NOT NULL, subkelompok text NOT NULL, jumlah_pelanggan bigint NOT NULL,
+        PRIMARY KEY (thbl, subkelompok)
+    """,
+    # /api/pelanggan_belum_bayar (per pelanggan, bukan per thbl)
+    UNPAID_TABLE: """
+        no_plg text PRIMARY KEY, jumlah_bulan integer NOT NULL, subkelompok text, zona text
+    """,
+}
 
-        df["awal_tagihan"] = df["awal_tagihan"].where(pd.notna(df["awal_tagihan"]), None)
-        df["tgl_tenggat"] = df["tgl_tenggat"].where(pd.notna(df["tgl_tenggat"]), None)
-        df["tgl_lunas"] = df["tgl_lunas"].where(pd.notna(df["tgl_lunas"]), pd.Timestamp.today().normalize())
+# Hasil True bila ada tabel rollup yang baru dibuat (belum pernah diisi)
+def ensure_rollup_tables(conn):
+    missing = [
+        table for table in ROLLUP_DDL
+        if conn.execute(text("SELECT to_regclass(:table) IS NULL;"), {"table": table}).scalar()
+    ]
+    for table in missing:
+        conn.execute(text(f"CREATE TABLE {table} ({ROLLUP_DDL[table]});"))
+    # Keyset pagination /api/pelanggan_belum_bayar (urut jumlah_bulan, no_plg)
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS idx_{UNPAID_TABLE}_jumlah_bulan ON {UNPAID_TABLE} (jumlah_bulan, no_plg);"
+    ))
+    return bool(missing)
+
+# 🔹 Hitung ulang semua rollup untuk thbl >= from_thbl (None = seluruh riwayat) dalam satu pass
+# GROUPING SETS menghasilkan semua tingkat agregasi dari satu kali baca history_pembayaran;
+# bit GROUPING(zona, subkelompok, status) menandai tingkatnya (0 = paling rinci, 7 = per thbl).
+# Tabel per pelanggan (rollup_belum_bayar) dihitung ulang untuk `customers` (mis. pelanggan di log perubahan,
+# termasuk yang seluruh riwayatnya sudah dihapus); tanpa daftar itu seluruh tabel dihitung ulang.
+@profiling.profiled("refresh_rollups")
+def refresh_rollups(conn, from_thbl=None, customers=None):
+    if ensure_rollup_tables(conn):
+        from_thbl, customers = None, None  # tabel baru: isi dari seluruh riwayat
+    where = "WHERE thbl >= :from_thbl" if from_thbl is not None else ""
+    params = {"from_thbl": int(from_thbl)} if from_thbl is not None else {}
+
+    conn.execute(text("DROP TABLE IF EXISTS _rollup;"))
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _rollup ON COMMIT DROP AS
+        SELECT
+            GROUPING(zona, subkelompok, status) AS tingkat,
+            thbl, zona, subkelompok, status,
+            COUNT(*) AS jumlah_tagihan,
+            COUNT(DISTINCT no_plg) AS jumlah_pelanggan,
+            COALESCE(SUM(rp_tagihan), 0) AS total_tagihan,
+            COUNT(*) FILTER (WHERE status = 'Tepat Waktu') AS tepat_waktu,
+            COUNT(*) FILTER (WHERE status = 'Terlambat') AS terlambat,
+            COUNT(*) FILTER (WHERE status = 'Belum Dibayar') AS belum_dibayar,
+            COUNT(DISTINCT no_plg) FILTER (WHERE status = 'Terlambat') AS pelanggan_terlambat
+        FROM (
+            SELECT thbl, no_plg, rp_tagihan,
+                   COALESCE(CAST(zona AS text), '') AS zona,
+                   COALESCE(CAST(subkelompok AS text), '') AS subkelompok,
+                   COALESCE(status, '') AS status
+            FROM history_pembayaran
+            {where}
+        ) h
+        GROUP BY GROUPING SETS ((thbl, zona, subkelompok, status), (thbl), (thbl, zona), (thbl, subkelompok));
+    """), params)
+
+    for table in ROLLUP_DDL:
+        if table != UNPAID_TABLE:
+            conn.execute(text(f"DELETE FROM {table} {where};"), params)
+
+    conn.execute(text(f"""
+        INSERT INTO {ROLLUP_TABLE} (thbl, zona, subkelompok, status, jumlah_tagihan, jumlah_pelanggan, total_tagihan)
+        SELECT thbl, zona, subkelompok, status, jumlah_tagihan, jumlah_pelanggan, total_tagihan
+        FROM _rollup WHERE tingkat = 0;
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {SUMMARY_TABLE} (thbl, total_revenue, total_customers, total_late)
+        SELECT thbl, total_tagihan, jumlah_pelanggan, terlambat FROM _rollup WHERE tingkat = 7;
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {STATUS_TABLE} (thbl, tepat_waktu, terlambat, belum_dibayar)
+        SELECT thbl, tepat_waktu, terlambat, belum_dibayar FROM _rollup WHERE tingkat = 7;
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {LATE_ZONA_TABLE} (thbl, zona, jumlah_pelanggan)
+        SELECT thbl, zona, pelanggan_terlambat FROM _rollup WHERE tingkat = 3 AND pelanggan_terlambat > 0;
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {LATE_SUBKELOMPOK_TABLE} (thbl, subkelompok, jumlah_pelanggan)
+        SELECT thbl, subkelompok, pelanggan_terlambat FROM _rollup WHERE tingkat = 5 AND pelanggan_terlambat > 0;
+    """))
+
+    filter_plg = "WHERE no_plg = ANY(:customers)" if customers is not None else ""
+    plg_params = {"customers": [str(no_plg) for no_plg in customers]} if customers is not None else {}
+    conn.execute(text(f"DELETE FROM {UNPAID_TABLE} {filter_plg};"), plg_params)
+    conn.execute(text(f"""
+        INSERT INTO {UNPAID_TABLE} (no_plg, jumlah_bulan, subkelompok, zona)
+        SELECT no_plg,
+               COUNT(*) FILTER (WHERE status = 'Belum Dibayar'),
+               (ARRAY_AGG(CAST(subkelompok AS text) ORDER BY thbl DESC))[1],
+               (ARRAY_AGG(CAST(zona AS text) ORDER BY thbl DESC))[1]
+        FROM history_pembayaran
+        {filter_plg}
+        GROUP BY no_plg
+        HAVING COUNT(*) FILTER (WHERE status = 'Belum Dibayar') > 0;
+    """), plg_params)
+    print(f"📊 Rollup diperbarui{'' if from_thbl is None else f' untuk thbl >= {from_thbl}'}.")
+
+# 🔹 Prediksi penuh secara streaming: memori terbatas pada satu chunk
+# Semua blok ditulis dalam satu transaksi sehingga pembaca tidak melihat tabel setengah jadi;
+# pembaca prediksi_pembayaran hanya tertahan sejak swap (langkah terakhir) sampai commit
+def refresh_predictions_streaming(chunksize=CHUNK_SIZE):
+    total_baris = 0
+    total_pelanggan = 0
+    watermark = None
 
-        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
-            print(f"📦 Menyimpan {len(df)} baris ke database...")
-            df.to_sql("prediksi_pembayaran", conn, if_exists="replace", index=False, chunksize=10000)
-            print("✅ Data berhasil disimpan ke tabel 'prediksi_pembayaran'.")
+    try:
+        change_id = _start_full_refresh()
+        with get_engine().begin() as conn:
+            for blok in iter_customer_blocks(iter_history_chunks(chunksize)):
+                df_blok = _prepare_for_save(prediction_pipeline.fit_transform(blok))
+                state = build_state(df_blok)
+
+                if total_baris == 0:
+                    create_staging_table(conn, df_blok)
+                    state.head(0).to_sql(STATE_TABLE, conn, if_exists="replace", index=False)
+                copy_frame(conn, df_blok, STAGING_TABLE)
+                copy_frame(conn, state, STATE_TABLE)
+
+                total_baris += len(df_blok)
+                total_pelanggan += len(state)
+                if not state.empty:
+                    blok_max = int(state["last_thbl"].max())
+                    watermark = blok_max if watermark is None else max(watermark, blok_max)
+                print(f"📦 {total_baris} baris prediksi ditulis ({total_pelanggan} pelanggan)...")
+
+            if watermark is None:
+                return {"error": "❌ Data tidak ditemukan atau terjadi kesalahan saat membaca database."}
+            _write_watermark(conn, watermark)
+            _finish_full_refresh(conn, change_id)
+            refresh_rollups(conn)
+            # Swap paling akhir: lock ACCESS EXCLUSIVE dari RENAME hanya dipegang sampai commit,
+            # bukan selama rollup dihitung (rollup dibaca dari history_pembayaran, tidak perlu tabel baru)
+            swap_staging_table(conn)
+            cache.bump_version(conn)
+    except Exception as e:
+        print(f"❌ Error saat prediksi streaming: {e}")
+        return {"error": "❌ Gagal menjalankan prediksi streaming."}
+
+    cache.refresh_local()
+    print(f"✅ Prediksi streaming selesai, total {total_baris} baris.")
+    return {"rows": total_baris, "customers": total_pelanggan}
+
+# 🔹 Prediksi penuh: hitung ulang seluruh riwayat lalu simpan state & watermark
+def refresh_predictions_full(streaming=False, workers=WORKERS):
+    if streaming:
+        return refresh_predictions_streaming()
+
+    try:
+        change_id = _start_full_refresh()
+    except Exception as e:
+        print(f"❌ Error saat menyiapkan log perubahan: {e}")
+        return {"error": "❌ Data tidak ditemukan atau terjadi kesalahan saat membaca database."}
+    df_final = get_prediction(workers=workers)
+    if isinstance(df_final, dict):
+        return df_final
+
+    print(f"✅ Prediksi selesai, total {len(df_final)} baris.")
+    df_final = _prepare_for_save(df_final)
+    state = build_state(df_final)
+    # Prediksi, state, watermark dan rollup dalam satu transaksi: crash di tengah tidak meninggalkan
+    # watermark yang lebih maju dari data. Swap paling akhir agar lock-nya hanya dipegang sampai commit.
+    try:
+        with get_engine().begin() as conn:
+            write_staging(conn, df_final)
+            replace_table_with_copy(conn, state, STATE_TABLE)
+            _write_watermark(conn, state["last_thbl"].max())
+            _finish_full_refresh(conn, change_id)
+            refresh_rollups(conn)
+            with profiling.stage("swap"):
+                swap_staging_table(conn)
+            cache.bump_version(conn)
     except Exception as e:
         print(f"❌ Error saat menyimpan data: {e}")
+        return {"error": "❌ Gagal menyimpan prediksi."}
+    cache.refresh_local()
+    return df_final
+
+# 🔹 Bagian pandas dari prediksi inkremental (tanpa database)
+# berubah: no_plg & min_thbl yang berubah, state: state tersimpan, riwayat: seluruh history pelanggan yang berubah.
+# Hasil: (baris prediksi baru, state baru, pelanggan yang dihitung ulang dari seluruh riwayat)
+def incremental_update(berubah, state, riwayat, pipeline=None):
+    pipeline = pipeline or prediction_pipeline
+    # Pelanggan yang berubah pada/di bawah last_thbl di state -> hitung ulang seluruh riwayatnya
+    berubah = berubah.merge(state[["no_plg", "last_thbl"]], on="no_plg", how="left")
+    ulang = set(berubah.loc[berubah["min_thbl"] <= berubah["last_thbl"], "no_plg"])
+    sambung = state[~state["no_plg"].isin(ulang)]
+    last_thbl = riwayat["no_plg"].map(sambung.set_index("no_plg")["last_thbl"])
+    baru = riwayat[~riwayat["no_plg"].isin(ulang) & ~(riwayat["thbl"] <= last_thbl)]
+    lengkap = riwayat[riwayat["no_plg"].isin(ulang)]
+    print(f"📥 {len(berubah)} pelanggan berubah sejak run terakhir: {len(berubah) - len(ulang)} disambung dari state, "
+          f"{len(ulang)} dihitung ulang dari seluruh riwayat.")
+
+    hasil, states = [], []
+    if not baru.empty:
+        seed = state_to_seed(sambung[sambung["no_plg"].isin(baru["no_plg"])])
+        X = pipeline.named_steps["preprocessing"].transform(baru)
+        df_sambung = pipeline.named_steps["moving_average"].transform_incremental(X, seed)
+        # State baru dihitung dari seed + baris aktual baru agar selisih_2 tetap terisi
+        aktual_baru = df_sambung[~df_sambung["is_prediksi"]]
+        states.append(build_state(pd.concat([seed.drop(columns="_seed"), aktual_baru], ignore_index=True)))
+        hasil.append(df_sambung)
+    if not lengkap.empty:
+        df_ulang = pipeline.fit_transform(lengkap)
+        states.append(build_state(df_ulang))
+        hasil.append(df_ulang)
+    df_final = pd.concat(hasil, ignore_index=True) if hasil else riwayat.head(0)
+    state_baru = pd.concat(states, ignore_index=True) if states else state.head(0)
+    return df_final, state_baru, ulang
+
+# 🔹 Kolom yang bergantung pada tanggal hari ini
+# Tagihan belum lunas memakai hari ini sebagai tgl_lunas, sehingga selisih_hari-nya (dan rolling mean sesudahnya)
+# bertambah setiap hari. Pelanggan dengan tagihan terbuka karenanya dihitung ulang pada setiap run inkremental.
+OPEN_BILLS_SQL = """
+    SELECT no_plg, MIN(thbl) AS min_thbl FROM history_pembayaran
+    WHERE status = 'Belum Dibayar' AND tgl_lunas IS NULL
+    GROUP BY no_plg;
+"""
+
+# Baris prediksi bulan berikutnya milik pelanggan lain: cukup tgl_lunas & selisih_hari yang digeser ke hari ini
+def _refresh_prediction_dates(conn):
+    result = conn.execute(text(f"""
+        UPDATE {PREDICTION_TABLE}
+        SET tgl_lunas = :today, selisih_hari = CAST(:today AS date) - CAST(awal_tagihan AS date)
+        WHERE is_prediksi = true AND tgl_lunas IS DISTINCT FROM :today;
+    """), {"today": _today().to_pydatetime()})
+    return result.rowcount
+
+# 🔹 Prediksi inkremental: hanya pelanggan yang berubah sejak run terakhir
+# Pelanggan yang berubah = tercatat di log perubahan (id > watermark_change_id) atau punya tagihan thbl > watermark.
+#   - perubahan hanya setelah state terakhir pelanggan -> disambung dari state (seed)
+#   - perubahan pada bulan yang sudah diproses (koreksi status, pembayaran terlambat, baris bulan lama yang
+#     baru masuk) -> seluruh riwayat pelanggan itu dihitung ulang
+# Pelanggan dengan tagihan belum lunas selalu dihitung ulang dan tanggal baris prediksi lainnya digeser ke hari ini,
+# sehingga hasilnya sama dengan prediksi penuh pada hari yang sama.
+# Prediksi penuh tetap dijalankan otomatis setiap PREDICTION_FULL_REFRESH_DAYS hari sebagai rekonsiliasi
+# (atau jadwalkan "python model.py --full", mis. cron mingguan).
+def refresh_predictions(incremental=True, streaming=False, workers=WORKERS):
+    engine = get_engine()
+    with engine.begin() as conn:
+        watermark = _read_watermark(conn)
+        change_watermark = _read_meta(conn, "watermark_change_id")
+        full_due = _full_refresh_due(conn)
+
+    if not incremental or watermark is None or change_watermark is None or full_due:
+        print("🔁 Menjalankan prediksi penuh...")
+        return refresh_predictions_full(streaming=streaming, workers=workers)
+    change_watermark = int(change_watermark)
+
+    try:
+        with engine.connect() as conn:
+            change_id = _max_change_id(conn)
+            berubah = pd.read_sql(text(f"""
+                SELECT no_plg, MIN(thbl) AS min_thbl FROM (
+                    SELECT no_plg, thbl FROM {CHANGE_TABLE} WHERE id > :change_id
+                    UNION ALL
+                    SELECT no_plg, thbl FROM history_pembayaran WHERE thbl > :watermark
+                ) perubahan
+                GROUP BY no_plg;
+            """), conn, params={"change_id": change_watermark, "watermark": watermark})
+            terbuka = pd.read_sql(text(OPEN_BILLS_SQL), conn)
+            dihitung = pd.concat([berubah, terbuka]).groupby("no_plg", as_index=False)["min_thbl"].min()
+
+            no_plg_list = dihitung["no_plg"].tolist()
+            state = pd.read_sql(
+                text(f"SELECT * FROM {STATE_TABLE} WHERE no_plg = ANY(:no_plg_list);"),
+                conn, params={"no_plg_list": no_plg_list}
+            )
+            riwayat = pd.read_sql(
+                text("SELECT * FROM history_pembayaran WHERE no_plg = ANY(:no_plg_list) ORDER BY no_plg, thbl;"),
+                conn, params={"no_plg_list": no_plg_list}
+            )
+    except Exception as e:
+        print(f"❌ Error saat membaca database: {e}")
+        return {"error": "❌ Data tidak ditemukan atau terjadi kesalahan saat membaca database."}
+
+    if no_plg_list:
+        df_final, state_baru, ulang = incremental_update(dihitung, state, riwayat)
+        df_final = _prepare_for_save(df_final)
+    else:
+        df_final, state_baru, ulang = riwayat, state, set()
 
-# 🔹 Simpan model pipeline
-with open("model.pkl", "wb") as f:
-    pickle.dump(prediction_pipeline, f)
+    try:
+        with engine.begin() as conn:
+            if no_plg_list:
+                # Pelanggan yang dihitung ulang diganti seluruhnya (termasuk baris yang sudah dihapus dari history)
+                conn.execute(
+                    text(f"DELETE FROM {PREDICTION_TABLE} WHERE no_plg = ANY(:no_plg_list) "
+                         "AND (is_prediksi = true OR no_plg = ANY(:ulang));"),
+                    {"no_plg_list": no_plg_list, "ulang": list(ulang)}
+                )
+                copy_frame(conn, df_final, PREDICTION_TABLE)
+                ensure_prediction_index(conn)
+
+                conn.execute(
+                    text(f"DELETE FROM {STATE_TABLE} WHERE no_plg = ANY(:no_plg_list);"),
+                    {"no_plg_list": no_plg_list}
+                )
+                copy_frame(conn, state_baru, STATE_TABLE)
+            tanggal = _refresh_prediction_dates(conn)
+            if not no_plg_list and not tanggal:
+                print(f"✅ Tidak ada perubahan sejak thbl {watermark}.")
+                return df_final
+
+            if not state_baru.empty:
+                _write_watermark(conn, max(watermark, int(state_baru["last_thbl"].max())))
+            _write_meta(conn, "watermark_change_id", change_id)
+            conn.execute(text(f"DELETE FROM {CHANGE_TABLE} WHERE id <= :id;"), {"id": change_id})
+            # Rollup hanya bergantung pada history: cukup bila memang ada perubahan data
+            if not berubah.empty:
+                refresh_rollups(conn, from_thbl=int(berubah["min_thbl"].min()), customers=berubah["no_plg"])
+            cache.bump_version(conn)
+        cache.refresh_local()
+        print(f"✅ {len(df_final)} baris prediksi diperbarui untuk {len(no_plg_list)} pelanggan, "
+              f"tanggal {tanggal} baris prediksi lain digeser ke hari ini.")
+    except Exception as e:
+        print(f"❌ Error saat menyimpan data: {e}")
+        return {"error": "❌ Gagal menyimpan prediksi inkremental."}
 
-print("✅ Model pipeline berhasil disimpan sebagai 'model.pkl'")
+    return df_final
 
 if __name__ == "__main__":
-    df_pred = get_prediction()
+    # --compact: pipeline tanpa salinan antar tahap + dtype hemat memori
+    if "--compact" in sys.argv:
+        prediction_pipeline = build_pipeline(compact=True)
+
+    # --rollups [--from THBL]: hanya hitung ulang tabel rollup (mis. setelah koreksi status bulan lama)
+    if "--rollups" in sys.argv:
+        from_thbl = sys.argv[sys.argv.index("--from") + 1] if "--from" in sys.argv else None
+        with get_engine().begin() as conn:
+            refresh_rollups(conn, from_thbl=from_thbl)
+            cache.bump_version(conn)
+        cache.refresh_local()
+        sys.exit(0)
+
+    # --workers N: prediksi penuh dijalankan paralel di N proses (default PREDICTION_WORKERS)
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else WORKERS
+
+    # --profile: laporan JSON per tahap; --cprofile: tambah dump cProfile (lihat profiling.py)
+    if "--profile" in sys.argv or "--cprofile" in sys.argv:
+        profiling.enable("cprofile" if "--cprofile" in sys.argv else None)
+
+    # Default inkremental; --full menghitung ulang seluruh riwayat, --stream membacanya per chunk
+    with profiling.run("refresh_predictions"):
+        df_pred = refresh_predictions(incremental="--full" not in sys.argv, streaming="--stream" in sys.argv,
+                                      workers=workers)
     if isinstance(df_pred, dict) and "error" in df_pred:
         print(df_pred["error"])
-    else:
-        print(f"✅ Prediksi selesai, total {len(df_pred)} baris.")
-        save_predictions(df_pred)
\ No newline at end of file
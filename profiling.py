@@ -0,0 +1,134 @@
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 🔹 Profiling opt-in untuk tahap pipeline prediksi (load_data, tiap transform, save_predictions)
+#
+#   python model.py --full --profile              -> profiles/profile-<waktu>.json
+#   python model.py --full --profile --cprofile   -> + profiles/profile-<waktu>.prof (snakeviz / pstats)
+#   PIPELINE_PROFILE=1 PIPELINE_PROFILER=pyinstrument python model.py   (jika pyinstrument terpasang)
+#
+# Per tahap dicatat: wall time, CPU time, baris masuk/keluar, perubahan RSS. Tahap bersarang memakai nama
+# "induk/anak" sehingga mudah terlihat apakah waktu habis di SQL, rolling mean, concat/sort, atau penulisan.
+ENABLED = os.getenv("PIPELINE_PROFILE", "0") == "1"
+PROFILER = os.getenv("PIPELINE_PROFILER", "")          # "", "cprofile" atau "pyinstrument"
+PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR", "profiles")
+
+_stages = []
+_stack = []
+
+def enable(profiler=None):
+    global ENABLED, PROFILER
+    ENABLED = True
+    if profiler is not None:
+        PROFILER = profiler
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _rows(obj):
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+# 🔹 Ukur satu tahap; record["rows_out"] boleh diisi pemanggil
+@contextmanager
+def stage(name, rows_in=None):
+    if not ENABLED:
+        yield {}
+        return
+
+    _stack.append(name)
+    record = {"stage": "/".join(_stack), "rows_in": rows_in, "rows_out": None}
+    rss = _rss_mb()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall, 4)
+        record["cpu_s"] = round(time.process_time() - cpu, 4)
+        record["rss_delta_mb"] = round(_rss_mb() - rss, 1)
+        _stack.pop()
+        _stages.append(record)
+
+# 🔹 Dekorator: baris masuk dari argumen DataFrame pertama, baris keluar dari nilai kembali
+def profiled(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            rows_in = next((_rows(a) for a in args if hasattr(a, "columns")), None)
+            with stage(name, rows_in=rows_in) as record:
+                result = fn(*args, **kwargs)
+                record["rows_out"] = _rows(result) if hasattr(result, "columns") else None
+            return result
+        return wrapper
+    return decorator
+
+def _start_profiler():
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ pyinstrument tidak terpasang, memakai cProfile.")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    if PROFILER:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    return None
+
+def _stop_profiler(profiler, path):
+    if profiler is None:
+        return None
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(path + ".prof")
+        return path + ".prof"
+    profiler.stop()
+    with open(path + ".html", "w") as f:
+        f.write(profiler.output_html())
+    return path + ".html"
+
+# 🔹 Satu run profiling: kumpulkan semua tahap lalu tulis laporan JSON
+@contextmanager
+def run(name):
+    if not ENABLED:
+        yield None
+        return
+
+    _stages.clear()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"profile-{datetime.now():%Y%m%d-%H%M%S}")
+    profiler = _start_profiler()
+    report = {"run": name, "started_at": datetime.now().isoformat(timespec="seconds"), "stages": _stages}
+    try:
+        with stage(name):
+            yield report
+    finally:
+        report["profile_dump"] = _stop_profiler(profiler, path)
+        with open(path + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"⏱️ Laporan profiling: {path}.json")
+        for record in report["stages"]:
+            rows = f"{record['rows_in'] or '-'} -> {record['rows_out'] or '-'}"
+            print(f"  {record['stage']:<55} wall {record['wall_s']:>8.3f}s  cpu {record['cpu_s']:>8.3f}s  "
+                  f"rss {record['rss_delta_mb']:>+8.1f} MB  baris {rows}")
@@ -0,0 +1,251 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import formats
+
+# 🔹 Cache bersama lintas proses/replika Streamlit untuk data dari API
+#
+#   DASHBOARD_SHARED_CACHE=disk   (default) file Arrow IPC di DASHBOARD_CACHE_DIR, dibaca zero-copy via memory map
+#   DASHBOARD_SHARED_CACHE=redis  server Redis (atau pengganti yang kompatibel) di DASHBOARD_REDIS_URL
+#   DASHBOARD_SHARED_CACHE=off    tanpa cache bersama (hanya st.cache_data per proses)
+#
+# Kunci = endpoint + parameter + versi data, sehingga replika yang baru start langsung memakai hasil
+# replika lain dan entri lama otomatis tidak terpakai setelah prediksi dibangun ulang.
+# Pada backend disk kolom DataFrame tetap menunjuk ke halaman file (read-only, dibagi lewat page cache OS);
+# dashboard.py karenanya tidak menyalin frame tersebut lagi ke st.cache_data (lihat zero_copy()).
+# Batasnya: kolom numerik, tanggal dan boolean selalu zero-copy; kolom teks hanya bila pandas memakai dtype
+# string berbasis Arrow (default pandas >= 3). Pada pandas lama kolom teks menjadi object dan tiap nilainya
+# disalin menjadi str Python, karena itu frame yang sudah di-decode juga disimpan di memo per proses
+# (MEMO_ENTRIES) agar rerun berikutnya tidak men-decode ulang.
+BACKEND = os.getenv("DASHBOARD_SHARED_CACHE", "disk")
+CACHE_DIR = os.getenv("DASHBOARD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdam_dashboard_cache"))
+REDIS_URL = os.getenv("DASHBOARD_REDIS_URL", "redis://127.0.0.1:6379/0")
+REDIS_PREFIX = os.getenv("DASHBOARD_REDIS_PREFIX", "pdam:dashboard:")
+DEFAULT_TTL = int(os.getenv("DASHBOARD_SHARED_CACHE_TTL", "3600"))
+MEMO_ENTRIES = int(os.getenv("DASHBOARD_SHARED_CACHE_MEMO", "32"))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# Kunci diawali versi data; versi dibandingkan sebagai string (token dari cache.BUMP_VERSION_SQL urut waktu)
+def make_key(endpoint, params, version):
+    raw = json.dumps({"endpoint": endpoint, "params": params or {}}, sort_keys=True, default=str)
+    return f"{version}-{hashlib.sha1(raw.encode()).hexdigest()}"
+
+# 🔹 Serialisasi nilai: DataFrame -> Arrow IPC (file format, bisa di-memory-map), selain itu JSON.
+# Tanpa pyarrow DataFrame disimpan sebagai pickle.
+ARROW, JSON, PICKLE = b"A", b"J", b"P"
+
+def _is_frame(value):
+    return hasattr(value, "columns") and hasattr(value, "to_dict")
+
+def dumps(value):
+    if _is_frame(value):
+        if formats.arrow_available():
+            pa = formats._arrow()
+            table = pa.Table.from_pandas(value, preserve_index=False)
+            sink = io.BytesIO()
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            return ARROW, sink.getvalue()
+        return PICKLE, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    return JSON, json.dumps(value, default=str).encode()
+
+def loads(kind, source):
+    if kind == ARROW:
+        pa = formats._arrow()
+        # split_blocks + self_destruct: kolom tidak digabung ke blok baru, buffer Arrow dipakai langsung
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True, self_destruct=True)
+    data = source.read() if hasattr(source, "read") else bytes(source)
+    if kind == PICKLE:
+        return pickle.loads(data)
+    return json.loads(data)
+
+# 🔹 Backend disk: satu file per entri, ditulis atomik (tmp + os.replace) sehingga aman dibaca proses lain.
+# DataFrame yang sudah dibaca disimpan di memo per proses (LRU, MEMO_ENTRIES entri) selama file-nya tidak berubah.
+class DiskBackend:
+    EXTENSIONS = {ARROW: ".arrow", JSON: ".json", PICKLE: ".pkl"}
+
+    def __init__(self, cache_dir=CACHE_DIR, memo_entries=MEMO_ENTRIES):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._versions_seen = set()
+        self.memo_entries = memo_entries
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def _paths(self, key):
+        return {kind: os.path.join(self.cache_dir, key + ext) for kind, ext in self.EXTENSIONS.items()}
+
+    # Frame dari memo: salinan dangkal (buffer kolom tetap dibagi) agar kolom baru di pemanggil tidak ikut masuk memo
+    def _memo_get(self, path, stat):
+        with self._memo_lock:
+            entry = self._memo.get(path)
+            if entry is None or entry[0] != (stat.st_mtime, stat.st_size, stat.st_ino):
+                self._memo.pop(path, None)
+                return None
+            self._memo.move_to_end(path)
+            return entry[1].copy(deep=False)
+
+    def _memo_set(self, path, stat, frame):
+        if self.memo_entries <= 0:
+            return
+        with self._memo_lock:
+            self._memo[path] = ((stat.st_mtime, stat.st_size, stat.st_ino), frame)
+            self._memo.move_to_end(path)
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        for kind, path in self._paths(key).items():
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime < now:              # mtime = waktu kedaluwarsa
+                    continue
+                if kind == JSON:
+                    with open(path, "rb") as f:
+                        return loads(kind, f)
+                value = self._memo_get(path, stat)
+                if value is not None:
+                    return value
+                if kind == ARROW:
+                    # Memory map: region tetap hidup selama DataFrame masih memakai buffernya
+                    with formats._arrow().memory_map(path, "r") as source:
+                        value = loads(kind, source)
+                else:
+                    with open(path, "rb") as f:
+                        value = loads(kind, f)
+                self._memo_set(path, stat, value)
+                return value.copy(deep=False)
+            except (OSError, ValueError, EOFError, pickle.PickleError):
+                continue
+        return None
+
+    def set(self, key, value, ttl):
+        kind, data = dumps(value)
+        path = self._paths(key)[kind]
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            expires = time.time() + ttl
+            os.utime(tmp_path, (expires, expires))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        version = key.split("-", 1)[0]
+        if version not in self._versions_seen:
+            self._versions_seen.add(version)
+            self.prune(keep_version=version)
+
+    # Hapus entri kedaluwarsa dan entri dari versi data yang lebih lama dari keep_version.
+    # Entri versi yang lebih baru tidak pernah dihapus: replika yang masih memakai versi lama
+    # (belum membaca ulang versi dari API) tidak boleh menghapus cache milik replika yang sudah lebih baru.
+    def prune(self, keep_version=None):
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".tmp"):
+                    continue                         # sedang ditulis proses lain
+                older = keep_version is not None and name.split("-", 1)[0] < str(keep_version)
+                if older or os.stat(path).st_mtime < now:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._memo_lock:
+            self._memo.clear()
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+# 🔹 Backend Redis: cukup client dengan get/set(ex=)/scan_iter/delete (redis-py, valkey, atau pengganti lokal)
+class RedisBackend:
+    def __init__(self, client=None, url=REDIS_URL, prefix=REDIS_PREFIX):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        if not data:
+            return None
+        return loads(data[:1], formats._arrow().BufferReader(data[1:]) if data[:1] == ARROW else data[1:])
+
+    def set(self, key, value, ttl):
+        kind, data = dumps(value)
+        self.client.set(self.prefix + key, kind + data, ex=max(int(ttl), 1))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+def get_backend():
+    global _backend
+    if _backend is None and BACKEND != "off":
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = RedisBackend() if BACKEND == "redis" else DiskBackend()
+                except (ImportError, OSError) as e:
+                    print(f"⚠️ Cache bersama '{BACKEND}' tidak tersedia ({e}), hanya cache per proses yang dipakai.")
+                    _backend = False
+    return _backend or None
+
+# 🔹 Ambil dari cache bersama, atau panggil fetch() lalu simpan hasilnya.
+# Tanpa versi data (API versi tidak terjangkau) cache bersama dilewati agar tidak menyajikan data lama.
+# Gangguan pada backend tidak pernah menggagalkan request: cukup jatuh ke fetch().
+def get_or_fetch(endpoint, params, version, fetch, ttl=None):
+    backend = get_backend()
+    if backend is None or version is None:
+        return fetch()
+
+    key = make_key(endpoint, params, version)
+    try:
+        value = backend.get(key)
+    except Exception as e:
+        print(f"⚠️ Gagal membaca cache bersama: {e}")
+        value = None
+    if value is not None:
+        return value
+
+    value = fetch()
+    if value is not None:
+        try:
+            backend.set(key, value, ttl or DEFAULT_TTL)
+        except Exception as e:
+            print(f"⚠️ Gagal menyimpan cache bersama: {e}")
+    return value
+
+# True bila DataFrame dari cache bersama dibaca langsung dari memory map (tanpa salinan per proses)
+def zero_copy():
+    return isinstance(get_backend(), DiskBackend) and formats.arrow_available()
+
+def clear():
+    backend = get_backend()
+    if backend is not None:
+        backend.clear()
@@ -0,0 +1,123 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# Modul aplikasi ada di root repo (bukan package); samakan dengan benchmarks/run_benchmarks.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 🔹 Schema Postgres sementara untuk test yang menjalankan SQL sungguhan.
+# Koneksi memakai konfigurasi db.py (DB_HOST, DB_NAME, ...); test dilewati bila database tidak terjangkau.
+@pytest.fixture
+def pg(monkeypatch):
+    import psycopg2
+    import db
+
+    try:
+        admin = psycopg2.connect(**db.DB_CONFIG, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres tidak tersedia: {e}")
+    admin.autocommit = True
+    schema = f"test_{uuid.uuid4().hex[:10]}"
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema};")
+
+    monkeypatch.setattr(db, "DB_SEARCH_PATH", schema)
+    db.dispose()
+    try:
+        yield db.get_engine()
+    finally:
+        db.dispose()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE;")
+        admin.close()
+
+# 🔹 Koneksi psycopg2 tiruan untuk test route app.py tanpa database.
+# responses: daftar (potongan SQL, rows, columns); query pertama yang memuat potongan itu mendapat rows tersebut.
+# Semua query tercatat di .executed sebagai (SQL dengan spasi dirapikan, params).
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.itersize = 2000
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if isinstance(sql, bytes):
+            sql = sql.decode()
+        self.connection.executed.append((" ".join(sql.split()), params))
+        rows, columns = self.connection.respond(sql)
+        self._rows = list(rows)
+        self.description = [(col,) for col in columns] if columns else None
+
+    # Sama seperti psycopg2: nilai di-quote dengan adapter aslinya
+    def mogrify(self, template, args):
+        from psycopg2.extensions import adapt
+
+        if isinstance(template, str):
+            template = template.encode()
+        return template % tuple(adapt(arg).getquoted() for arg in args)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=None):
+        rows, self._rows = self._rows[:size or self.itersize], self._rows[size or self.itersize:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    encoding = "UTF8"
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.executed = []
+        self.committed = self.rolled_back = self.closed = False
+
+    def respond(self, sql):
+        for fragment, rows, columns in self.responses:
+            if fragment in sql:
+                return rows, columns
+        return [], []
+
+    def sql(self, fragment):
+        return [(sql, params) for sql, params in self.executed if fragment in sql]
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+# Pasang FakeConnection sebagai pool app.py; versi data tetap sehingga cache respons & katalog bisa diuji
+@pytest.fixture
+def fake_db(monkeypatch):
+    import app
+    import cache
+    import db
+
+    conn = FakeConnection()
+    monkeypatch.setattr(db, "get_connection", lambda: conn)
+    monkeypatch.setattr(cache, "current_version", lambda: "v1")
+    monkeypatch.setattr(cache, "refresh_local", lambda: "v1")
+    monkeypatch.setattr(app, "_catalog", {"version": None, "tables": {}})
+    app.response_cache.clear()
+    return conn
+
+@pytest.fixture
+def client():
+    import app
+    return app.app.test_client()
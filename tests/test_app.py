@@ -0,0 +1,323 @@
+from datetime import date
+
+import app
+
+# 🔹 Test route app.py dengan koneksi tiruan (fixture fake_db & client di conftest.py)
+
+KATALOG = "FROM pg_attribute"
+
+def kolom(**types):
+    return list(types.items())
+
+HISTORY_TYPES = kolom(no_plg="character varying(20)", thbl="bigint", status="text",
+                      tgl_lunas="timestamp without time zone")
+PREDIKSI_TYPES = HISTORY_TYPES + kolom(status_database="text", selisih_hari="bigint",
+                                       awal_tagihan="timestamp without time zone")
+
+def katalog(conn, history=HISTORY_TYPES, prediksi=PREDIKSI_TYPES):
+    # Kueri katalog dijawab sesuai urutan STATUS_UPDATE_TABLES
+    tables = iter([history, prediksi])
+    original = conn.respond
+
+    def respond(sql):
+        if KATALOG in sql:
+            return next(tables), ["attname", "format_type"]
+        return original(sql)
+    conn.respond = respond
+
+def test_update_status_satu_update_per_tabel(fake_db, client):
+    katalog(fake_db)
+    fake_db.responses.append(("RETURNING", [("A", 202401), ("B", 202402)], ["no_plg", "thbl"]))
+
+    response = client.post("/update_status", json={"updates": [
+        {"no_plg": "A", "thbl": 202401, "status": "Terlambat"},
+        {"no_plg": "B", "thbl": 202402, "status": "Belum Dibayar"},
+        {"no_plg": "A", "thbl": 202401, "status": "Tepat Waktu"},  # baris ganda: yang terakhir dipakai
+    ]})
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "requested": 2,
+        "updated": {"history_pembayaran": 2, "prediksi_pembayaran": 2},
+        "min_thbl": "202401",
+        "version": "v1",
+    }
+
+    hari_ini = date.today().isoformat()
+    history, prediksi = fake_db.sql("AS t SET")
+    assert history[0].startswith(
+        "UPDATE history_pembayaran AS t SET status = v.status, tgl_lunas = v.tgl_lunas FROM (VALUES "
+    )
+    assert (f"(CAST('A' AS character varying(20)), CAST('202401' AS bigint), CAST('Tepat Waktu' AS text), "
+            f"CAST('{hari_ini}'::date AS timestamp without time zone), CAST('{hari_ini}'::date AS date))") in history[0]
+    assert ("(CAST('B' AS character varying(20)), CAST('202402' AS bigint), CAST('Belum Dibayar' AS text), "
+            "CAST(NULL AS timestamp without time zone)") in history[0]
+    assert history[0].endswith(
+        "AS v(no_plg, thbl, status, tgl_lunas, hari_ini) WHERE t.no_plg = v.no_plg AND t.thbl = v.thbl "
+        "RETURNING t.no_plg, t.thbl;"
+    )
+    # Tabel hasil pipeline: status_database & selisih_hari ikut diperbarui
+    assert "status_database = v.status" in prediksi[0]
+    assert "tgl_lunas = COALESCE(v.tgl_lunas, v.hari_ini)" in prediksi[0]
+    assert "- CAST(t.awal_tagihan AS date), 0)" in prediksi[0]
+
+    assert fake_db.sql("data_version") and fake_db.committed and fake_db.closed
+
+def test_update_status_tabel_prediksi_belum_ada(fake_db, client):
+    katalog(fake_db, prediksi=[])
+    fake_db.responses.append(("RETURNING", [("A", 202401)], ["no_plg", "thbl"]))
+
+    response = client.post("/update_status", json={"updates": [{"no_plg": "A", "thbl": 202401, "status": "Terlambat"}]})
+    assert response.status_code == 200
+    assert response.get_json()["updated"] == {"history_pembayaran": 1}
+    assert len(fake_db.sql("AS t SET")) == 1
+
+def test_update_status_katalog_dibaca_sekali_per_versi(fake_db, client, monkeypatch):
+    katalog(fake_db)
+    body = {"updates": [{"no_plg": "A", "thbl": 202401, "status": "Terlambat"}]}
+    client.post("/update_status", json=body)
+    client.post("/update_status", json=body)
+    assert len(fake_db.sql(KATALOG)) == 2
+
+    # Versi data berubah (mis. tabel prediksi dibangun ulang) -> tipe kolom dibaca ulang
+    katalog(fake_db)
+    monkeypatch.setattr(app.cache, "current_version", lambda: "v2")
+    client.post("/update_status", json=body)
+    assert len(fake_db.sql(KATALOG)) == 4
+
+def test_update_status_validasi(fake_db, client, monkeypatch):
+    monkeypatch.setattr(app, "STATUS_UPDATE_MAX", 2)
+    baris = {"no_plg": "A", "thbl": 202401, "status": "Terlambat"}
+    invalid = [
+        {},
+        {"updates": []},
+        {"updates": "A"},
+        {"updates": [baris] * 3},
+        {"updates": [{"no_plg": "A", "thbl": 202401}]},
+        {"updates": [{**baris, "no_plg": ""}]},
+        {"updates": [{**baris, "status": "Lunas"}]},
+        {"updates": ["A"]},
+    ]
+    for body in invalid:
+        response = client.post("/update_status", json=body)
+        assert response.status_code == 400, body
+    assert fake_db.executed == []
+
+def test_update_status_rollback_saat_gagal(fake_db, client):
+    katalog(fake_db)
+
+    original = fake_db.respond
+
+    def respond(sql):
+        if "RETURNING" in sql:
+            raise RuntimeError("deadlock")
+        return original(sql)
+    fake_db.respond = respond
+
+    response = client.post("/update_status", json={"updates": [{"no_plg": "A", "thbl": 1, "status": "Terlambat"}]})
+    assert response.status_code == 500
+    assert fake_db.rolled_back and not fake_db.committed and fake_db.closed
+
+# 🔹 Pool penuh: error checkout pool diteruskan sebagai 503 (bukan UnboundLocalError di finally)
+def test_pool_penuh_menjadi_503(fake_db, client, monkeypatch):
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    def penuh():
+        raise PoolTimeoutError("QueuePool limit reached")
+    monkeypatch.setattr(app.db, "get_connection", penuh)
+
+    for response in (
+        client.get("/get_available_thbl"),
+        client.get("/get_summary?thbl=202401"),
+        client.get("/get_prediction"),
+        client.get("/get_prediction/A"),
+        client.post("/get_prediction/batch", json={"no_plg": ["A"]}),
+        client.get("/api/pelanggan_belum_bayar"),
+        client.post("/update_status", json={"updates": [{"no_plg": "A", "thbl": 202401, "status": "Terlambat"}]}),
+    ):
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+# 🔹 Koneksi selalu kembali ke pool, juga saat query gagal
+def test_thbl_options_dan_prediksi_thbl_menutup_koneksi(fake_db, client):
+    fake_db.responses.append(("DISTINCT thbl", [(202402,), (202403,)], ["thbl"]))
+    response = client.get("/get_thbl_options")
+    assert response.status_code == 200 and response.get_json() == ["202402", "202403"]
+    assert fake_db.closed
+
+    def gagal(sql):
+        raise RuntimeError("relation prediksi_pembayaran does not exist")
+    for url in ("/get_thbl_options?x=1", "/get_prediksi_thbl?thbl=202402"):
+        fake_db.closed = False
+        fake_db.respond = gagal
+        response = client.get(url)
+        assert response.status_code == 500
+        assert fake_db.closed, url
+
+# 🔹 /get_prediction: keyset pagination (no_plg, thbl), pilihan kolom dan filter sebagai parameter SQL
+def test_get_prediction_keyset_pagination(fake_db, client):
+    fake_db.responses.append(("FROM prediksi_pembayaran", [("A", 202401, 3.5), ("A", 202402, 4.0)], []))
+
+    response = client.get("/get_prediction?limit=2&fields=prediksi_selisih&zona=Z1&is_prediksi=true")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "data": [
+            {"no_plg": "A", "thbl": 202401, "prediksi_selisih": 3.5},
+            {"no_plg": "A", "thbl": 202402, "prediksi_selisih": 4.0},
+        ],
+        "next_cursor": {"after_no_plg": "A", "after_thbl": 202402},
+    }
+    (sql, params), = fake_db.sql("FROM prediksi_pembayaran")
+    assert sql == ("SELECT no_plg, thbl, prediksi_selisih FROM prediksi_pembayaran "
+                   "WHERE zona = %s AND is_prediksi = %s ORDER BY no_plg, thbl LIMIT %s;")
+    assert params == ["Z1", True, 2]
+
+    # Halaman berikutnya: kursor menjadi perbandingan tuple; halaman tidak penuh -> next_cursor kosong
+    fake_db.executed.clear()
+    fake_db.responses[0] = ("FROM prediksi_pembayaran", [("B", 202401, 1.0)], [])
+    response = client.get("/get_prediction?limit=2&fields=prediksi_selisih&after_no_plg=A&after_thbl=202402")
+    assert response.get_json()["next_cursor"] is None
+    (sql, params), = fake_db.sql("FROM prediksi_pembayaran")
+    assert "WHERE (no_plg, thbl) > (%s, %s) ORDER BY no_plg, thbl LIMIT %s;" in sql
+    assert params == ["A", "202402", 2]
+
+def test_get_prediction_validasi(fake_db, client, monkeypatch):
+    for url in ("/get_prediction?limit=x", "/get_prediction?limit=0", "/get_prediction?fields=no_plg,password"):
+        assert client.get(url).status_code == 400, url
+    assert fake_db.executed == []
+
+    monkeypatch.setattr(app, "MAX_PAGE_SIZE", 5)
+    client.get("/get_prediction?limit=1000")
+    (sql, params), = fake_db.sql("FROM prediksi_pembayaran")
+    assert params == [5]
+
+# 🔹 Lookup prediksi per pelanggan & batch: no_plg selalu dikirim sebagai parameter, bukan disisipkan ke SQL
+PREDIKSI_COLUMNS = ["no_plg", "thbl", "prediksi_selisih"]
+
+def test_get_prediction_per_pelanggan_memakai_parameter(fake_db, client):
+    fake_db.responses.append(("FROM prediksi_pembayaran", [("A' OR '1'='1", 202401, 2.0)], PREDIKSI_COLUMNS))
+    response = client.get("/get_prediction/A' OR '1'='1")
+    assert response.status_code == 200
+    assert response.get_json() == [{"no_plg": "A' OR '1'='1", "thbl": 202401, "prediksi_selisih": 2.0}]
+    assert fake_db.executed == [
+        ("SELECT * FROM prediksi_pembayaran WHERE no_plg = %s ORDER BY thbl;", ("A' OR '1'='1",))
+    ]
+
+def test_get_prediction_batch_streaming_json(fake_db, client, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_FETCH_SIZE", 1)  # paksa beberapa fetchmany
+    rows = [("A", 202401, 2.0), ("A", 202402, 2.5), ("B", 202401, 1.0)]
+    fake_db.responses.append(("FROM prediksi_pembayaran", rows, PREDIKSI_COLUMNS))
+
+    response = client.post("/get_prediction/batch", json={"no_plg": ["A", "B", "A", 7]})
+    assert response.status_code == 200
+    assert response.get_json() == [dict(zip(PREDIKSI_COLUMNS, row)) for row in rows]
+    assert fake_db.executed == [(
+        "SELECT * FROM prediksi_pembayaran WHERE no_plg = ANY(%s) ORDER BY no_plg, thbl;", (["A", "B", "7"],)
+    )]
+    assert fake_db.closed  # ditutup generator setelah streaming selesai
+
+def test_get_prediction_batch_format_kolumnar(fake_db, client):
+    fake_db.responses.append(("FROM prediksi_pembayaran", [("A", 202401, 2.0)], PREDIKSI_COLUMNS))
+    response = client.post("/get_prediction/batch?format=columnar", json={"no_plg": ["A"]})
+    assert response.status_code == 200
+    assert response.mimetype == app.formats.MIMETYPES[app.formats.COLUMNAR]
+    assert response.get_json() == {
+        "columns": PREDIKSI_COLUMNS, "data": {"no_plg": ["A"], "thbl": [202401], "prediksi_selisih": [2.0]}
+    }
+    assert fake_db.closed
+
+def test_get_prediction_batch_validasi(fake_db, client, monkeypatch):
+    monkeypatch.setattr(app, "BATCH_LOOKUP_MAX", 2)
+    for body in ({}, {"no_plg": []}, {"no_plg": "A"}, {"no_plg": ["A", "B", "C"]}):
+        assert client.post("/get_prediction/batch", json=body).status_code == 400, body
+    assert client.post("/get_prediction/batch?format=xml", json={"no_plg": ["A"]}).status_code == 400
+    # Duplikat dihitung sekali terhadap batas
+    fake_db.responses.append(("FROM prediksi_pembayaran", [], PREDIKSI_COLUMNS))
+    assert client.post("/get_prediction/batch", json={"no_plg": ["A", "B", "A"]}).status_code == 200
+
+# 🔹 /get_aggregate: measure additive dibaca dari rollup_pembayaran bila tabelnya ada, selain itu history
+def rollup_tersedia(conn, ada=True):
+    conn.responses.insert(0, ("FROM pg_attribute", [("thbl", "integer")] if ada else [], ["attname", "format_type"]))
+
+def test_get_aggregate_memakai_rollup(fake_db, client):
+    rollup_tersedia(fake_db)
+    fake_db.responses.append(("SELECT zona", [("Z1", 10, 1500.0)], ["zona", "count", "revenue"]))
+
+    response = client.get("/get_aggregate?group_by=zona&measures=count,revenue&thbl=202401")
+    assert response.status_code == 200
+    assert response.get_json() == [{"zona": "Z1", "count": 10, "revenue": 1500.0}]
+    (sql, params), = fake_db.sql("SELECT zona")
+    assert sql == ("SELECT zona, COALESCE(SUM(jumlah_tagihan), 0)::bigint AS count, "
+                   "COALESCE(SUM(total_tagihan), 0)::double precision AS revenue FROM rollup_pembayaran "
+                   "WHERE thbl = %s GROUP BY zona ORDER BY zona;")
+    assert params == ["202401"]
+
+def test_get_aggregate_measure_non_additive_dari_history(fake_db, client):
+    rollup_tersedia(fake_db)
+    fake_db.responses.append(("SELECT status", [("Terlambat", 4)], ["status", "customers"]))
+    client.get("/get_aggregate?group_by=status&measures=customers")
+    (sql, params), = fake_db.sql("SELECT status")
+    assert sql == ("SELECT status, COUNT(DISTINCT no_plg) AS customers FROM history_pembayaran "
+                   "GROUP BY status ORDER BY status;")
+
+def test_get_aggregate_tanpa_rollup_dari_history(fake_db, client):
+    rollup_tersedia(fake_db, ada=False)
+    client.get("/get_aggregate?measures=count&zona=Z1&status=Terlambat")
+    (sql, params), = fake_db.sql("SELECT COUNT")
+    assert sql == "SELECT COUNT(*) AS count FROM history_pembayaran WHERE zona = %s AND status = %s ;"
+    assert params == ["Z1", "Terlambat"]
+
+def test_get_aggregate_validasi(fake_db, client):
+    for url in ("/get_aggregate?group_by=password", "/get_aggregate?measures=drop", "/get_aggregate?measures="):
+        assert client.get(url).status_code == 400, url
+    assert fake_db.executed == []
+
+# 🔹 /api/pelanggan_belum_bayar: filter, keyset, count_only & group_by dihitung di database
+TUNGGAKAN_COLUMNS = ["no_plg", "jumlah_bulan", "subkelompok", "zona"]
+
+def test_pelanggan_belum_bayar_filter_dan_keyset(fake_db, client):
+    rollup_tersedia(fake_db)
+    fake_db.responses.append(("SELECT no_plg", [("B", 5, "S1", "Z1"), ("A", 5, "S1", "Z1")], TUNGGAKAN_COLUMNS))
+
+    response = client.get("/api/pelanggan_belum_bayar?zona=Z1&min_bulan=3&limit=2"
+                          "&after_jumlah_bulan=6&after_no_plg=C")
+    assert response.status_code == 200
+    assert response.get_json()["next_cursor"] == {"after_no_plg": "A", "after_jumlah_bulan": 5}
+    (sql, params), = fake_db.sql("SELECT no_plg")
+    assert sql == ("SELECT no_plg, jumlah_bulan, subkelompok, zona FROM rollup_belum_bayar "
+                   "WHERE zona = %s AND jumlah_bulan >= %s AND (jumlah_bulan, no_plg) < (%s, %s) "
+                   "ORDER BY jumlah_bulan desc, no_plg desc LIMIT %s;")
+    assert params == ["Z1", 3, "6", "C", 2]
+
+def test_pelanggan_belum_bayar_urut_no_plg_tabel_lama(fake_db, client):
+    rollup_tersedia(fake_db, ada=False)
+    fake_db.responses.append(("SELECT no_plg", [("B", 1, "S1", "Z1")], TUNGGAKAN_COLUMNS))
+
+    response = client.get("/api/pelanggan_belum_bayar?sort=no_plg&order=asc&limit=1&after_no_plg=A")
+    assert response.get_json()["next_cursor"] == {"after_no_plg": "B"}
+    (sql, params), = fake_db.sql("SELECT no_plg")
+    assert sql == ("SELECT no_plg, jumlah_bulan, subkelompok, zona FROM pelanggan_belum_bayar "
+                   "WHERE no_plg > %s ORDER BY no_plg asc LIMIT %s;")
+    assert params == ["A", 1]
+
+def test_pelanggan_belum_bayar_count_only_dan_group_by(fake_db, client):
+    rollup_tersedia(fake_db)
+    fake_db.responses.append(("SELECT COUNT(*) FROM", [(42,)], ["count"]))
+    fake_db.responses.append(("GROUP BY", [(1, "Z1", 7)], ["jumlah_bulan", "zona", "jumlah_pelanggan"]))
+
+    response = client.get("/api/pelanggan_belum_bayar?count_only=1&subkelompok=S1&limit=5")
+    assert response.get_json() == {"count": 42}
+    (sql, params), = fake_db.sql("SELECT COUNT(*) FROM")
+    assert sql == "SELECT COUNT(*) FROM rollup_belum_bayar WHERE subkelompok = %s;"
+    assert params == ["S1"]
+
+    response = client.get("/api/pelanggan_belum_bayar?group_by=zona&min_bulan=2")
+    assert response.get_json() == [{"jumlah_bulan": 1, "zona": "Z1", "jumlah_pelanggan": 7}]
+    (sql, params), = fake_db.sql("GROUP BY")
+    assert sql == ("SELECT jumlah_bulan, zona, COUNT(*) AS jumlah_pelanggan FROM rollup_belum_bayar "
+                   "WHERE jumlah_bulan >= %s GROUP BY jumlah_bulan, zona ORDER BY jumlah_bulan, zona;")
+    assert params == [2]
+
+def test_pelanggan_belum_bayar_validasi(fake_db, client):
+    for query in ("sort=zona", "order=up", "group_by=no_plg", "limit=x", "min_bulan=x", "limit=0"):
+        assert client.get(f"/api/pelanggan_belum_bayar?{query}").status_code == 400, query
+    assert fake_db.executed == []
@@ -0,0 +1,94 @@
+import pytest
+
+import cache
+
+# 🔹 Test cache respons API (TTL, LRU, versi data, tier disk) dan ETag / 304 di route
+
+@pytest.fixture
+def versi(monkeypatch):
+    state = {"version": "v1"}
+    monkeypatch.setattr(cache, "current_version", lambda: state["version"])
+    return state
+
+def test_response_cache_ttl(versi):
+    rc = cache.ResponseCache(max_entries=10)
+    rc.set("a", {"body": 1}, ttl=60)
+    rc.set("b", {"body": 2}, ttl=-1)
+    assert rc.get("a") == {"body": 1}
+    assert rc.get("b") is None
+    assert rc.stats()["hits"] == 1 and rc.stats()["misses"] == 1
+
+def test_response_cache_lru(versi):
+    rc = cache.ResponseCache(max_entries=2)
+    rc.set("a", 1)
+    rc.set("b", 2)
+    assert rc.get("a") == 1           # a baru dipakai -> b yang tergeser
+    rc.set("c", 3)
+    assert rc.get("b") is None
+    assert rc.get("a") == 1 and rc.get("c") == 3
+    assert rc.stats()["entries"] == 2
+
+def test_response_cache_mengikuti_versi_data(versi):
+    rc = cache.ResponseCache()
+    rc.set("a", 1)
+    versi["version"] = "v2"
+    assert rc.get("a") is None
+
+def test_response_cache_tier_disk_dibagi_antar_proses(versi, tmp_path):
+    cache.ResponseCache(cache_dir=str(tmp_path)).set("a", {"body": b"x"}, ttl=60)
+    lain = cache.ResponseCache(cache_dir=str(tmp_path))
+    assert lain.get("a") == {"body": b"x"}
+    versi["version"] = "v2"
+    assert cache.ResponseCache(cache_dir=str(tmp_path)).get("a") is None
+
+def test_current_version_dibaca_ulang_setelah_ttl(monkeypatch):
+    reads = []
+    monkeypatch.setattr(cache, "_read_version", lambda: reads.append(1) or f"v{len(reads)}")
+    monkeypatch.setattr(cache, "_version", {"checked": 0.0, "token": None})
+    monkeypatch.setattr(cache, "VERSION_TTL", 3600)
+    assert cache.current_version() == "v1"
+    assert cache.current_version() == "v1"
+    assert len(reads) == 1
+
+    monkeypatch.setattr(cache, "VERSION_TTL", 0)
+    assert cache.current_version() == "v2"
+
+    # Database tidak terjangkau: versi terakhir yang diketahui tetap dipakai
+    def gagal():
+        raise OSError("down")
+    monkeypatch.setattr(cache, "_read_version", gagal)
+    assert cache.current_version() == "v2"
+
+# 🔹 Route ber-cache: hit tanpa query, If-None-Match -> 304, versi baru -> query ulang
+def test_cached_route_etag_dan_304(fake_db, client, monkeypatch):
+    fake_db.responses.append(("SELECT DISTINCT thbl", [(202402,), (202401,)], ["thbl"]))
+
+    pertama = client.get("/get_available_thbl")
+    assert pertama.status_code == 200 and pertama.get_json() == [202402, 202401]
+    etag = pertama.headers["ETag"]
+    assert pertama.headers["Cache-Control"] == "no-cache"
+
+    kedua = client.get("/get_available_thbl")
+    assert kedua.headers["ETag"] == etag and kedua.get_json() == [202402, 202401]
+    tidak_berubah = client.get("/get_available_thbl", headers={"If-None-Match": etag})
+    assert tidak_berubah.status_code == 304 and tidak_berubah.data == b""
+    assert len(fake_db.sql("SELECT DISTINCT thbl")) == 1
+
+    # Parameter berbeda = entri berbeda; error tidak di-cache
+    assert client.get("/get_summary").status_code == 400
+    assert client.get("/get_summary").status_code == 400
+
+    monkeypatch.setattr(cache, "current_version", lambda: "v2")
+    assert client.get("/get_available_thbl", headers={"If-None-Match": etag}).status_code == 304
+    assert len(fake_db.sql("SELECT DISTINCT thbl")) == 2
+
+def test_invalidate_cache_mengosongkan_cache(fake_db, client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(cache, "invalidate", lambda: "v9")
+    fake_db.responses.append(("SELECT DISTINCT thbl", [(202401,)], ["thbl"]))
+    client.get("/get_available_thbl")
+    assert app.response_cache.stats()["entries"] == 1
+    response = client.post("/invalidate_cache")
+    assert response.get_json() == {"version": "v9"}
+    assert app.response_cache.stats()["entries"] == 0
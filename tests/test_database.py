@@ -0,0 +1,228 @@
+import pandas as pd
+from sqlalchemy import text
+
+import model
+
+# 🔹 Test SQL batch model.py terhadap Postgres sungguhan (fixture pg di conftest.py)
+
+def frame_prediksi(zona):
+    return pd.DataFrame({
+        "no_plg": ["A", "B", "C"],
+        "thbl": [202401, 202401, 202402],
+        "zona": zona,
+        "status": ["Tepat Waktu", "Belum Dibayar", "Belum Dibayar"],
+        "is_prediksi": [False, False, True],
+        "awal_tagihan": pd.to_datetime(["2024-01-01"] * 3),
+        "tgl_tenggat": pd.to_datetime(["2024-01-21"] * 3),
+        "tgl_lunas": pd.to_datetime(["2024-01-05", None, None]),
+    })
+
+def test_save_predictions_mempertahankan_constraint_index_dan_view(pg):
+    with pg.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE prediksi_pembayaran (
+                no_plg text NOT NULL, thbl integer NOT NULL, zona text, status text, is_prediksi boolean,
+                awal_tagihan timestamp, tgl_tenggat timestamp, tgl_lunas timestamp,
+                CONSTRAINT prediksi_pembayaran_pkey PRIMARY KEY (no_plg, thbl)
+            );
+            CREATE INDEX "Idx Status" ON prediksi_pembayaran (status) WHERE NOT is_prediksi;
+            CREATE VIEW v_prediksi WITH (security_barrier) AS
+                SELECT no_plg, thbl, zona FROM prediksi_pembayaran WHERE is_prediksi;
+            INSERT INTO prediksi_pembayaran (no_plg, thbl, is_prediksi) VALUES ('LAMA', 202312, true);
+        """))
+
+    assert model.save_predictions(frame_prediksi(["", None, "Z1"]))
+    # Simpan dua kali: nama index & constraint hasil swap pertama juga harus bisa ditukar lagi
+    assert model.save_predictions(frame_prediksi(["", None, "Z2"]))
+
+    with pg.connect() as conn:
+        zona = dict(conn.execute(text("SELECT no_plg, zona FROM prediksi_pembayaran;")).fetchall())
+        assert zona == {"A": "", "B": None, "C": "Z2"}
+
+        constraints = conn.execute(text("""
+            SELECT conname, contype FROM pg_constraint WHERE conrelid = 'prediksi_pembayaran'::regclass;
+        """)).fetchall()
+        assert ("prediksi_pembayaran_pkey", "p") in constraints
+
+        indexes = dict(conn.execute(text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'prediksi_pembayaran';"
+        )).fetchall())
+        assert "WHERE (NOT is_prediksi)" in indexes["Idx Status"]
+        assert "idx_prediksi_pembayaran_no_plg_thbl" in indexes
+
+        assert conn.execute(text("SELECT no_plg, zona FROM v_prediksi;")).fetchall() == [("C", "Z2")]
+        options = conn.execute(text("SELECT reloptions FROM pg_class WHERE relname = 'v_prediksi';")).scalar()
+        assert options == ["security_barrier=true"]
+        assert conn.execute(text("SELECT to_regclass('prediksi_pembayaran_lama');")).scalar() is None
+
+def seed_history(engine, **kwargs):
+    from benchmarks.synthetic import generate_history
+
+    data = generate_history(**kwargs)
+    with engine.begin() as conn:
+        model.replace_table_with_copy(conn, data, "history_pembayaran")
+    return data
+
+# Catat semua statement SQL yang dikirim engine selama blok with
+class StatementLog:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(" ".join(statement.split()))
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def index(self, fragment, last=False):
+        hits = [i for i, s in enumerate(self.statements) if fragment in s]
+        assert hits, fragment
+        return hits[-1] if last else hits[0]
+
+def test_streaming_menukar_tabel_setelah_rollup(pg):
+    data = seed_history(pg, customers=40, months=6)
+    with StatementLog(pg) as log:
+        hasil = model.refresh_predictions_full(streaming=True)
+    assert hasil == {"rows": len(data) + 40, "customers": 40}
+
+    # RENAME (lock ACCESS EXCLUSIVE) baru dikirim setelah semua statement rollup
+    rollup_terakhir = max(log.index("INSERT INTO rollup_", last=True), log.index("_rollup", last=True))
+    assert log.index("RENAME TO prediksi_pembayaran;") > rollup_terakhir
+
+    with pg.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM prediksi_pembayaran;")).scalar() == len(data) + 40
+
+def baca_prediksi(engine):
+    kolom = ["no_plg", "thbl", "status", "status_database", "tgl_lunas", "selisih_hari", "prediksi_selisih",
+             "is_prediksi"]
+    with engine.connect() as conn:
+        df = pd.read_sql(text(f"SELECT {', '.join(kolom)} FROM prediksi_pembayaran ORDER BY no_plg, thbl;"), conn)
+    df["tgl_lunas"] = pd.to_datetime(df["tgl_lunas"])
+    return df
+
+def baca_rollup(engine):
+    with engine.connect() as conn:
+        return {
+            table: pd.read_sql(text(f"SELECT * FROM {table} ORDER BY 1, 2, 3;"), conn)
+            for table in model.ROLLUP_DDL
+        }
+
+# 🔹 Run inkremental di hari berikutnya (bulan baru, koreksi bulan lama, baris dihapus, tagihan tetap belum lunas)
+# harus sama dengan prediksi penuh atas history yang sama pada hari itu
+def test_refresh_inkremental_setara_dengan_prediksi_penuh(pg, monkeypatch):
+    data = seed_history(pg, customers=50, months=8)
+    with pg.begin() as conn:
+        conn.execute(text("DELETE FROM history_pembayaran WHERE thbl > 202306;"))
+
+    monkeypatch.setattr(model, "_today", lambda: pd.Timestamp("2023-07-10"))
+    assert not isinstance(model.refresh_predictions(incremental=False), dict)
+
+    with pg.begin() as conn:
+        model.copy_frame(conn, data[data["thbl"] > 202306], "history_pembayaran")
+        conn.execute(text("""
+            UPDATE history_pembayaran SET status = 'Terlambat', tgl_lunas = awal_tagihan + interval '40 days'
+            WHERE no_plg IN ('00000003', '00000004') AND thbl = 202303;
+        """))
+        conn.execute(text("DELETE FROM history_pembayaran WHERE no_plg = '00000005' AND thbl = 202302;"))
+        # Pelanggan dengan tunggakan yang seluruh riwayatnya dihapus
+        conn.execute(text("DELETE FROM history_pembayaran WHERE no_plg = '00000012';"))
+
+    monkeypatch.setattr(model, "_today", lambda: pd.Timestamp("2023-09-05"))
+    assert not isinstance(model.refresh_predictions(), dict)
+    with pg.connect() as conn:
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {model.CHANGE_TABLE};")).scalar() == 0
+
+    penuh = model._prepare_for_save(model.build_pipeline().fit_transform(model.load_data()))
+    penuh = penuh.sort_values(["no_plg", "thbl"], ignore_index=True)[baca_prediksi(pg).columns]
+    pd.testing.assert_frame_equal(baca_prediksi(pg), penuh, check_dtype=False)
+
+    # Rollup hasil run inkremental harus sama dengan rollup yang dihitung ulang dari seluruh riwayat
+    inkremental = baca_rollup(pg)
+    assert "00000012" not in set(inkremental[model.UNPAID_TABLE]["no_plg"])
+    with pg.begin() as conn:
+        model.refresh_rollups(conn)
+    for table, df in baca_rollup(pg).items():
+        pd.testing.assert_frame_equal(inkremental[table], df, obj=table)
+
+def test_ensure_change_log_tidak_membuat_ulang_trigger(pg):
+    seed_history(pg, customers=3, months=2)
+    with pg.begin() as conn:
+        model.ensure_change_log(conn)
+        oid = conn.execute(text("SELECT oid FROM pg_trigger WHERE tgname = 'trg_catat_perubahan_history';")).scalar()
+    with StatementLog(pg) as log, pg.begin() as conn:
+        model.ensure_change_log(conn)
+        assert conn.execute(text("SELECT oid FROM pg_trigger WHERE tgname = 'trg_catat_perubahan_history';")).scalar() == oid
+    assert not any("DROP TRIGGER" in s for s in log.statements)
+
+# 🔹 Tabel ringkasan lama (bukan milik batch, boleh tanpa primary key & berisi duplikat) tidak disentuh rollup
+def test_refresh_rollups_tidak_mengubah_tabel_lama(pg):
+    seed_history(pg, customers=20, months=4)
+    with pg.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE pembayaran_thbl (thbl integer, tepat_waktu bigint, terlambat bigint, belum_dibayar bigint);
+            INSERT INTO pembayaran_thbl VALUES (202301, 1, 1, 1), (202301, 2, 2, 2);
+            CREATE TABLE pelanggan_belum_bayar (no_plg text, jumlah_bulan integer, subkelompok text, zona text);
+            INSERT INTO pelanggan_belum_bayar VALUES ('X', 1, 'S', 'Z'), ('X', 1, 'S', 'Z');
+        """))
+        model.refresh_rollups(conn)
+        # Rollup inkremental pertama setelah tabel rollup dihapus harus membangun ulang dari seluruh riwayat
+        conn.execute(text(f"DROP TABLE {model.STATUS_TABLE};"))
+        model.refresh_rollups(conn, from_thbl=202304, customers=[])
+
+    with pg.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM pembayaran_thbl;")).scalar() == 2
+        assert conn.execute(text("SELECT COUNT(*) FROM pelanggan_belum_bayar;")).scalar() == 2
+        legacy_indexes = conn.execute(text(
+            "SELECT COUNT(*) FROM pg_indexes WHERE tablename IN ('pembayaran_thbl', 'pelanggan_belum_bayar');"
+        )).scalar()
+        assert legacy_indexes == 0
+
+        for table in model.ROLLUP_DDL:
+            assert conn.execute(text(
+                "SELECT 1 FROM pg_index WHERE indrelid = to_regclass(:table) AND indisprimary;"
+            ), {"table": table}).scalar() == 1, table
+        bulan = conn.execute(text(f"SELECT array_agg(thbl ORDER BY thbl) FROM {model.STATUS_TABLE};")).scalar()
+        assert bulan == [202301, 202302, 202303, 202304]
+
+# 🔹 Sebelum batch pertama: /get_summary dihitung dari history, endpoint lain membaca tabel lama
+def test_api_memakai_fallback_sebelum_rollup_dibangun(pg, monkeypatch):
+    import app as api
+
+    data = seed_history(pg, customers=10, months=2)
+    with pg.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE pembayaran_thbl (thbl integer, tepat_waktu bigint, terlambat bigint, belum_dibayar bigint);
+            INSERT INTO pembayaran_thbl VALUES (202301, 7, 8, 9);
+        """))
+    monkeypatch.setattr(api, "_catalog", {"version": None, "tables": {}})
+    api.response_cache.clear()
+    client = api.app.test_client()
+
+    bulan = data[data["thbl"] == 202301]
+    response = client.get("/get_summary?thbl=202301")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "total_revenue": float(bulan["rp_tagihan"].sum()),
+        "total_customers": bulan["no_plg"].nunique(),
+        "total_late": int((bulan["status"] == "Terlambat").sum()),
+    }
+    assert client.get("/get_summary_thbl").get_json() == [
+        {"thbl": 202301, "tepat_waktu": 7, "terlambat": 8, "belum_dibayar": 9}
+    ]
+
+    # Setelah rollup dibangun (versi data berubah) endpoint pindah ke tabel rollup
+    with pg.begin() as conn:
+        model.refresh_rollups(conn)
+        model.cache.bump_version(conn)
+    api.cache.refresh_local()
+    api.response_cache.clear()
+    status = client.get("/get_summary_thbl").get_json()
+    assert [row["thbl"] for row in status] == [202302, 202301]
+    assert client.get("/get_summary?thbl=202301").get_json()["total_customers"] == bulan["no_plg"].nunique()
@@ -0,0 +1,70 @@
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import formats
+
+# 🔹 Test negosiasi & serialisasi format respons (records, kolumnar, Arrow, Parquet)
+
+COLUMNS = ["no_plg", "thbl", "rp_tagihan", "awal_tagihan"]
+ROWS = [("A", 202401, 1500.5, date(2024, 1, 1)), ("B", 202402, None, None)]
+
+def test_negotiate():
+    assert formats.negotiate() == formats.RECORDS
+    assert formats.negotiate("arrow") == formats.ARROW
+    assert formats.negotiate("xml") is None
+    # ?format= menang atas Accept
+    assert formats.negotiate("columnar", formats.MIMETYPES[formats.ARROW]) == formats.COLUMNAR
+    accept = f"text/html, {formats.MIMETYPES[formats.PARQUET]};q=0.9, application/json;q=0.5"
+    assert formats.negotiate(None, accept) == formats.PARQUET
+    assert formats.negotiate(None, "*/*") == formats.RECORDS
+
+def test_preferred_accept_mengikuti_pyarrow(monkeypatch):
+    monkeypatch.setattr(formats, "arrow_available", lambda: False)
+    assert formats.MIMETYPES[formats.ARROW] not in formats.preferred_accept()
+    assert formats.negotiate(None, formats.preferred_accept()) == formats.COLUMNAR
+
+def test_columnar_round_trip():
+    body, mimetype = formats.encode(COLUMNS, ROWS, formats.COLUMNAR)
+    assert mimetype == formats.MIMETYPES[formats.COLUMNAR]
+    df = formats.decode(body.encode(), f"{mimetype}; charset=utf-8")
+    assert list(df.columns) == COLUMNS
+    assert df["no_plg"].tolist() == ["A", "B"]
+    assert df["awal_tagihan"].tolist()[0] == "2024-01-01"  # tanggal diserialisasi sebagai string
+
+@pytest.mark.parametrize("fmt", [formats.ARROW, formats.PARQUET])
+def test_arrow_parquet_round_trip(fmt):
+    pytest.importorskip("pyarrow")
+    body, mimetype = formats.encode(COLUMNS, ROWS, fmt)
+    df = formats.decode(body, mimetype)
+    assert df["thbl"].tolist() == [202401, 202402]
+    assert df["rp_tagihan"].iloc[0] == 1500.5 and pd.isna(df["rp_tagihan"].iloc[1])
+    assert pd.Timestamp(df["awal_tagihan"].iloc[0]) == pd.Timestamp("2024-01-01")
+
+def test_encode_arrow_tanpa_pyarrow(monkeypatch):
+    monkeypatch.setattr(formats, "arrow_available", lambda: False)
+    with pytest.raises(ImportError):
+        formats.encode(COLUMNS, ROWS, formats.ARROW)
+
+def test_decode_records_dan_halaman():
+    assert formats.decode(b'[{"a": 1}, {"a": 2}]', "application/json")["a"].tolist() == [1, 2]
+    halaman = b'{"data": [{"a": 1}], "next_cursor": null}'
+    assert formats.decode(halaman, "application/json")["a"].tolist() == [1]
+    assert formats.decode(b'{"error": "x"}', "application/json").empty
+
+# 🔹 Route memakai format yang dinegosiasikan; Decimal dari kolom numeric tetap bisa diserialisasi
+def test_route_format(fake_db, client):
+    fake_db.responses.append(("FROM history_pembayaran", [("A", Decimal("10.5"))], ["no_plg", "rp_tagihan"]))
+    response = client.get("/get_data?thbl=202401&format=columnar")
+    assert response.status_code == 200
+    assert response.get_json() == {"columns": ["no_plg", "rp_tagihan"], "data": {"no_plg": ["A"], "rp_tagihan": ["10.5"]}}
+
+    assert client.get("/get_data?thbl=202401&format=xml").status_code == 400
+
+    response = client.get("/get_data?thbl=202401", headers={"Accept": formats.MIMETYPES[formats.ARROW]})
+    if formats.arrow_available():
+        assert response.mimetype == formats.MIMETYPES[formats.ARROW]
+    else:
+        assert response.status_code == 406
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import model
+
+# 🔹 Implementasi lama (groupby + lambda per grup) sebagai acuan kesetaraan
+def rolling_mean_lama(df, window):
+    return df.groupby("no_plg")["selisih_hari"].transform(lambda x: x.rolling(window, min_periods=1).mean())
+
+def frame(no_plg, selisih_hari):
+    return pd.DataFrame({"no_plg": no_plg, "selisih_hari": selisih_hari})
+
+def acak(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    no_plg = rng.choice([f"P{i:04d}" for i in range(150)], size=n).astype(object)
+    selisih_hari = rng.integers(-5, 60, size=n).astype("float64")
+    return rng, frame(no_plg, selisih_hari)
+
+CASES = {
+    # urutan baris tidak terurut per pelanggan
+    "unsorted": lambda: acak()[1],
+    # NaN pada nilai dan pada kunci pelanggan
+    "nan": lambda: (lambda rng, df: df.assign(
+        selisih_hari=df["selisih_hari"].mask(rng.random(len(df)) < 0.15),
+        no_plg=df["no_plg"].mask(rng.random(len(df)) < 0.05),
+    ))(*acak(seed=1)),
+    # setiap pelanggan hanya punya satu baris
+    "single_row_groups": lambda: frame([f"P{i}" for i in range(50)], np.arange(50, dtype="float64")),
+    # campuran grup satu baris dan grup panjang, plus grup berisi NaN saja
+    "mixed": lambda: frame(
+        ["A", "B", "A", "C", "A", "D", "D", "B", None, "A"],
+        [1.0, np.nan, 3.0, 4.0, np.nan, np.nan, np.nan, 8.0, 9.0, 10.0],
+    ),
+}
+
+@pytest.mark.parametrize("window", [1, 2, 3])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_rolling_mean_per_group_setara_dengan_groupby_lama(case, window):
+    df = CASES[case]()
+    hasil = model.rolling_mean_per_group(df["no_plg"], df["selisih_hari"], window)
+    pd.testing.assert_series_equal(hasil, rolling_mean_lama(df, window), check_names=False)
+
+def test_rolling_mean_per_group_mempertahankan_index():
+    df = acak(n=200)[1]
+    df.index = np.random.default_rng(3).permutation(np.arange(1000, 1200))
+    hasil = model.rolling_mean_per_group(df["no_plg"], df["selisih_hari"], 2)
+    assert hasil.index.equals(df.index)
+    pd.testing.assert_series_equal(hasil, rolling_mean_lama(df, 2), check_names=False)
+
+# 🔹 Prediksi inkremental harus sama dengan hitung ulang penuh, termasuk koreksi pada bulan yang sudah diproses
+def test_incremental_update_setara_dengan_prediksi_penuh():
+    from benchmarks.synthetic import generate_history
+
+    sekarang = generate_history(customers=60, months=8)
+    lama = sekarang[sekarang["thbl"] <= 202306].copy()
+    awal = model.build_pipeline().fit_transform(lama.copy())
+    state = model.build_state(awal)
+
+    # koreksi status bulan lama, baris bulan lama yang dihapus, dan dua bulan baru
+    koreksi = sekarang["no_plg"].isin(["00000005", "00000006"]) & (sekarang["thbl"] == 202303)
+    sekarang.loc[koreksi, "status"] = "Tepat Waktu"
+    sekarang.loc[koreksi, "tgl_lunas"] = sekarang.loc[koreksi, "awal_tagihan"] + pd.Timedelta(days=3)
+    hapus = (sekarang["no_plg"] == "00000007") & (sekarang["thbl"] == 202302)
+    perubahan = sekarang.loc[(sekarang["thbl"] > 202306) | koreksi | hapus, ["no_plg", "thbl"]]
+    sekarang = sekarang[~hapus]
+    berubah = perubahan.groupby("no_plg", as_index=False)["thbl"].min().rename(columns={"thbl": "min_thbl"})
+    riwayat = sekarang[sekarang["no_plg"].isin(berubah["no_plg"])]
+
+    df_baru, state_baru, ulang = model.incremental_update(berubah, state, riwayat, pipeline=model.build_pipeline())
+    assert ulang == {"00000005", "00000006", "00000007"}
+
+    # Terapkan seperti refresh_predictions: hapus prediksi pelanggan berubah (semua baris untuk yang dihitung ulang)
+    dihapus = awal["no_plg"].isin(berubah["no_plg"]) & (awal["is_prediksi"] | awal["no_plg"].isin(ulang))
+    tabel = pd.concat([awal[~dihapus], df_baru]).sort_values(["no_plg", "thbl"], ignore_index=True)
+    penuh = model.build_pipeline().fit_transform(sekarang.copy()).sort_values(["no_plg", "thbl"], ignore_index=True)
+
+    kolom = ["no_plg", "thbl", "status", "selisih_hari", "prediksi_selisih", "is_prediksi"]
+    pd.testing.assert_frame_equal(tabel[kolom], penuh[kolom], check_dtype=False)
+
+    state_gabung = pd.concat([state[~state["no_plg"].isin(berubah["no_plg"])], state_baru])
+    state_penuh = model.build_state(penuh)
+    pd.testing.assert_frame_equal(
+        state_gabung.sort_values("no_plg", ignore_index=True)[state_penuh.columns],
+        state_penuh.sort_values("no_plg", ignore_index=True),
+        check_dtype=False,
+    )
+
+def test_transform_incremental_menolak_window_selain_state():
+    seed = model.state_to_seed(pd.DataFrame(columns=["no_plg", "last_thbl", "last_awal_tagihan", "selisih_1", "selisih_2"]))
+    with pytest.raises(ValueError, match="window=2"):
+        model.MovingAverageTransformer(window=3).transform_incremental(pd.DataFrame(), seed)
+
+# 🔹 Tagihan belum lunas: selisih_hari bertambah mengikuti hari ini, jadi run inkremental di hari berikutnya
+# harus menghasilkan nilai yang sama dengan prediksi penuh di hari itu (bukan selisih yang dibekukan di state)
+def test_incremental_update_tagihan_belum_lunas_mengikuti_hari_ini(monkeypatch):
+    from benchmarks.synthetic import generate_history
+
+    sekarang = generate_history(customers=60, months=8)
+    lama = sekarang[sekarang["thbl"] <= 202306].copy()
+    monkeypatch.setattr(model, "_today", lambda: pd.Timestamp("2023-07-10"))
+    awal = model.build_pipeline().fit_transform(lama.copy())
+    state = model.build_state(awal)
+
+    monkeypatch.setattr(model, "_today", lambda: pd.Timestamp("2023-09-05"))
+    terbuka = sekarang[(sekarang["status"] == "Belum Dibayar") & sekarang["tgl_lunas"].isna()]
+    # fixture harus punya tagihan yang tetap belum lunas dari run pertama ke run kedua
+    assert (terbuka["thbl"] <= 202306).any()
+    perubahan = pd.concat([sekarang.loc[sekarang["thbl"] > 202306, ["no_plg", "thbl"]], terbuka[["no_plg", "thbl"]]])
+    berubah = perubahan.groupby("no_plg", as_index=False)["thbl"].min().rename(columns={"thbl": "min_thbl"})
+    riwayat = sekarang[sekarang["no_plg"].isin(berubah["no_plg"])]
+
+    df_baru, state_baru, ulang = model.incremental_update(berubah, state, riwayat, pipeline=model.build_pipeline())
+    assert set(terbuka.loc[terbuka["thbl"] <= 202306, "no_plg"]) <= ulang
+
+    dihapus = awal["no_plg"].isin(berubah["no_plg"]) & (awal["is_prediksi"] | awal["no_plg"].isin(ulang))
+    tabel = pd.concat([awal[~dihapus], df_baru]).sort_values(["no_plg", "thbl"], ignore_index=True)
+    penuh = model.build_pipeline().fit_transform(sekarang.copy()).sort_values(["no_plg", "thbl"], ignore_index=True)
+
+    kolom = ["no_plg", "thbl", "status", "tgl_lunas", "selisih_hari", "prediksi_selisih", "is_prediksi"]
+    pd.testing.assert_frame_equal(tabel[kolom], penuh[kolom], check_dtype=False)
+
+# 🔹 Eksekusi paralel per partisi (lewat file sementara, jendela in-flight terbatas) setara dengan serial
+def test_run_pipeline_parallel_setara_dengan_serial():
+    from benchmarks.synthetic import generate_history
+
+    data = generate_history(customers=80, months=6)
+    serial = model.build_pipeline().fit_transform(data.copy())
+    serial = serial.sort_values(["no_plg", "thbl"], kind="stable", ignore_index=True)
+
+    paralel = model.run_pipeline_parallel(data.copy(), workers=2, in_flight=1)
+    pd.testing.assert_frame_equal(paralel, serial, check_dtype=False)
@@ -0,0 +1,136 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import shared_cache
+
+# 🔹 Test cache bersama dashboard (backend disk & Redis tiruan)
+
+def frame():
+    return pd.DataFrame({
+        "thbl": [202401, 202402, 202403],
+        "zona": ["A", "B", None],
+        "rp_tagihan": [1.5, 2.0, 3.25],
+    })
+
+def test_dumps_loads_dataframe_dan_json():
+    kind, data = shared_cache.dumps(frame())
+    if kind == shared_cache.ARROW:
+        pa = pytest.importorskip("pyarrow")
+        hasil = shared_cache.loads(kind, pa.BufferReader(data))
+    else:
+        hasil = shared_cache.loads(kind, data)
+    pd.testing.assert_frame_equal(hasil, frame(), check_dtype=False)
+
+    kind, data = shared_cache.dumps({"version": "v1", "count": 3})
+    assert kind == shared_cache.JSON
+    assert shared_cache.loads(kind, data) == {"version": "v1", "count": 3}
+
+def test_disk_backend_ttl(tmp_path):
+    backend = shared_cache.DiskBackend(str(tmp_path))
+    key = shared_cache.make_key("/get_summary", {"thbl": 202401}, "20240101000000000000abcdef")
+    backend.set(key, frame(), ttl=60)
+    pd.testing.assert_frame_equal(backend.get(key), frame(), check_dtype=False)
+
+    backend.set(key + "x", {"a": 1}, ttl=-1)  # sudah kedaluwarsa
+    assert backend.get(key + "x") is None
+    assert backend.get("tidak-ada") is None
+
+def test_make_key_bergantung_pada_versi_dan_params():
+    a = shared_cache.make_key("/get_data", {"thbl": 1}, "v1")
+    assert a == shared_cache.make_key("/get_data", {"thbl": 1}, "v1")
+    assert a != shared_cache.make_key("/get_data", {"thbl": 2}, "v1")
+    assert a != shared_cache.make_key("/get_data", {"thbl": 1}, "v2")
+    assert a.startswith("v1-")
+
+# 🔹 Replika dengan versi lama tidak menghapus entri versi yang lebih baru; replika versi baru menghapus yang lama
+def test_prune_hanya_menghapus_versi_lebih_lama(tmp_path):
+    lama, baru = "20240101000000000000aaaaaa", "20240102000000000000bbbbbb"
+    replika_baru = shared_cache.DiskBackend(str(tmp_path))
+    replika_baru.set(f"{baru}-k", {"v": "baru"}, ttl=60)
+
+    replika_lama = shared_cache.DiskBackend(str(tmp_path))
+    replika_lama.set(f"{lama}-k", {"v": "lama"}, ttl=60)
+    assert replika_lama.get(f"{baru}-k") == {"v": "baru"}
+
+    replika_baru.prune(keep_version=baru)
+    assert replika_baru.get(f"{lama}-k") is None
+    assert replika_baru.get(f"{baru}-k") == {"v": "baru"}
+
+def test_memo_per_proses_tanpa_decode_ulang(tmp_path, monkeypatch):
+    backend = shared_cache.DiskBackend(str(tmp_path), memo_entries=1)
+    backend.set("v1-a", frame(), ttl=60)
+    backend.set("v1-b", frame(), ttl=60)
+
+    decode = []
+    original = shared_cache.loads
+    monkeypatch.setattr(shared_cache, "loads", lambda kind, source: decode.append(kind) or original(kind, source))
+
+    pertama = backend.get("v1-a")
+    pertama["kolom_baru"] = 1                  # perubahan di pemanggil tidak masuk memo
+    kedua = backend.get("v1-a")
+    assert len(decode) == 1
+    assert "kolom_baru" not in kedua.columns
+
+    backend.get("v1-b")                        # memo hanya 1 entri: v1-a tergeser
+    backend.get("v1-a")
+    assert len(decode) == 3
+
+    # File ditulis ulang (mtime berubah) -> memo tidak dipakai
+    backend.set("v1-a", frame().head(1), ttl=120)
+    assert len(backend.get("v1-a")) == 1
+    assert len(decode) == 4
+
+    backend.clear()
+    assert backend.get("v1-a") is None
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def scan_iter(self, match):
+        return [k for k in self.data if k.startswith(match.rstrip("*"))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+def test_redis_backend():
+    client = FakeRedis()
+    backend = shared_cache.RedisBackend(client=client, prefix="t:")
+    backend.set("v1-a", {"x": [1, 2]}, ttl=10)
+    assert backend.get("v1-a") == {"x": [1, 2]}
+    if shared_cache.formats.arrow_available():
+        backend.set("v1-f", frame(), ttl=10)
+        pd.testing.assert_frame_equal(backend.get("v1-f"), frame(), check_dtype=False)
+    backend.clear()
+    assert client.data == {}
+
+def test_get_or_fetch(tmp_path, monkeypatch):
+    backend = shared_cache.DiskBackend(str(tmp_path))
+    monkeypatch.setattr(shared_cache, "_backend", backend)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    assert shared_cache.get_or_fetch("/x", {}, "v1", fetch) == {"n": 1}
+    assert shared_cache.get_or_fetch("/x", {}, "v1", fetch) == {"n": 1}
+    # Versi data tidak diketahui: cache bersama dilewati
+    assert shared_cache.get_or_fetch("/x", {}, None, fetch) == {"n": 2}
+
+    # Backend bermasalah tidak menggagalkan request
+    def rusak(*args, **kwargs):
+        raise OSError("disk penuh")
+    monkeypatch.setattr(backend, "get", rusak)
+    monkeypatch.setattr(backend, "set", rusak)
+    assert shared_cache.get_or_fetch("/x", {}, "v1", fetch) == {"n": 3}
@@ -0,0 +1,25 @@
+import os
+
+from app import app
+
+# 🔹 Entry point WSGI produksi
+#
+#   Linux/macOS : gunicorn -c gunicorn.conf.py wsgi:app
+#   Windows     : python wsgi.py            (waitress, multi-thread)
+#   Development : python app.py             (server bawaan Flask; debugger hanya jika FLASK_DEBUG=1)
+application = app
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    import db
+
+    db.warmup()
+    serve(
+        app,
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "5000")),
+        threads=int(os.getenv("API_THREADS", "8")),
+        channel_timeout=int(os.getenv("API_TIMEOUT", "60")),
+        connection_limit=int(os.getenv("API_CONNECTION_LIMIT", "100")),
+    )